@@ -1,29 +1,137 @@
+import json
 import logging
+import os
 import threading
 import speech_recognition as sr
+from vad_segmenter import VadSegmenter
 
 class AudioRecorder:
-    def __init__(self):
+    def __init__(self, device_index: int=None, cache_path: str=None, vad: bool=False):
+        """
+        Initialize the AudioRecorder class.
+
+        Parameters:
+        device_index (int): Microphone device index, the default input
+            when None.
+        cache_path (str): JSON file of energy thresholds per microphone,
+            data/energy_thresholds.json by default.
+        vad (bool): Cut utterances with the VAD segmenter instead of
+            recognizer.listen, silence is never yielded.
+        """
         self.recognizer = sr.Recognizer()
+        # listen keeps adjusting the threshold from the silence between
+        # phrases, the calibration stays current without a pause
+        self.recognizer.dynamic_energy_threshold = True
+        self.device_index = device_index
+        self.vad = vad
+        self.segmenter = None
+        self.cache_path = cache_path or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "data", "energy_thresholds.json")
         self.source = None
         self.logger = logging.getLogger(__name__)
         self.stop_event = threading.Event()
 
+    def device_key(self) -> str:
+        return "default" if self.device_index is None else str(self.device_index)
+
+    def load_thresholds(self) -> dict:
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def cached_threshold(self, key: str=None) -> float:
+        return self.load_thresholds().get(key or self.device_key())
+
+    def save_threshold(self, threshold: float, key: str=None):
+        thresholds = self.load_thresholds()
+        thresholds[key or self.device_key()] = threshold
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, "w") as f:
+                json.dump(thresholds, f)
+        except OSError as err:
+            self.logger.error(f"Saving energy threshold failed: {err}")
+
+    def calibrate(self, source):
+        """
+        Use the cached threshold for this microphone, measuring the
+        ambient noise only the first time it is used.
+        """
+        threshold = self.cached_threshold()
+        if threshold is not None:
+            self.recognizer.energy_threshold = threshold
+            self.logger.debug(f"Using cached energy threshold {threshold:.0f}")
+            return
+
+        self.recognizer.adjust_for_ambient_noise(source)
+        self.logger.info(f"Calibrated energy threshold {self.recognizer.energy_threshold:.0f}")
+        self.save_threshold(self.recognizer.energy_threshold)
+
     def record(self):
+        if self.vad:
+            yield from self.record_segments()
+            return
+
         self.logger.debug("Starting recording...")
-        self.source = sr.Microphone()
+        self.source = sr.Microphone(device_index=self.device_index)
         self.stop_event.clear()
+        calibrated = False
         try:
             with self.source as source:
-                self.recognizer.adjust_for_ambient_noise(source)
+                self.calibrate(source)
+                calibrated = True
                 while not self.stop_event.is_set():
                     self.logger.info("recording...")
                     audio = self.recognizer.listen(source)
                     yield audio
         except Exception as e:
             self.logger.error(f"Error during recording: {e}")
+        finally:
+            # keep what listen learned for the next recording
+            if calibrated:
+                self.save_threshold(self.recognizer.energy_threshold)
+
+    def vad_key(self) -> str:
+        return f"vad:{self.device_key()}"
+
+    def segmenter_for(self, sample_rate: int) -> VadSegmenter:
+        """
+        Segmenter for the microphone rate, kept between recordings. A new
+        one starts from the cached noise floor of this microphone.
+        """
+        if self.segmenter is None or self.segmenter.sample_rate != sample_rate:
+            self.segmenter = VadSegmenter(sample_rate=sample_rate)
+            self.segmenter.noise_floor = self.cached_threshold(self.vad_key())
+        self.segmenter.reset()
+        return self.segmenter
+
+    def record_segments(self):
+        """
+        Read the microphone in chunks and yield the utterances the VAD
+        segmenter cuts, the one in progress is yielded when stopped.
+        """
+        self.logger.debug("Starting VAD recording...")
+        self.source = sr.Microphone(device_index=self.device_index)
+        self.stop_event.clear()
+        segmenter = None
+        try:
+            with self.source as source:
+                segmenter = self.segmenter_for(source.SAMPLE_RATE)
+                while not self.stop_event.is_set():
+                    for segment in segmenter.feed(source.stream.read(source.CHUNK)):
+                        yield sr.AudioData(segment.tobytes(), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+
+                segment = segmenter.flush()
+                if segment is not None:
+                    yield sr.AudioData(segment.tobytes(), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        except Exception as e:
+            self.logger.error(f"Error during recording: {e}")
+        finally:
+            if segmenter is not None and segmenter.noise_floor is not None:
+                self.save_threshold(segmenter.noise_floor, self.vad_key())
 
     def stop(self):
         self.logger.info("Stopping recording")
         self.stop_event.set()
-        
@@ -1,11 +1,23 @@
 import pyaudio
 import speech_recognition as sr
 import logging
+from vad_segmenter import VadSegmenter
 
 class AudioRecorderPyAudio:
-    def __init__(self, rate=16000, chunk_size=2048):
+    def __init__(self, rate=16000, chunk_size=2048, device_index=None, segmenter=None):
+        """
+        Initialize the AudioRecorderPyAudio class.
+
+        Parameters:
+        rate (int): Sample rate of the microphone stream.
+        chunk_size (int): Samples read from the stream at a time.
+        device_index (int): PyAudio input device, the default input when None.
+        segmenter (VadSegmenter): Cuts the stream into utterances.
+        """
         self.rate = rate
         self.chunk_size = chunk_size
+        self.device_index = device_index
+        self.segmenter = segmenter or VadSegmenter(sample_rate=rate)
         self.is_recording = False
         self.audio = pyaudio.PyAudio()
         self.stream = None
@@ -21,31 +33,56 @@ class AudioRecorderPyAudio:
     def start_recording(self):
         self.stream = self.audio.open(format=pyaudio.paInt16, channels=1,
                                       rate=self.rate, input=True,
-                                      frames_per_buffer=self.chunk_size, input_device_index=4)
+                                      frames_per_buffer=self.chunk_size,
+                                      input_device_index=self.device_index)
+        self.segmenter.reset()
         self.is_recording = True
         self.logger.debug("Starting recording...")
 
     def record(self):
+        """
+        Record until stopped.
+
+        Yields:
+        sr.AudioData: One utterance at a time, silence is skipped.
+        """
         self.start_recording()
-        while self.is_recording:
-            try:
-                data = self.stream.read(self.chunk_size, exception_on_overflow=False)
-                audio_data = sr.AudioData(data, self.rate, 2)
-                yield audio_data
-            except IOError as e:
-                if e.errno == pyaudio.paInputOverflowed:
-                    self.logger.warning("Input overflowed, skipping chunk")
-                    continue
-                else:
-                    self.logger.error(f"Error during recording: {e}")
-                    break
-        self.stop()
+        try:
+            while self.is_recording:
+                try:
+                    data = self.stream.read(self.chunk_size, exception_on_overflow=False)
+                except IOError as e:
+                    if e.errno == pyaudio.paInputOverflowed:
+                        self.logger.warning("Input overflowed, skipping chunk")
+                        continue
+                    else:
+                        self.logger.error(f"Error during recording: {e}")
+                        break
 
-    def stop(self):
-        self.logger.info("Stopping recording")
+                for segment in self.segmenter.feed(data):
+                    yield sr.AudioData(segment.tobytes(), self.rate, 2)
+
+            # speech still going when recording stopped
+            segment = self.segmenter.flush()
+            if segment is not None:
+                yield sr.AudioData(segment.tobytes(), self.rate, 2)
+        finally:
+            self.close_stream()
+
+    def close_stream(self):
         self.is_recording = False
         if self.stream is not None:
             self.stream.stop_stream()
             self.stream.close()
             self.stream = None
-        self.audio.terminate()
\ No newline at end of file
+
+    def stop(self):
+        """
+        Stop recording, record yields the last utterance and returns.
+        """
+        self.logger.info("Stopping recording")
+        self.is_recording = False
+
+    def close(self):
+        self.close_stream()
+        self.audio.terminate()
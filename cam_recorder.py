@@ -3,26 +3,47 @@ CamRecorder
 
 handles camera recording and convert to jpeg then base64
 """
-import cv2
-import ctypes
 import numpy as np
-import base64
 import shortuuid
 import logging
 import os
-import threading
 from PIL import Image, ImageDraw
 
+from frame_dedup import FrameDeduplicator
+from frame_store import FrameStore, FrameRecord
+from keyframe_selector import KeyframeSelector
+from jpeg_encoders import select_encoder
+from camera_grabber import CameraGrabber
+
 class CamRecorder:
-    def __init__(self, camera_index: int=0):
+    def __init__(
+            self,
+            camera_index: int=0,
+            similarity_threshold: float=0.02,
+            max_bytes: int=1 << 30,
+            keyframe_threshold: float=0.25,
+            max_request_frames: int=8,
+            jpeg_quality: int=90,
+            jpeg_subsampling: str="444",
+            grabber: CameraGrabber=None):
         self.record_id = shortuuid.uuid()
         self.camera_index = camera_index
-        self.frames: list[np.ndarray] = []
-        self.max_frames = 3000
-        self.base64_frames: list[str] = []
+        # the camera stays open between recordings and agent steps,
+        # a grabber thread keeps only its newest frame
+        self.grabber = grabber if grabber is not None else CameraGrabber(camera_index)
+        self.frames = FrameStore(
+            max_bytes=max_bytes,
+            on_evict=self.on_frame_evicted
+        )
+        self.keyframe_threshold = keyframe_threshold
+        self.keyframe_selector = KeyframeSelector(max_frames=max_request_frames)
+        # frames are only encoded when picked for a request
+        self.encoded_frames: dict[int, str] = {}
         self.is_recording = False
         self.logger = logging.getLogger(__name__)
         self.root_dir = os.path.dirname(os.path.abspath(__file__))
+        self.dedup = FrameDeduplicator(similarity_threshold=similarity_threshold)
+        self.encoder = select_encoder(jpeg_quality, jpeg_subsampling)
     
     def start_recording(self):
         self.is_recording = True
@@ -30,25 +51,29 @@ class CamRecorder:
         self.logger.info(f"Starting Camera {self.camera_index} Recording...")
 
         try:
+            if not self.grabber.start():
+                self.logger.error("Failed to capture frame from camera")
+                return
+
             fcnt = 1
-            cap = cv2.VideoCapture(self.camera_index)
             while self.is_recording:
-                if fcnt == self.max_frames:
-                    self.logger.info(f"Stopped at frame {self.max_frames} due to AI model space")
-                    break
+                # frames that arrived while this one was processed are
+                # dropped by the grabber, the next one is always current
+                item = self.grabber.next_frame(timeout=1.0)
+                if item is None:
+                    if not self.grabber.running:
+                        self.logger.error("Failed to capture frame from camera")
+                        break
+                    continue
 
-                ret, frame = cap.read()
-                if not ret:
-                    self.logger.error("Failed to capture frame from camera")
-                    break
-
-                self.convert_frames_to_base64(frame)
+                self.process_frame(*item)
 
                 self.logger.info(f"Captured frame {fcnt}")
                 fcnt += 1
 
-            cap.release()
             self.logger.info("Stopped Camera Recording")
+            self.logger.info(f"Dedup stats: {self.dedup.stats()}")
+            self.logger.info(f"Grabber stats: {self.grabber.stats()}")
         except Exception as err:
             self.logger.error(f"Camera Recording failed: {err}")
 
@@ -57,32 +82,72 @@ class CamRecorder:
         self.is_recording = False
 
     def get_frame(self):
-        cap = cv2.VideoCapture(self.camera_index)
-        ret, frame = cap.read()
-        cap.release()
-        if ret:
-            self.process_frame(frame)
-
-    def put_frame(self, bframe):
-        if not np.isin(bframe, self.frames):
-            self.base64_frames.append(bframe)
-        else:
-            self.logger.info("Skipping frame, already present")
+        """
+        Store the newest camera frame, opening the camera on first use
+        """
+        self.grabber.start()
+        item = self.grabber.latest(timeout=self.grabber.open_timeout)
+        if item is not None:
+            self.process_frame(*item)
+
+    def reset(self):
+        """
+        Clear stored frames for a new capture, the camera stays open.
+        """
+        self.frames.clear()
+        self.encoded_frames.clear()
+        self.dedup.clear()
+
+    def close(self):
+        self.is_recording = False
+        self.grabber.close()
+
+    def process_frame(self, frame: np.ndarray, timestamp: float=None):
+        if self.dedup.check_and_add(frame):
+            self.logger.info("Frame already present in memory, skipping")
+            return
+
+        self.put_frame(frame, timestamp)
+
+    def put_frame(self, frame: np.ndarray, timestamp: float=None):
+        score = self.dedup.last_score
+        self.frames.append(
+            frame,
+            keyframe=score >= self.keyframe_threshold,
+            score=score,
+            digest=self.dedup.last_digest,
+            timestamp=timestamp
+        )
+
+    def on_frame_evicted(self, record: FrameRecord):
+        self.encoded_frames.pop(record.frame_id, None)
+        self.dedup.remove(record.digest, record.frame)
     
     def frame_in_list(self, frame):
-        for f in self.frames:
-            if np.array_equal(frame, f):
-                return True
-        return False
+        return self.dedup.is_duplicate(frame)
 
-    def convert_frames_to_base64(self, frame: np.ndarray):
-        if not self.frame_in_list(frame):
-            self.frames.append(frame)
-            self.logger.info(f"[ocv] converting frame to b64")
+    def get_base64_frames(self, max_frames: int=None, segments: list=None) -> list[str]:
+        """
+        Encode the frames picked by scene change and transcript segments,
+        caching by frame id
+        """
+        base64_frames = []
+        snapshot, timestamps = self.frames.indexed_snapshot()
+        records = self.keyframe_selector.select_for_segments(
+            snapshot, segments, max_frames=max_frames, timestamps=timestamps)
+        for record in records:
+            if record.frame_id not in self.encoded_frames:
+                self.encoded_frames[record.frame_id] = self.convert_frames_to_base64(
+                    record.frame)
+            base64_frames.append(self.encoded_frames[record.frame_id])
 
-            _, buffer = cv2.imencode('.jpg', frame)
-            self.put_frame(base64.b64encode(buffer).decode('utf-8'))
+        self.logger.info(f"Encoded {len(base64_frames)} of {len(self.frames)} frames")
+        return base64_frames
 
-            self.logger.info("conversion completed")
-        else:
-            self.logger.info("Frame already present in memory, skipping")
+    def convert_frames_to_base64(self, frame: np.ndarray) -> str:
+        self.logger.info(f"[{self.encoder.name}] converting frame to b64")
+
+        bframe = self.encoder.encode_base64(frame)
+
+        self.logger.info("conversion completed")
+        return bframe
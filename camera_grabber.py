@@ -0,0 +1,167 @@
+"""
+Camera Grabber
+
+Persistent camera reader. A grabber thread keeps reading the camera so the
+driver buffer never fills up and only the newest frame is kept, older ones
+are dropped. Consumers always get a current frame and the camera is opened
+once instead of per capture.
+"""
+import logging
+import threading
+import time
+import cv2
+import numpy as np
+
+class CameraGrabber:
+    def __init__(self, camera_index: int=0, open_timeout: float=5.0):
+        """
+        Initialize the CameraGrabber class.
+
+        Parameters:
+        camera_index (int): OpenCV camera index.
+        open_timeout (float): Seconds to wait for the first frame.
+        """
+        self.camera_index = camera_index
+        self.open_timeout = open_timeout
+        self.capture = None
+        self.thread = None
+        # set to stop the current grabber thread
+        self.stop_event = threading.Event()
+        self.join_timeout = 2.0
+        self.running = False
+        self.condition = threading.Condition()
+        self.frame = None
+        self.timestamp = None
+        self.seq = 0
+        self.grabbed = 0
+        self.dropped = 0
+        self.last_read_seq = 0
+        self.logger = logging.getLogger(__name__)
+
+    def start(self) -> bool:
+        """
+        Open the camera and start the grabber thread, no-op if running.
+
+        Returns:
+        bool: True once the camera delivered a frame.
+        """
+        if self.running:
+            return True
+
+        # the grab loop stopped on a failed read and released its capture
+        self.stop_thread()
+        with self.condition:
+            self.frame = None
+            self.timestamp = None
+
+        self.logger.info(f"Opening camera {self.camera_index}")
+        self.capture = cv2.VideoCapture(self.camera_index)
+        if not self.capture.isOpened():
+            self.logger.error(f"Could not open camera {self.camera_index}")
+            self.capture.release()
+            self.capture = None
+            return False
+
+        self.running = True
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self.grab_frames, args=(self.capture, self.stop_event), daemon=True)
+        self.thread.start()
+        return self.latest(timeout=self.open_timeout) is not None
+
+    def grab_frames(self, capture, stop: threading.Event):
+        """
+        Grabber thread, reads frames as fast as the camera delivers them
+        and keeps the newest. The thread owns its capture and releases it
+        when it exits, never while a read is in progress.
+        """
+        try:
+            while not stop.is_set():
+                ret, frame = capture.read()
+                timestamp = time.monotonic()
+                if not ret:
+                    self.logger.error("Failed to capture frame from camera")
+                    break
+
+                with self.condition:
+                    # stopped while blocked in read, the camera was reopened
+                    if self.capture is not capture:
+                        break
+                    # the previous frame was never read, drop it
+                    if self.seq > self.last_read_seq:
+                        self.dropped += 1
+                    self.frame = frame
+                    self.timestamp = timestamp
+                    self.seq += 1
+                    self.grabbed += 1
+                    self.condition.notify_all()
+        finally:
+            capture.release()
+            with self.condition:
+                if self.capture is capture:
+                    self.running = False
+                self.condition.notify_all()
+
+    def stop_thread(self):
+        """
+        Stop the grabber thread. A thread still blocked in a read after
+        join_timeout is left to release its capture when the read returns.
+        """
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join(timeout=self.join_timeout)
+        if self.thread.is_alive():
+            self.logger.warning(
+                f"Camera {self.camera_index} read did not return, capture released when it does")
+        self.thread = None
+        with self.condition:
+            self.capture = None
+
+    def latest(self, timeout: float=None) -> tuple[np.ndarray, float]:
+        """
+        Newest frame, waiting up to timeout for the first one.
+
+        Returns:
+        tuple: (frame, monotonic capture time), None when no frame came.
+        """
+        with self.condition:
+            if self.frame is None and self.running:
+                self.condition.wait_for(
+                    lambda: self.frame is not None or not self.running, timeout)
+            if self.frame is None:
+                return None
+            self.last_read_seq = self.seq
+            return self.frame, self.timestamp
+
+    def next_frame(self, timeout: float=1.0) -> tuple[np.ndarray, float]:
+        """
+        Wait for a frame newer than the last one read.
+
+        Returns:
+        tuple: (frame, monotonic capture time), None on timeout or when the
+        camera stopped.
+        """
+        with self.condition:
+            if not self.condition.wait_for(
+                    lambda: self.seq > self.last_read_seq or not self.running, timeout):
+                return None
+            if self.seq <= self.last_read_seq:
+                return None
+            self.last_read_seq = self.seq
+            return self.frame, self.timestamp
+
+    def stats(self) -> dict:
+        return {
+            "grabbed": self.grabbed,
+            "dropped": self.dropped
+        }
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.stop_thread()
+        with self.condition:
+            self.frame = None
+            self.timestamp = None
@@ -0,0 +1,163 @@
+"""
+Capture Session
+
+Long lived screen capture handle shared by recordings and agent steps.
+Keeps the mss handle and the monitor geometry warm so a capture is a single
+grab instead of opening a new mss context every time.
+"""
+import logging
+import threading
+import weakref
+import mss
+import numpy as np
+
+def screenshot_to_array(shot) -> np.ndarray:
+    """
+    Wrap the raw BGRA buffer of an mss screenshot without copying it.
+
+    Parameters:
+    shot (mss.screenshot.ScreenShot): The grabbed screenshot.
+
+    Returns:
+    np.ndarray: (height, width, 4) view of the screenshot buffer.
+    """
+    frame = np.frombuffer(shot.raw, dtype=np.uint8)
+    # some platforms pad rows, the view then skips the padding
+    return frame.reshape(shot.height, -1, 4)[:, :shot.width]
+
+class HandleLease:
+    """
+    A thread's hold on an mss handle, kept in thread local storage. When
+    the thread ends the lease is dropped and the handle goes back to the
+    session for the next thread.
+    """
+    def __init__(self, session: "CaptureSession", sct):
+        self.sct = sct
+        self.finalizer = weakref.finalize(self, session.give_back, sct)
+
+class CaptureSession:
+    def __init__(self):
+        # mss handles are not safe to share between threads at once, a
+        # capturing thread leases one and returns it when done so new
+        # recording and agent threads reuse the open handles
+        self.local = threading.local()
+        self.handles = []
+        self.idle = []
+        self.lock = threading.Lock()
+        self._monitors = None
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def sct(self):
+        """
+        mss handle of the calling thread, an idle handle is reused and a
+        new one opened only when all are in use.
+        """
+        lease = getattr(self.local, "lease", None)
+        if lease is None:
+            with self.lock:
+                sct = self.idle.pop() if self.idle else None
+                if sct is None:
+                    self.logger.info("Opening capture handle")
+                    sct = mss.mss()
+                    self.handles.append(sct)
+            lease = HandleLease(self, sct)
+            self.local.lease = lease
+        return lease.sct
+
+    def give_back(self, sct):
+        with self.lock:
+            # handles closed with the session are not reused
+            if sct in self.handles and sct not in self.idle:
+                self.idle.append(sct)
+
+    def release(self):
+        """
+        Return the calling thread's handle for other threads to use,
+        done automatically when the thread ends.
+        """
+        lease = getattr(self.local, "lease", None)
+        if lease is not None:
+            del self.local.lease
+            lease.finalizer()
+
+    @property
+    def monitors(self) -> list[dict]:
+        """
+        Monitor geometry, read once. Index 0 is the whole virtual desktop.
+        """
+        if self._monitors is None:
+            self._monitors = list(self.sct.monitors)
+        return self._monitors
+
+    def refresh(self):
+        """
+        Re-read the monitor geometry, e.g. after a monitor was plugged in.
+        """
+        self._monitors = list(self.sct.monitors)
+
+    def grab(self, monitor_number: int) -> np.ndarray:
+        """
+        Grab one monitor.
+
+        Returns:
+        np.ndarray: BGRA view of the grabbed screenshot.
+        """
+        return screenshot_to_array(self.sct.grab(self.monitors[monitor_number]))
+
+    def grab_latest(self, monitor_number: int) -> np.ndarray:
+        """
+        Grab the current screen for an agent step.
+
+        -1 grabs every monitor and stacks them side by side, falling back to
+        monitor 1 when there is only one.
+
+        Returns:
+        np.ndarray: BGRA frame.
+        """
+        if monitor_number == -1:
+            if len(self.monitors) >= 3:
+                return np.hstack(tuple(
+                    self.grab(i) for i in range(1, len(self.monitors))
+                ))
+            monitor_number = 1
+
+        return self.grab(monitor_number)
+
+    def frame_position(self, monitor_number: int, x: int, y: int) -> tuple[int, int]:
+        """
+        Map a desktop position, e.g. the mouse cursor, into the frame
+        grab_latest returns for a monitor.
+
+        Returns:
+        tuple[int, int]: Position in the frame, None when outside it.
+        """
+        monitors = self.monitors
+        if monitor_number == -1:
+            if len(monitors) >= 3:
+                # monitors are stacked side by side
+                offset = 0
+                for mon in monitors[1:]:
+                    if (mon["left"] <= x < mon["left"] + mon["width"]
+                            and mon["top"] <= y < mon["top"] + mon["height"]):
+                        return offset + x - mon["left"], y - mon["top"]
+                    offset += mon["width"]
+                return None
+            monitor_number = 1
+
+        mon = monitors[monitor_number]
+        frame_x, frame_y = x - mon["left"], y - mon["top"]
+        if 0 <= frame_x < mon["width"] and 0 <= frame_y < mon["height"]:
+            return frame_x, frame_y
+        return None
+
+    def close(self):
+        with self.lock:
+            for sct in self.handles:
+                try:
+                    sct.close()
+                except Exception as err:
+                    self.logger.error(f"Closing capture handle failed: {err}")
+            self.handles.clear()
+            self.idle.clear()
+        self.local = threading.local()
@@ -0,0 +1,216 @@
+/*
+    JPEG to Base64 conversion on the CPU
+
+    Uses libjpeg-turbo (SIMD DCT and color conversion) to compress BGR
+    frames into a reused per thread buffer, then base64 encodes straight
+    into a buffer provided by the caller. Python gets the base64 text from
+    one native call, without a JPEG bytes object or a base64 bytes copy.
+
+*/
+#include <csetjmp>
+#include <cstdint>
+#include <cstdio>
+#include <cstring>
+#include <vector>
+
+extern "C" {
+#include <jpeglib.h>
+}
+
+namespace {
+
+struct ErrorManager {
+    jpeg_error_mgr pub;
+    jmp_buf jump;
+};
+
+void error_exit(j_common_ptr cinfo) {
+    ErrorManager* err = reinterpret_cast<ErrorManager*>(cinfo->err);
+    longjmp(err->jump, 1);
+}
+
+// destination writing into a reused vector, grown on demand
+struct VectorDestination {
+    jpeg_destination_mgr pub;
+    std::vector<unsigned char>* buffer;
+};
+
+const size_t CHUNK = 1 << 16;
+
+void init_destination(j_compress_ptr cinfo) {
+    VectorDestination* dest = reinterpret_cast<VectorDestination*>(cinfo->dest);
+    if (dest->buffer->size() < CHUNK) {
+        dest->buffer->resize(CHUNK);
+    }
+    dest->pub.next_output_byte = dest->buffer->data();
+    dest->pub.free_in_buffer = dest->buffer->size();
+}
+
+boolean empty_output_buffer(j_compress_ptr cinfo) {
+    VectorDestination* dest = reinterpret_cast<VectorDestination*>(cinfo->dest);
+    size_t used = dest->buffer->size();
+    dest->buffer->resize(used * 2);
+    dest->pub.next_output_byte = dest->buffer->data() + used;
+    dest->pub.free_in_buffer = dest->buffer->size() - used;
+    return TRUE;
+}
+
+void term_destination(j_compress_ptr) {}
+
+// two base64 characters per 12 bits of input
+struct PairTable {
+    uint16_t pairs[4096];
+
+    PairTable() {
+        const char* alphabet =
+            "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+        for (int i = 0; i < 4096; i++) {
+            char pair[2] = {alphabet[i >> 6], alphabet[i & 0x3f]};
+            memcpy(&pairs[i], pair, 2);
+        }
+    }
+};
+
+const PairTable pair_table;
+const char* ALPHABET =
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+
+size_t base64_length(size_t length) {
+    return 4 * ((length + 2) / 3);
+}
+
+void base64_encode(const unsigned char* src, size_t length, char* out) {
+    size_t i = 0;
+    for (; i + 3 <= length; i += 3) {
+        uint32_t block = (src[i] << 16) | (src[i + 1] << 8) | src[i + 2];
+        memcpy(out, &pair_table.pairs[block >> 12], 2);
+        memcpy(out + 2, &pair_table.pairs[block & 0xfff], 2);
+        out += 4;
+    }
+
+    size_t rest = length - i;
+    if (rest) {
+        uint32_t block = src[i] << 16;
+        if (rest == 2) {
+            block |= src[i + 1] << 8;
+        }
+        out[0] = ALPHABET[(block >> 18) & 0x3f];
+        out[1] = ALPHABET[(block >> 12) & 0x3f];
+        out[2] = rest == 2 ? ALPHABET[(block >> 6) & 0x3f] : '=';
+        out[3] = '=';
+    }
+}
+
+thread_local std::vector<unsigned char> jpeg_buffer;
+thread_local std::vector<unsigned char> row_buffer;
+
+// returns the JPEG length or -1
+long compress(const unsigned char* bgr, int width, int height, int pitch,
+              int quality, int subsampling) {
+    jpeg_compress_struct cinfo;
+    ErrorManager err;
+    cinfo.err = jpeg_std_error(&err.pub);
+    err.pub.error_exit = error_exit;
+    if (setjmp(err.jump)) {
+        jpeg_destroy_compress(&cinfo);
+        return -1;
+    }
+
+    jpeg_create_compress(&cinfo);
+
+    VectorDestination dest;
+    dest.pub.init_destination = init_destination;
+    dest.pub.empty_output_buffer = empty_output_buffer;
+    dest.pub.term_destination = term_destination;
+    dest.buffer = &jpeg_buffer;
+    cinfo.dest = &dest.pub;
+
+    cinfo.image_width = width;
+    cinfo.image_height = height;
+    cinfo.input_components = 3;
+#ifdef JCS_EXTENSIONS
+    cinfo.in_color_space = JCS_EXT_BGR;
+#else
+    cinfo.in_color_space = JCS_RGB;
+    row_buffer.resize(width * 3);
+#endif
+    jpeg_set_defaults(&cinfo);
+    jpeg_set_quality(&cinfo, quality, TRUE);
+
+    // subsampling: 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0
+    cinfo.comp_info[0].h_samp_factor = subsampling >= 1 ? 2 : 1;
+    cinfo.comp_info[0].v_samp_factor = subsampling == 2 ? 2 : 1;
+    cinfo.dct_method = JDCT_ISLOW;
+
+    jpeg_start_compress(&cinfo, TRUE);
+    while (cinfo.next_scanline < cinfo.image_height) {
+        const unsigned char* src = bgr + (size_t)cinfo.next_scanline * pitch;
+#ifdef JCS_EXTENSIONS
+        JSAMPROW row = const_cast<JSAMPROW>(src);
+#else
+        for (int x = 0; x < width; x++) {
+            row_buffer[x * 3] = src[x * 3 + 2];
+            row_buffer[x * 3 + 1] = src[x * 3 + 1];
+            row_buffer[x * 3 + 2] = src[x * 3];
+        }
+        JSAMPROW row = row_buffer.data();
+#endif
+        jpeg_write_scanlines(&cinfo, &row, 1);
+    }
+    jpeg_finish_compress(&cinfo);
+
+    long length = (long)(jpeg_buffer.size() - dest.pub.free_in_buffer);
+    jpeg_destroy_compress(&cinfo);
+    return length;
+}
+
+}
+
+extern "C" {
+    // upper bound of the base64 output for a frame, including a trailing NUL.
+    // The JPEG bound is tjBufSize from libjpeg-turbo: the frame padded to
+    // whole MCUs, 2 bytes per pixel for luma plus the chroma share, 2048
+    // bytes of headers.
+    size_t jpeg_base64_bound(int width, int height, int subsampling) {
+        // subsampling: 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0
+        size_t mcu_width = subsampling >= 1 ? 16 : 8;
+        size_t mcu_height = subsampling == 2 ? 16 : 8;
+        size_t chroma = 4 * 64 / (mcu_width * mcu_height);
+        size_t padded_width = (width + mcu_width - 1) / mcu_width * mcu_width;
+        size_t padded_height = (height + mcu_height - 1) / mcu_height * mcu_height;
+        size_t jpeg = padded_width * padded_height * (2 + chroma) + 2048;
+        return base64_length(jpeg) + 1;
+    }
+
+    // JPEG into out, returns the length, -1 on failure or -2 if out is too small
+    long encode_jpeg(const unsigned char* bgr, int width, int height, int pitch,
+                     int quality, int subsampling, unsigned char* out, size_t out_size) {
+        long length = compress(bgr, width, height, pitch, quality, subsampling);
+        if (length < 0) {
+            return -1;
+        }
+        if ((size_t)length > out_size) {
+            return -2;
+        }
+        memcpy(out, jpeg_buffer.data(), length);
+        return length;
+    }
+
+    // base64 JPEG into out, NUL terminated, returns the text length,
+    // -1 on failure or -2 if out is too small
+    long encode_jpeg_base64(const unsigned char* bgr, int width, int height, int pitch,
+                            int quality, int subsampling, char* out, size_t out_size) {
+        long length = compress(bgr, width, height, pitch, quality, subsampling);
+        if (length < 0) {
+            return -1;
+        }
+
+        size_t encoded = base64_length(length);
+        if (encoded + 1 > out_size) {
+            return -2;
+        }
+        base64_encode(jpeg_buffer.data(), length, out);
+        out[encoded] = '\0';
+        return (long)encoded;
+    }
+}
@@ -35,14 +35,27 @@ const char* get_nvjpeg_error_string(nvjpegStatus_t status) {
 extern "C" {
     void initialize_nvjpeg() {
         std::cout << "Initializing NVJPEG" << std::endl;
+        // the stream has to exist before the encoder state is bound to it
+        cudaStreamCreate(&stream);
         nvjpegCreateSimple(&nvjpeg_handle);
         nvjpegEncoderStateCreate(nvjpeg_handle, &nvjpeg_state, stream);
         nvjpegEncoderParamsCreate(nvjpeg_handle, &nvjpeg_params, stream);
         nvjpegEncoderParamsSetSamplingFactors(nvjpeg_params, NVJPEG_CSS_444, stream);
-        cudaStreamCreate(&stream);
         std::cout << "NVJPEG initialized" << std::endl;
     }
 
+    // subsampling: 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0
+    void set_encode_params(int quality, int subsampling) {
+        nvjpegChromaSubsampling_t css = NVJPEG_CSS_444;
+        if (subsampling == 1) {
+            css = NVJPEG_CSS_422;
+        } else if (subsampling == 2) {
+            css = NVJPEG_CSS_420;
+        }
+        nvjpegEncoderParamsSetQuality(nvjpeg_params, quality, stream);
+        nvjpegEncoderParamsSetSamplingFactors(nvjpeg_params, css, stream);
+    }
+
     void encode_image(unsigned char* h_image, int width, int height, unsigned char** jpeg_output, size_t* jpeg_length) {
         std::cout << "Encoding image" << std::endl;
 
@@ -0,0 +1,231 @@
+"""
+Device Discovery
+
+Finds webcams and microphones off the UI thread. Every camera index is
+probed on its own thread with a timeout so a missing camera does not hold
+up the rest, microphones are listed at the same time. Results are cached on
+disk keyed by a hardware fingerprint, a later start with the same devices
+skips probing. A /dev/video node whose camera did not open (busy, or a
+metadata node) is probed again on every start, so a camera that was busy
+is not left out for as long as the cache lives.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import platform
+import re
+import threading
+import time
+
+from lazy_import import lazy_import
+
+# OpenCV is only loaded when cameras are probed
+cv2 = lazy_import("cv2")
+
+class DeviceDiscovery:
+    def __init__(
+            self,
+            cache_path: str=None,
+            max_cameras: int=6,
+            timeout: float=3.0,
+            max_age: float=7 * 24 * 3600):
+        """
+        Initialize the DeviceDiscovery class.
+
+        Parameters:
+        cache_path (str): JSON cache file, data/devices.json by default.
+        max_cameras (int): Camera indices to probe.
+        timeout (float): Seconds to wait for all probes, a device that does
+            not answer in time is left out.
+        max_age (float): Seconds a cached result is trusted, devices
+            without a fingerprint (e.g. on Windows) are re-probed after it.
+        """
+        self.root_dir = os.path.dirname(os.path.abspath(__file__))
+        self.cache_path = cache_path or os.path.join(self.root_dir, "data", "devices.json")
+        self.max_cameras = max_cameras
+        self.timeout = timeout
+        self.max_age = max_age
+        self.result = None
+        self.done = threading.Event()
+        self.logger = logging.getLogger(__name__)
+
+    def fingerprint(self) -> str:
+        """
+        Hash of what can be read about attached hardware without opening it.
+        """
+        parts = [platform.platform()]
+        parts += sorted(glob.glob("/dev/video*"))
+        parts += sorted(glob.glob("/dev/snd/*"))
+        try:
+            with open("/proc/asound/cards") as f:
+                parts.append(f.read())
+        except OSError:
+            pass
+        return hashlib.blake2b("\n".join(parts).encode(), digest_size=16).hexdigest()
+
+    def video_nodes(self) -> list[int]:
+        """
+        Indices of the /dev/video nodes that could be probed.
+        """
+        indices = []
+        for path in glob.glob("/dev/video*"):
+            match = re.fullmatch(r"/dev/video(\d+)", path)
+            if match and int(match.group(1)) < self.max_cameras:
+                indices.append(int(match.group(1)))
+        return sorted(indices)
+
+    def missing_cameras(self, cameras: list[int]) -> list[int]:
+        """
+        Video nodes no camera was found on.
+        """
+        return [index for index in self.video_nodes() if index not in cameras]
+
+    def load_cache(self, fingerprint: str) -> dict:
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if cache.get("fingerprint") != fingerprint:
+            return None
+        if time.time() - cache.get("time", 0) > self.max_age:
+            return None
+        return cache.get("devices")
+
+    def save_cache(self, fingerprint: str, devices: dict):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, "w") as f:
+                json.dump({"fingerprint": fingerprint, "time": time.time(), "devices": devices}, f)
+        except OSError as err:
+            self.logger.error(f"Saving device cache failed: {err}")
+
+    def probe_camera(self, index: int, found: dict):
+        if platform.system().lower() == "windows":
+            cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
+        else:
+            cap = cv2.VideoCapture(index)
+
+        try:
+            if cap.isOpened() and cap.read()[0]:
+                found[index] = True
+        finally:
+            cap.release()
+
+    def list_microphones(self, found: dict):
+        # imported here, loading PortAudio is part of the work done off
+        # the UI thread
+        import pyaudio
+
+        p = pyaudio.PyAudio()
+        try:
+            try:
+                default_index = p.get_default_input_device_info()["index"]
+            except IOError:
+                default_index = None
+            mics = []
+            for i in range(p.get_device_count()):
+                device_info = p.get_device_info_by_index(i)
+                if device_info['maxInputChannels'] > 0:
+                    mics.append(f"{i}: {device_info['name']}")
+                    if i == default_index:
+                        found["default_microphone"] = mics[-1]
+            found["microphones"] = mics
+        finally:
+            p.terminate()
+
+    def probe(self, indices: list[int]=None, microphones: bool=True) -> dict:
+        """
+        Probe every device in parallel.
+
+        Parameters:
+        indices (list[int]): Camera indices to probe, all up to
+            max_cameras by default.
+        microphones (bool): List the microphones too.
+
+        Returns:
+        dict: {"cameras": [index, ...], "microphones": ["index: name", ...],
+        "default_microphone": "index: name" or None}
+        """
+        if indices is None:
+            indices = range(self.max_cameras)
+        cameras = {}
+        mics = {}
+        failed = []
+        threads = [
+            threading.Thread(
+                target=self.guard, args=(failed, self.probe_camera, i, cameras), daemon=True)
+            for i in indices
+        ]
+        if microphones:
+            threads.append(threading.Thread(
+                target=self.guard, args=(failed, self.list_microphones, mics), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        # probes that hang past the deadline are left behind, they are daemons
+        deadline = time.monotonic() + self.timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+        timed_out = sum(thread.is_alive() for thread in threads)
+        if timed_out:
+            self.logger.info(f"{timed_out} device probes timed out")
+
+        return {
+            "cameras": sorted(cameras),
+            "microphones": mics.get("microphones", []),
+            "default_microphone": mics.get("default_microphone"),
+            "complete": timed_out == 0 and not failed
+        }
+
+    def guard(self, failed: list, target, *args):
+        try:
+            target(*args)
+        except Exception as err:
+            self.logger.error(f"Device probe failed: {err}")
+            failed.append(err)
+
+    def discover(self) -> dict:
+        """
+        Cached devices for this hardware, probed when not cached. Video
+        nodes the cached result found no camera on are probed again.
+        """
+        start = time.monotonic()
+        fingerprint = self.fingerprint()
+        devices = self.load_cache(fingerprint)
+        if devices is None:
+            devices = self.probe()
+            # a partial result is used but not cached
+            if devices.pop("complete"):
+                self.save_cache(fingerprint, devices)
+        else:
+            self.logger.info("Using cached devices")
+            missing = self.missing_cameras(devices["cameras"])
+            if missing:
+                self.logger.info(f"Probing cameras {missing} again")
+                found = self.probe(missing, microphones=False)["cameras"]
+                if found:
+                    devices["cameras"] = sorted(devices["cameras"] + found)
+                    self.save_cache(fingerprint, devices)
+
+        self.logger.info(f"Found {devices} in {time.monotonic() - start:.2f}s")
+        return devices
+
+    def start(self):
+        """
+        Discover in the background, result is set and done signalled
+        when finished.
+        """
+        def run():
+            try:
+                self.result = self.discover()
+            except Exception as err:
+                self.logger.error(f"Device discovery failed: {err}")
+                self.result = {"cameras": [], "microphones": []}
+            self.done.set()
+
+        threading.Thread(target=run, daemon=True).start()
@@ -0,0 +1,295 @@
+"""
+Disk Frame Store
+
+On disk frame store for long recordings. Frames are JPEG encoded and
+appended to a segment file by a single writer thread which also owns the
+sqlite index, rows are committed in batches. Reads go through a memory map
+of the segment file so any frame can be loaded by id or capture time while
+only frames waiting to be written are held in memory.
+"""
+import bisect
+import logging
+import mmap
+import os
+import queue
+import sqlite3
+import threading
+import cv2
+import numpy as np
+
+from frame_store import FrameRecord
+
+class DiskFrameRecord(FrameRecord):
+    """
+    A frame record whose pixels live in the segment file once written
+    """
+    def __init__(self, store: "DiskFrameStore", *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = store
+        self.offset = None
+        self.length = 0
+        # not written, the frame stays in memory
+        self.failed = False
+
+    @property
+    def nbytes(self) -> int:
+        return self.length
+
+    @property
+    def array(self) -> np.ndarray:
+        frame = self.frame
+        if frame is not None:
+            return np.asarray(frame)
+        return self.store.read(self)
+
+class DiskFrameStore:
+    def __init__(
+            self,
+            path: str,
+            record_id: str="",
+            quality: int=90,
+            batch_size: int=32,
+            queue_size: int=64,
+            on_evict=None):
+        """
+        Initialize the DiskFrameStore class.
+
+        Parameters:
+        path (str): Path prefix, the index is written to path.sql and the
+            JPEG blobs to path.seg.
+        record_id (str): Recording the frames belong to.
+        quality (int): JPEG quality frames are stored at.
+        batch_size (int): Rows per sqlite commit.
+        queue_size (int): Frames that may wait for the writer before
+            append blocks.
+        on_evict (callable): Called with each record once its in memory
+            frame is released after being written.
+        """
+        self.sqldb = f"{path}.sql"
+        self.segment_path = f"{path}.seg"
+        self.record_id = record_id
+        self.quality = quality
+        self.batch_size = batch_size
+        self.on_evict = on_evict
+        self.logger = logging.getLogger(__name__)
+
+        os.makedirs(os.path.dirname(self.sqldb) or ".", exist_ok=True)
+        self.records: list[DiskFrameRecord] = []
+        self.timestamps: list[float] = []
+        self.by_id: dict[int, DiskFrameRecord] = {}
+        self.next_id = 0
+        self.nbytes = 0
+        self.written = 0
+        self.failed = 0
+        self.lock = threading.Lock()
+
+        # readers map the segment file, remapped as it grows
+        open(self.segment_path, "ab").close()
+        self.read_file = open(self.segment_path, "rb")
+        self.mm = None
+        self.mm_lock = threading.Lock()
+
+        # the writer thread is the only user of the sqlite connection
+        self.write_queue = queue.Queue(maxsize=queue_size)
+        self.writer_ready = threading.Event()
+        self.writer = threading.Thread(target=self.write_frames, daemon=True)
+        self.writer.start()
+        self.writer_ready.wait()
+
+    def append(
+            self,
+            frame,
+            keyframe: bool=False,
+            score: float=1.0,
+            digest: bytes=None,
+            timestamp: float=None) -> DiskFrameRecord:
+        """
+        Queue a frame for the writer, it stays readable from memory until
+        it has been written.
+
+        Returns:
+        DiskFrameRecord: The stored record.
+        """
+        with self.lock:
+            record = DiskFrameRecord(self, self.next_id, frame, keyframe, score, digest, timestamp)
+            self.next_id += 1
+            self.records.append(record)
+            self.timestamps.append(record.timestamp)
+            self.by_id[record.frame_id] = record
+
+        self.write_queue.put(record)
+        return record
+
+    def write_frames(self):
+        """
+        Writer thread, encodes queued frames, appends them to the segment
+        file and commits their index rows in batches.
+        """
+        conn = sqlite3.connect(self.sqldb)
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS frames (
+                id INTEGER PRIMARY KEY, record_id TEXT, timestamp REAL,
+                keyframe INTEGER, score REAL, offset INTEGER, length INTEGER
+            )""")
+        conn.commit()
+        self.writer_ready.set()
+
+        segment = open(self.segment_path, "ab")
+        offset = segment.tell()
+        batch = []
+        running = True
+        while running:
+            try:
+                record = self.write_queue.get(timeout=0.2)
+            except queue.Empty:
+                record = False
+
+            if record is None:
+                running = False
+            elif record:
+                try:
+                    ok, blob = cv2.imencode(
+                        ".jpg",
+                        np.asarray(record.frame),
+                        [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+                    )
+                    if not ok:
+                        raise ValueError("imencode failed")
+                    segment.write(blob.data)
+                    record.offset = offset
+                    record.length = len(blob)
+                    offset += record.length
+                    batch.append(record)
+                except Exception as err:
+                    self.logger.error(f"Writing frame {record.frame_id} failed: {err}")
+                    # counted as done so flush does not wait on it
+                    record.failed = True
+                    with self.lock:
+                        self.failed += 1
+
+            # commit when the batch is full, the queue is idle or on close
+            if batch and (len(batch) >= self.batch_size or record is False or not running):
+                segment.flush()
+                conn.executemany(
+                    "INSERT INTO frames (id, record_id, timestamp, keyframe, score, offset, length) VALUES (?,?,?,?,?,?,?)",
+                    [
+                        (r.frame_id, self.record_id, r.timestamp, int(r.keyframe), r.score, r.offset, r.length)
+                        for r in batch
+                    ]
+                )
+                conn.commit()
+                self.release(batch)
+                batch = []
+
+        segment.close()
+        conn.close()
+
+    def release(self, batch: list[DiskFrameRecord]):
+        """
+        Drop the in memory frames of a committed batch.
+        """
+        for record in batch:
+            if self.on_evict:
+                self.on_evict(record)
+            record.frame = None
+        with self.lock:
+            self.written += len(batch)
+            self.nbytes += sum(record.length for record in batch)
+
+    def read(self, record: DiskFrameRecord) -> np.ndarray:
+        """
+        Load a written frame from the segment file. Only the remap and
+        the copy of its bytes hold the lock, decodes run in parallel.
+        """
+        end = record.offset + record.length
+        with self.mm_lock:
+            if self.mm is None or len(self.mm) < end:
+                if self.mm is not None:
+                    self.mm.close()
+                self.mm = mmap.mmap(self.read_file.fileno(), 0, access=mmap.ACCESS_READ)
+            blob = np.frombuffer(self.mm[record.offset:end], dtype=np.uint8)
+        return cv2.imdecode(blob, cv2.IMREAD_COLOR)
+
+    def get(self, frame_id: int) -> DiskFrameRecord:
+        with self.lock:
+            return self.by_id.get(frame_id)
+
+    def find(self, timestamp: float) -> DiskFrameRecord:
+        """
+        Record captured closest to a monotonic timestamp.
+        """
+        with self.lock:
+            if not self.records:
+                return None
+            idx = bisect.bisect_left(self.timestamps, timestamp)
+            candidates = self.records[max(idx - 1, 0):idx + 1]
+        return min(candidates, key=lambda record: abs(record.timestamp - timestamp))
+
+    def snapshot(self) -> list[DiskFrameRecord]:
+        with self.lock:
+            return list(self.records)
+
+    def indexed_snapshot(self) -> tuple[list[DiskFrameRecord], list[float]]:
+        """
+        Stored records, oldest first, and their capture times.
+        """
+        with self.lock:
+            return list(self.records), list(self.timestamps)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, idx: int) -> np.ndarray:
+        with self.lock:
+            record = self.records[idx]
+        return record.array
+
+    def __iter__(self):
+        return (record.array for record in self.snapshot())
+
+    def stats(self) -> dict:
+        return {
+            "frames": len(self.records),
+            "written": self.written,
+            "failed": self.failed,
+            "bytes_on_disk": self.nbytes,
+            "pending": self.write_queue.qsize()
+        }
+
+    def flush(self):
+        """
+        Wait until every queued frame is written or failed to write.
+        """
+        while self.written + self.failed < self.next_id and self.writer.is_alive():
+            self.writer.join(timeout=0.05)
+
+    def clear(self):
+        self.flush()
+        with self.lock:
+            self.records.clear()
+            self.timestamps.clear()
+            self.by_id.clear()
+
+    def close(self, remove: bool=False):
+        """
+        Stop the writer after it wrote every queued frame.
+
+        Parameters:
+        remove (bool): Delete the index and segment file.
+        """
+        if self.writer.is_alive():
+            self.write_queue.put(None)
+            self.writer.join()
+
+        with self.mm_lock:
+            if self.mm is not None:
+                self.mm.close()
+                self.mm = None
+        self.read_file.close()
+
+        if remove:
+            for path in (self.sqldb, self.segment_path):
+                try:
+                    os.remove(path)
+                except OSError as err:
+                    self.logger.error(f"Removing {path} failed: {err}")
@@ -0,0 +1,230 @@
+"""
+Frame Deduplicator
+
+Fingerprint based duplicate detection for the screen and camera recorders.
+Frames are indexed by a digest of a strided sample of their rows so checking
+a new frame is a dictionary lookup plus, on a hit, a single equality check
+instead of a scan over every stored frame.
+
+Near duplicates (sensor noise, compression shimmer) are caught by comparing
+a block-mean thumbnail against the last kept frame. Blocks have a fixed size
+in pixels, so a typed character changes one block as much on a 4K screen as
+on a small one.
+"""
+import hashlib
+import logging
+import cv2
+import numpy as np
+
+class FrameDeduplicator:
+    def __init__(
+            self,
+            row_stride: int=4,
+            similarity_threshold: float=0.02,
+            block_size: int=8):
+        """
+        Initialize the FrameDeduplicator class.
+
+        Parameters:
+        row_stride (int): Only every row_stride'th row of a frame is hashed.
+        similarity_threshold (float): Largest per block change (0.0 to 1.0) for
+            a frame to still count as a near duplicate. 0 disables the filter.
+        block_size (int): Side in pixels of a thumbnail block.
+        """
+        self.row_stride = row_stride
+        self.similarity_threshold = similarity_threshold
+        self.block_size = block_size
+        self.index: dict[bytes, np.ndarray] = {}
+        self.last_thumbnail = None
+        self.last_shape = None
+        self.last_score = 1.0
+        self.last_digest = None
+        self.last_kept = None
+        self.pending_thumbnail = None
+        self.pending_shape = None
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+
+    def fingerprint(self, frame: np.ndarray) -> bytes:
+        """
+        Cheap content digest of a frame.
+
+        Parameters:
+        frame (np.ndarray): The frame to fingerprint.
+
+        Returns:
+        bytes: 16 byte digest of the sampled rows and the frame shape.
+        """
+        digest = hashlib.blake2b(repr(frame.shape).encode(), digest_size=16)
+        # rows are hashed one by one so the sample is never copied out
+        for row in frame[::self.row_stride]:
+            digest.update(np.ascontiguousarray(row).data)
+        return digest.digest()
+
+    def is_duplicate(self, frame: np.ndarray, digest: bytes=None, verify: bool=True) -> bool:
+        """
+        Check if a frame has already been seen.
+
+        A digest match is confirmed against the indexed frame so a change
+        that falls between sampled rows is never reported as a duplicate.
+
+        Parameters:
+        frame (np.ndarray): The frame to check.
+        digest (bytes): Precomputed fingerprint of the frame, if any.
+        verify (bool): Confirm a digest match with an equality check. Off
+            for digests that already cover every pixel.
+
+        Returns:
+        bool: True if the frame is a duplicate.
+        """
+        if digest is None:
+            digest = self.fingerprint(frame)
+
+        indexed = self.index.get(digest)
+        if indexed is not None and (not verify or np.array_equal(indexed, frame)):
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        return False
+
+    def thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Grayscale block-mean thumbnail of a frame.
+
+        Parameters:
+        frame (np.ndarray): BGR or BGRA frame.
+
+        Returns:
+        np.ndarray: float32 thumbnail, one value per block_size square.
+        """
+        height, width = frame.shape[:2]
+        small = cv2.resize(
+            frame,
+            (-(-width // self.block_size), -(-height // self.block_size)),
+            interpolation=cv2.INTER_AREA
+        )
+        return small[:, :, :3].mean(axis=2, dtype=np.float32)
+
+    def change_score(self, thumbnail: np.ndarray) -> float:
+        """
+        Largest block difference between a thumbnail and the last kept frame.
+
+        Returns:
+        float: 0.0 for identical thumbnails up to 1.0 for a full scene change.
+        """
+        if self.last_thumbnail is None:
+            return 1.0
+        return float(np.abs(thumbnail - self.last_thumbnail).max()) / 255.0
+
+    def add(self, frame: np.ndarray, digest: bytes=None) -> bytes:
+        """
+        Index a frame, replacing any frame indexed under the same digest.
+
+        Returns:
+        bytes: The fingerprint the frame was indexed under.
+        """
+        if digest is None:
+            digest = self.fingerprint(frame)
+        self.index[digest] = frame
+        return digest
+
+    def remove(self, digest: bytes, frame: np.ndarray):
+        """
+        Drop a frame from the index, e.g. once it has been evicted from storage.
+        """
+        if self.index.get(digest) is frame:
+            del self.index[digest]
+
+    def check(self, frame: np.ndarray, digest: bytes=None, final: bool=False) -> bool:
+        """
+        Check a frame without indexing it.
+
+        Exact duplicates are looked up in the index, near duplicates are
+        compared against the last kept frame. The change score of the
+        checked frame is left in last_score and its digest in last_digest.
+        A frame that is not a duplicate is indexed by calling keep.
+
+        Parameters:
+        frame (np.ndarray): The frame to check.
+        digest (bytes): Digest of every pixel of the frame computed by the
+            caller, trusted without an equality check.
+        final (bool): Last frame of a recording, only a copy of the last
+            kept frame counts as a duplicate.
+
+        Returns:
+        bool: True if the frame is a duplicate.
+        """
+        verify = digest is None
+        if digest is None:
+            digest = self.fingerprint(frame)
+        self.last_digest = digest
+        if self.is_duplicate(frame, digest, verify=verify):
+            self.last_score = 0.0
+            if not final or self.index[digest] is self.last_kept:
+                return True
+
+        thumbnail = self.thumbnail(frame)
+        if frame.shape == self.last_shape:
+            self.last_score = self.change_score(thumbnail)
+        else:
+            self.last_score = 1.0
+
+        if self.last_score < self.similarity_threshold and not final:
+            self.near_hits += 1
+            return True
+
+        self.pending_thumbnail = thumbnail
+        self.pending_shape = frame.shape
+        return False
+
+    def keep(self, stored):
+        """
+        Index the frame that passed the last check.
+
+        Parameters:
+        stored: What the frame is stored as, indexed under last_digest.
+        """
+        self.add(stored, self.last_digest)
+        self.last_kept = stored
+        self.last_thumbnail = self.pending_thumbnail
+        self.last_shape = self.pending_shape
+
+    def check_and_add(self, frame: np.ndarray, copy: bool=False, final: bool=False) -> bool:
+        """
+        Check a frame and index it if it is new.
+
+        Parameters:
+        frame (np.ndarray): The frame to check.
+        copy (bool): Index a copy of the frame, for frames in reused buffers.
+            The indexed array is left in last_kept.
+        final (bool): Last frame of a recording, see check.
+
+        Returns:
+        bool: True if the frame was a duplicate and was not indexed.
+        """
+        if self.check(frame, final=final):
+            return True
+
+        self.keep(frame.copy() if copy else frame)
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "indexed": len(self.index)
+        }
+
+    def clear(self):
+        self.index.clear()
+        self.last_thumbnail = None
+        self.last_shape = None
+        self.last_score = 1.0
+        self.last_kept = None
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
@@ -0,0 +1,109 @@
+"""
+Frame Pacer
+
+Fixed rate capture scheduler for the recorders. Sleeps on a monotonic clock
+between grabs, counts late and dropped frames and lowers the rate while the
+capture loop cannot keep up.
+"""
+import logging
+import time
+from collections import deque
+
+class FramePacer:
+    def __init__(
+            self,
+            target_fps: float=10.0,
+            min_fps: float=1.0,
+            adaptive: bool=True,
+            window: int=30):
+        """
+        Initialize the FramePacer class.
+
+        Parameters:
+        target_fps (float): Rate to capture at when the loop keeps up.
+        min_fps (float): Lowest rate the pacer will back off to.
+        adaptive (bool): Lower the rate under load and recover when idle.
+        window (int): Number of recent frames used to judge the load.
+        """
+        self.target_fps = target_fps
+        self.min_fps = min(min_fps, target_fps)
+        self.fps = target_fps
+        self.adaptive = adaptive
+        self.next_tick = None
+        self.frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+        self.recent_late = deque(maxlen=window)
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def interval(self) -> float:
+        return 1.0 / self.fps
+
+    def reset(self):
+        self.next_tick = None
+        self.frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+        self.recent_late.clear()
+        self.fps = self.target_fps
+
+    def wait(self) -> bool:
+        """
+        Sleep until the next frame is due.
+
+        A frame is late when the loop gets back more than half an interval
+        after its tick. Every whole interval missed on top of that is
+        counted as a dropped frame and skipped, the schedule is not caught
+        up with a burst of grabs.
+
+        Returns:
+        bool: True if this frame is late.
+        """
+        now = time.monotonic()
+        if self.next_tick is None:
+            self.next_tick = now
+
+        late = now > self.next_tick + self.interval * 0.5
+        if now < self.next_tick:
+            time.sleep(self.next_tick - now)
+        elif late:
+            missed = int((now - self.next_tick) / self.interval)
+            self.late_frames += 1
+            self.dropped_frames += missed
+            self.next_tick += missed * self.interval
+
+        self.next_tick += self.interval
+        self.frames += 1
+        self.recent_late.append(late)
+
+        if self.adaptive:
+            self.adapt()
+
+        return late
+
+    def adapt(self):
+        """
+        Back off when most recent frames were late, recover when none were.
+        """
+        if len(self.recent_late) < self.recent_late.maxlen:
+            return
+
+        late_ratio = sum(self.recent_late) / len(self.recent_late)
+        if late_ratio > 0.5 and self.fps > self.min_fps:
+            self.fps = max(self.min_fps, self.fps * 0.75)
+            self.recent_late.clear()
+            self.logger.info(f"Capture under load, lowering rate to {self.fps:.1f} fps")
+        elif late_ratio == 0 and self.fps < self.target_fps:
+            self.fps = min(self.target_fps, self.fps * 1.25)
+            self.recent_late.clear()
+            self.logger.info(f"Capture keeping up, raising rate to {self.fps:.1f} fps")
+
+    def stats(self) -> dict:
+        return {
+            "fps": round(self.fps, 2),
+            "target_fps": self.target_fps,
+            "frames": self.frames,
+            "late": self.late_frames,
+            "dropped": self.dropped_frames
+        }
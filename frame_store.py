@@ -0,0 +1,218 @@
+"""
+Frame Store
+
+Memory bounded ring buffer for captured frames. Frames are kept until the
+byte budget is reached, then the oldest non keyframes are evicted first so
+scene changes survive long recordings.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+class FrameRecord:
+    """
+    A stored frame and what the recorder knows about it
+    """
+    def __init__(
+            self,
+            frame_id: int,
+            frame: np.ndarray,
+            keyframe: bool=False,
+            score: float=1.0,
+            digest: bytes=None,
+            timestamp: float=None):
+        self.frame_id = frame_id
+        self.frame = frame
+        self.keyframe = keyframe
+        self.score = score
+        self.digest = digest
+        self.shape = getattr(frame, "shape", None)
+        # monotonic capture time, records are ordered by it
+        self.timestamp = timestamp if timestamp is not None else time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        return self.frame.nbytes
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        The frame as a full array, tiled frames are rebuilt.
+        """
+        if isinstance(self.frame, np.ndarray):
+            return self.frame
+        return np.asarray(self.frame)
+
+class FrameStore:
+    def __init__(
+            self,
+            max_bytes: int=2 << 30,
+            keyframe_share: float=0.5,
+            on_evict=None):
+        """
+        Initialize the FrameStore class.
+
+        Parameters:
+        max_bytes (int): Memory ceiling for stored frames.
+        keyframe_share (float): Share of max_bytes keyframes may hold before
+            the oldest keyframes are evicted too.
+        on_evict (callable): Called with each evicted FrameRecord.
+        """
+        self.max_bytes = max_bytes
+        self.keyframe_share = keyframe_share
+        self.on_evict = on_evict
+        self.records: OrderedDict[int, FrameRecord] = OrderedDict()
+        self.evictable: OrderedDict[int, FrameRecord] = OrderedDict()
+        # capture times in record order, bisected to find frames by time
+        self.timestamps: list[float] = []
+        self.frame_ids: list[int] = []
+        self.nbytes = 0
+        self.keyframe_bytes = 0
+        self.next_id = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def append(
+            self,
+            frame: np.ndarray,
+            keyframe: bool=False,
+            score: float=1.0,
+            digest: bytes=None,
+            timestamp: float=None) -> FrameRecord:
+        """
+        Store a frame, evicting older frames to stay under the byte budget.
+
+        Returns:
+        FrameRecord: The stored record.
+        """
+        with self.lock:
+            record = FrameRecord(self.next_id, frame, keyframe, score, digest, timestamp)
+            self.next_id += 1
+
+            self.records[record.frame_id] = record
+            self.timestamps.append(record.timestamp)
+            self.frame_ids.append(record.frame_id)
+            self.nbytes += record.nbytes
+            if keyframe:
+                self.keyframe_bytes += record.nbytes
+            else:
+                self.evictable[record.frame_id] = record
+
+            evicted = self._evict()
+
+        for old in evicted:
+            if self.on_evict:
+                self.on_evict(old)
+
+        return record
+
+    def _evict(self) -> list[FrameRecord]:
+        """
+        Drop frames until the store fits its budget, the newest frame is
+        always kept. Caller holds the lock.
+        """
+        evicted = []
+        newest_id = self.next_id - 1
+        keyframe_limit = self.max_bytes * self.keyframe_share
+        while self.nbytes > self.max_bytes and len(self.records) > 1:
+            frame_id = None
+            if not self.evictable or self.keyframe_bytes > keyframe_limit:
+                # only keyframes left or they are over their share
+                frame_id = next(
+                    fid for fid, rec in self.records.items() if rec.keyframe)
+                if frame_id == newest_id:
+                    frame_id = None
+
+            if frame_id is None:
+                frame_id = next(iter(self.evictable))
+
+            self.evictable.pop(frame_id, None)
+            record = self.records.pop(frame_id)
+            idx = bisect.bisect_left(self.frame_ids, frame_id)
+            del self.frame_ids[idx]
+            del self.timestamps[idx]
+            released = record.nbytes
+            if record.keyframe:
+                self.keyframe_bytes -= released
+
+            # frames sharing memory with the next frame (tiled frames)
+            # hand over what is still in use instead of releasing it
+            if hasattr(record.frame, "hand_over"):
+                successor = next(
+                    (rec for fid, rec in self.records.items() if fid > frame_id), None)
+                if successor is not None:
+                    moved = record.frame.hand_over(successor.frame)
+                    released -= moved
+                    if successor.keyframe:
+                        self.keyframe_bytes += moved
+
+            self.nbytes -= released
+            self.evicted += 1
+            evicted.append(record)
+
+        return evicted
+
+    def get(self, frame_id: int) -> FrameRecord:
+        with self.lock:
+            return self.records.get(frame_id)
+
+    def find(self, timestamp: float) -> FrameRecord:
+        """
+        Record captured closest to a monotonic timestamp.
+        """
+        with self.lock:
+            if not self.records:
+                return None
+            idx = bisect.bisect_left(self.timestamps, timestamp)
+            candidates = [
+                self.records[frame_id] for frame_id in self.frame_ids[max(idx - 1, 0):idx + 1]]
+        return min(candidates, key=lambda record: abs(record.timestamp - timestamp))
+
+    def snapshot(self) -> list[FrameRecord]:
+        """
+        Stored records, oldest first.
+        """
+        with self.lock:
+            return list(self.records.values())
+
+    def indexed_snapshot(self) -> tuple[list[FrameRecord], list[float]]:
+        """
+        Stored records, oldest first, and their capture times.
+        """
+        with self.lock:
+            return list(self.records.values()), list(self.timestamps)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, idx: int) -> np.ndarray:
+        if idx == 0:
+            with self.lock:
+                if self.records:
+                    return next(iter(self.records.values())).array
+        return self.snapshot()[idx].array
+
+    def __iter__(self):
+        return (record.array for record in self.snapshot())
+
+    def stats(self) -> dict:
+        return {
+            "frames": len(self.records),
+            "bytes": self.nbytes,
+            "keyframe_bytes": self.keyframe_bytes,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted
+        }
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+            self.evictable.clear()
+            self.timestamps.clear()
+            self.frame_ids.clear()
+            self.nbytes = 0
+            self.keyframe_bytes = 0
@@ -0,0 +1,472 @@
+"""
+JPEG Encoders
+
+Registry of JPEG encoder backends. Every backend encodes BGR frames with the
+same quality and chroma subsampling settings, select_encoder benchmarks the
+backends available on this host and picks the fastest so CPU only hosts use
+libjpeg-turbo when it is installed and GPU hosts use nvJPEG.
+"""
+import base64
+import ctypes
+import ctypes.util
+import io
+import logging
+import os
+import threading
+import time
+import weakref
+from functools import lru_cache
+import cv2
+import numpy as np
+from PIL import Image
+
+CLIB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clib")
+
+# chroma subsampling as named by libjpeg-turbo
+SUBSAMPLING = ("444", "422", "420")
+
+logger = logging.getLogger(__name__)
+
+class JpegEncoder:
+    """
+    Base encoder, backends implement available and encode
+    """
+    name = "base"
+
+    def __init__(self, quality: int=90, subsampling: str="444"):
+        if subsampling not in SUBSAMPLING:
+            raise ValueError(f"Unknown chroma subsampling {subsampling}")
+        self.quality = quality
+        self.subsampling = subsampling
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def available(cls) -> bool:
+        return True
+
+    def encode(self, frame: np.ndarray) -> bytes:
+        """
+        Encode a BGR frame to JPEG.
+        """
+        raise NotImplementedError
+
+    def encode_base64(self, frame: np.ndarray) -> str:
+        return base64.b64encode(self.encode(frame)).decode("utf-8")
+
+    def close(self):
+        """
+        Release native resources, backends holding any override this.
+        """
+
+class OpenCVEncoder(JpegEncoder):
+    name = "opencv"
+
+    def __init__(self, quality: int=90, subsampling: str="444"):
+        super().__init__(quality, subsampling)
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        sampling = getattr(cv2, f"IMWRITE_JPEG_SAMPLING_FACTOR_{subsampling}", None)
+        if sampling is not None:
+            self.params += [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, sampling]
+
+    def encode(self, frame: np.ndarray) -> bytes:
+        ok, buffer = cv2.imencode(".jpg", frame, self.params)
+        if not ok:
+            raise ValueError("imencode failed")
+        return buffer.tobytes()
+
+class PILEncoder(JpegEncoder):
+    name = "pil"
+
+    def encode(self, frame: np.ndarray) -> bytes:
+        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        output = io.BytesIO()
+        image.save(
+            output,
+            format="JPEG",
+            quality=self.quality,
+            subsampling=SUBSAMPLING.index(self.subsampling)
+        )
+        return output.getvalue()
+
+class HandleOwner:
+    """
+    Holds a thread's native handle, the handle is released when this
+    is collected
+    """
+    def __init__(self, handle: int):
+        self.handle = handle
+
+class TurboJPEGEncoder(JpegEncoder):
+    """
+    libjpeg-turbo through its TurboJPEG C API
+    """
+    name = "turbojpeg"
+    TJPF_BGR = 1
+    lib = None
+
+    def __init__(self, quality: int=90, subsampling: str="444"):
+        super().__init__(quality, subsampling)
+        self.lib = self.load()
+        # TurboJPEG handles are not thread safe, one per encode thread,
+        # destroyed when the thread ends
+        self.local = threading.local()
+        self.handles = []
+        self.handles_lock = threading.Lock()
+
+    @classmethod
+    def load(cls):
+        if cls.lib is None:
+            path = ctypes.util.find_library("turbojpeg")
+            if path is None:
+                raise OSError("libturbojpeg not found")
+            lib = ctypes.CDLL(path)
+            lib.tjInitCompress.restype = ctypes.c_void_p
+            lib.tjCompress2.argtypes = [
+                ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_void_p),
+                ctypes.POINTER(ctypes.c_ulong), ctypes.c_int, ctypes.c_int,
+                ctypes.c_int
+            ]
+            lib.tjFree.argtypes = [ctypes.c_void_p]
+            lib.tjDestroy.argtypes = [ctypes.c_void_p]
+            cls.lib = lib
+        return cls.lib
+
+    @classmethod
+    def available(cls) -> bool:
+        try:
+            cls.load()
+            return True
+        except OSError:
+            return False
+
+    def thread_handle(self) -> int:
+        """
+        Compress handle of the calling thread, created on first use.
+        """
+        owner = getattr(self.local, "owner", None)
+        if owner is None:
+            handle = self.lib.tjInitCompress()
+            if not handle:
+                raise ValueError("tjInitCompress failed")
+            owner = HandleOwner(handle)
+            # the owner lives in thread local storage, dropped with the thread
+            finalizer = weakref.finalize(owner, self.lib.tjDestroy, handle)
+            with self.handles_lock:
+                self.handles = [f for f in self.handles if f.alive]
+                self.handles.append(finalizer)
+            self.local.owner = owner
+        return owner.handle
+
+    def close(self):
+        """
+        Destroy every compress handle, only once no thread is encoding.
+        """
+        with self.handles_lock:
+            for finalizer in self.handles:
+                finalizer()
+            self.handles.clear()
+        self.local = threading.local()
+
+    def encode(self, frame: np.ndarray) -> bytes:
+        handle = self.thread_handle()
+
+        frame = np.ascontiguousarray(frame)
+        height, width = frame.shape[:2]
+        jpeg_buffer = ctypes.c_void_p()
+        jpeg_size = ctypes.c_ulong(0)
+        status = self.lib.tjCompress2(
+            handle,
+            frame.ctypes.data,
+            width,
+            frame.strides[0],
+            height,
+            self.TJPF_BGR,
+            ctypes.byref(jpeg_buffer),
+            ctypes.byref(jpeg_size),
+            SUBSAMPLING.index(self.subsampling),
+            self.quality,
+            0
+        )
+        if status != 0:
+            raise ValueError("tjCompress2 failed")
+
+        try:
+            return ctypes.string_at(jpeg_buffer, jpeg_size.value)
+        finally:
+            self.lib.tjFree(jpeg_buffer)
+
+class NativeJpegEncoder(JpegEncoder):
+    """
+    libjpeg-turbo and base64 fused in clib/libjpeg_base64_cpu.so, built
+    with make cpu
+    """
+    name = "native"
+    lib_path = os.path.join(CLIB_DIR, "libjpeg_base64_cpu.so")
+    lib = None
+
+    def __init__(self, quality: int=90, subsampling: str="444"):
+        super().__init__(quality, subsampling)
+        self.lib = self.load()
+        # output buffers are reused per encode thread
+        self.local = threading.local()
+
+    @classmethod
+    def load(cls):
+        if cls.lib is None:
+            lib = ctypes.CDLL(cls.lib_path)
+            lib.jpeg_base64_bound.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+            lib.jpeg_base64_bound.restype = ctypes.c_size_t
+            args = [
+                ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t
+            ]
+            lib.encode_jpeg.argtypes = args
+            lib.encode_jpeg.restype = ctypes.c_long
+            lib.encode_jpeg_base64.argtypes = args
+            lib.encode_jpeg_base64.restype = ctypes.c_long
+            cls.lib = lib
+        return cls.lib
+
+    @classmethod
+    def available(cls) -> bool:
+        try:
+            cls.load()
+            return True
+        except OSError:
+            return False
+
+    def call(self, function, frame: np.ndarray) -> memoryview:
+        """
+        Run an encode function of the library into the thread's buffer,
+        the buffer grows when the output does not fit.
+        """
+        frame = np.asarray(frame)
+        if frame.strides[1:] != (3, 1):
+            frame = np.ascontiguousarray(frame)
+        height, width = frame.shape[:2]
+        subsampling = SUBSAMPLING.index(self.subsampling)
+
+        size = self.lib.jpeg_base64_bound(width, height, subsampling)
+        while True:
+            buffer = getattr(self.local, "buffer", None)
+            if buffer is None or len(buffer) < size:
+                buffer = bytearray(size)
+                self.local.buffer = buffer
+            out = (ctypes.c_char * len(buffer)).from_buffer(buffer)
+
+            length = function(
+                frame.ctypes.data,
+                width,
+                height,
+                frame.strides[0],
+                self.quality,
+                subsampling,
+                ctypes.addressof(out),
+                len(buffer)
+            )
+            if length != -2:
+                break
+            # -2, out too small
+            size = len(buffer) * 2
+
+        if length < 0:
+            raise ValueError(f"{function.__name__} failed with {length}")
+        return memoryview(buffer)[:length]
+
+    def encode(self, frame: np.ndarray) -> bytes:
+        return self.call(self.lib.encode_jpeg, frame).tobytes()
+
+    def encode_base64(self, frame: np.ndarray) -> str:
+        return str(self.call(self.lib.encode_jpeg_base64, frame), "ascii")
+
+class NvJpegEncoder(JpegEncoder):
+    """
+    nvJPEG through clib/libnvjpeg_encoder.so, only offered when a CUDA
+    device is present
+    """
+    name = "nvjpeg"
+    lib_path = os.path.join(CLIB_DIR, "libnvjpeg_encoder.so")
+    lib = None
+
+    def __init__(self, quality: int=90, subsampling: str="444"):
+        super().__init__(quality, subsampling)
+        self.lib = self.load()
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"))
+        self.libc.free.argtypes = [ctypes.c_void_p]
+        # the library keeps one encoder state
+        self.lock = threading.Lock()
+        with self.lock:
+            self.lib.set_encode_params(quality, SUBSAMPLING.index(subsampling))
+
+    @classmethod
+    def load(cls):
+        if cls.lib is None:
+            lib = ctypes.CDLL(cls.lib_path)
+            lib.encode_image.argtypes = [
+                ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+                ctypes.POINTER(ctypes.c_void_p), ctypes.POINTER(ctypes.c_size_t)
+            ]
+            lib.initialize_nvjpeg()
+            cls.lib = lib
+        return cls.lib
+
+    @classmethod
+    def available(cls) -> bool:
+        if not os.path.exists(cls.lib_path):
+            return False
+
+        path = ctypes.util.find_library("cudart")
+        if path is None:
+            return False
+        try:
+            cudart = ctypes.CDLL(path)
+            count = ctypes.c_int(0)
+            if cudart.cudaGetDeviceCount(ctypes.byref(count)) != 0 or count.value == 0:
+                return False
+            cls.load()
+            return True
+        except OSError:
+            return False
+
+    def encode(self, frame: np.ndarray) -> bytes:
+        height, width = frame.shape[:2]
+        # the library takes planar RGB
+        planar = np.ascontiguousarray(frame[..., ::-1].transpose(2, 0, 1))
+        jpeg_output = ctypes.c_void_p()
+        jpeg_length = ctypes.c_size_t(0)
+
+        with self.lock:
+            self.lib.encode_image(
+                planar.ctypes.data,
+                width,
+                height,
+                ctypes.byref(jpeg_output),
+                ctypes.byref(jpeg_length)
+            )
+
+        if not jpeg_output.value:
+            raise ValueError("nvJPEG encode failed")
+        try:
+            return ctypes.string_at(jpeg_output, jpeg_length.value)
+        finally:
+            self.libc.free(jpeg_output)
+
+class FallbackEncoder(JpegEncoder):
+    """
+    Encodes with a backend and retries a frame it fails on with OpenCV, so
+    one native failure does not fail the request
+    """
+    def __init__(self, encoder: JpegEncoder):
+        super().__init__(encoder.quality, encoder.subsampling)
+        self.encoder = encoder
+        self.name = encoder.name
+        self.fallback = OpenCVEncoder(encoder.quality, encoder.subsampling)
+
+    def encode(self, frame: np.ndarray) -> bytes:
+        try:
+            return self.encoder.encode(frame)
+        except Exception as err:
+            self.logger.error(f"JPEG encoder {self.name} failed, using opencv: {err}")
+            return self.fallback.encode(frame)
+
+    def encode_base64(self, frame: np.ndarray) -> str:
+        try:
+            return self.encoder.encode_base64(frame)
+        except Exception as err:
+            self.logger.error(f"JPEG encoder {self.name} failed, using opencv: {err}")
+            return self.fallback.encode_base64(frame)
+
+    def close(self):
+        self.encoder.close()
+
+ENCODERS = {
+    encoder.name: encoder
+    for encoder in (
+        OpenCVEncoder, PILEncoder, TurboJPEGEncoder, NativeJpegEncoder, NvJpegEncoder
+    )
+}
+
+def available_encoders() -> list[str]:
+    """
+    Names of the backends that load on this host.
+    """
+    return [name for name, encoder in ENCODERS.items() if encoder.available()]
+
+def benchmark_encoder(encoder: JpegEncoder, frame: np.ndarray, runs: int=3) -> float:
+    """
+    Best of runs base64 encode time in seconds, after one warm up encode.
+    The recorders send base64, so fused backends are timed as used.
+    """
+    encoder.encode_base64(frame)
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        encoder.encode_base64(frame)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def benchmark_frame(width: int=1280, height: int=720) -> np.ndarray:
+    """
+    Screen like test frame, flat areas with gradients and text.
+    """
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)
+    frame[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+    for y in range(20, height, 40):
+        cv2.putText(frame, "benchmark " * 12, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return frame
+
+@lru_cache(maxsize=8)
+def select_encoder(
+        quality: int=90,
+        subsampling: str="444",
+        preferred: str=None) -> JpegEncoder:
+    """
+    Pick the encoder backend for this host.
+
+    Parameters:
+    quality (int): JPEG quality, 1 to 100.
+    subsampling (str): Chroma subsampling, 444, 422 or 420.
+    preferred (str): Backend name to use when available, skips the
+        benchmark.
+
+    Returns:
+    JpegEncoder: The preferred backend, otherwise the fastest available
+    one, frames it fails on are encoded with OpenCV. Encoders are shared,
+    call with the same settings to reuse them.
+    """
+    if preferred is not None:
+        encoder = ENCODERS.get(preferred)
+        if encoder is not None and encoder.available():
+            return with_fallback(encoder(quality, subsampling))
+        logger.warning(f"JPEG encoder {preferred} not available, benchmarking")
+
+    frame = benchmark_frame()
+    timings = {}
+    fastest = None
+    for name in available_encoders():
+        try:
+            encoder = ENCODERS[name](quality, subsampling)
+            timings[name] = benchmark_encoder(encoder, frame)
+        except Exception as err:
+            logger.error(f"JPEG encoder {name} failed: {err}")
+            continue
+
+        if fastest is None or timings[name] < timings[fastest.name]:
+            fastest = encoder
+
+    if fastest is None:
+        fastest = OpenCVEncoder(quality, subsampling)
+
+    logger.info(
+        f"JPEG encoder timings {({k: round(v * 1000, 2) for k, v in timings.items()})} ms, using {fastest.name}")
+    return with_fallback(fastest)
+
+def with_fallback(encoder: JpegEncoder) -> JpegEncoder:
+    """
+    Wrap a backend in FallbackEncoder, OpenCV needs no fallback.
+    """
+    if isinstance(encoder, OpenCVEncoder):
+        return encoder
+    return FallbackEncoder(encoder)
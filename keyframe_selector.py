@@ -0,0 +1,163 @@
+"""
+Keyframe Selector
+
+Picks the frames of a recording worth sending to the LLM. Every stored
+frame carries a change score against the frame kept before it, the most
+changed frames are picked under a count or token budget so the LLM sees the
+meaningful moments instead of a fixed stride. With transcript segments the
+frames captured while the user was speaking are picked first.
+"""
+import bisect
+import logging
+
+from frame_store import FrameRecord
+
+class KeyframeSelector:
+    def __init__(self, max_frames: int=8, min_gap: float=0.5):
+        """
+        Initialize the KeyframeSelector class.
+
+        Parameters:
+        max_frames (int): Default number of frames to pick.
+        min_gap (float): Seconds two picked frames must be apart, so a burst
+            of changes does not use up the whole budget.
+        """
+        self.max_frames = max_frames
+        self.min_gap = min_gap
+        self.logger = logging.getLogger(__name__)
+
+    def select(
+            self,
+            records: list[FrameRecord],
+            max_frames: int=None,
+            max_tokens: int=None,
+            tokens_per_frame: int=None) -> list[FrameRecord]:
+        """
+        Pick the most informative frames.
+
+        The first frame sets the scene and the last one is the current state
+        so both are always picked, the rest of the budget goes to the highest
+        change scores.
+
+        Parameters:
+        records (list[FrameRecord]): Stored frames, oldest first.
+        max_frames (int): Number of frames to pick, defaults to max_frames.
+        max_tokens (int): Optional image token budget for the picked frames.
+        tokens_per_frame (int): Image tokens one frame costs.
+
+        Returns:
+        list[FrameRecord]: The picked frames, oldest first.
+        """
+        if max_frames is None:
+            max_frames = self.max_frames
+        if max_tokens is not None and tokens_per_frame:
+            max_frames = min(max_frames, max_tokens // tokens_per_frame)
+
+        if max_frames <= 0 or not records:
+            return []
+        if len(records) <= max_frames:
+            return list(records)
+
+        picked = [records[-1]]
+        if max_frames > 1:
+            picked.append(records[0])
+
+        ranked = sorted(records[1:-1], key=lambda record: record.score, reverse=True)
+        for record in ranked:
+            if len(picked) >= max_frames:
+                break
+            if all(abs(record.timestamp - other.timestamp) >= self.min_gap for other in picked):
+                picked.append(record)
+
+        # not enough frames far enough apart, fill with the best of the rest
+        for record in ranked:
+            if len(picked) >= max_frames:
+                break
+            if record not in picked:
+                picked.append(record)
+
+        picked.sort(key=lambda record: record.frame_id)
+        self.logger.info(
+            f"Picked frames {[record.frame_id for record in picked]} of {len(records)}")
+        return picked
+
+    def frames_near(
+            self,
+            records: list[FrameRecord],
+            timestamps: list[float],
+            start: float,
+            end: float) -> FrameRecord:
+        """
+        Most changed frame captured between start and end, or the frame
+        closest to that span when none was.
+
+        Parameters:
+        records (list[FrameRecord]): Stored frames, oldest first.
+        timestamps (list[float]): Capture times of records.
+        start (float): Monotonic start of the span.
+        end (float): Monotonic end of the span.
+
+        Returns:
+        FrameRecord: The frame for the span.
+        """
+        lo = bisect.bisect_left(timestamps, start)
+        hi = bisect.bisect_right(timestamps, end)
+        if lo < hi:
+            return max(records[lo:hi], key=lambda record: record.score)
+
+        candidates = records[max(lo - 1, 0):lo + 1]
+        return min(
+            candidates,
+            key=lambda record: min(abs(record.timestamp - start), abs(record.timestamp - end)))
+
+    def select_for_segments(
+            self,
+            records: list[FrameRecord],
+            segments: list,
+            max_frames: int=None,
+            timestamps: list[float]=None) -> list[FrameRecord]:
+        """
+        Pick the frames matching what the user said.
+
+        The last frame is always picked, then one frame per transcript
+        segment starting from the newest, the rest of the budget is filled
+        by change score.
+
+        Parameters:
+        records (list[FrameRecord]): Stored frames, oldest first.
+        segments (list): Transcript segments with monotonic start and end.
+        max_frames (int): Number of frames to pick, defaults to max_frames.
+        timestamps (list[float]): Capture times of records from the frame
+            store index, built from the records when not given.
+
+        Returns:
+        list[FrameRecord]: The picked frames, oldest first.
+        """
+        if max_frames is None:
+            max_frames = self.max_frames
+        if not segments:
+            return self.select(records, max_frames=max_frames)
+        if max_frames <= 0 or not records:
+            return []
+        if len(records) <= max_frames:
+            return list(records)
+
+        if timestamps is None:
+            timestamps = [record.timestamp for record in records]
+        picked = {records[-1].frame_id: records[-1]}
+        for segment in reversed(segments):
+            if len(picked) >= max_frames:
+                break
+            record = self.frames_near(records, timestamps, segment.start, segment.end)
+            picked[record.frame_id] = record
+
+        if len(picked) < max_frames:
+            rest = [record for record in records if record.frame_id not in picked]
+            for record in self.select(rest, max_frames=max_frames - len(picked)):
+                picked[record.frame_id] = record
+
+        picked = sorted(picked.values(), key=lambda record: record.frame_id)
+        self.logger.info(
+            f"Picked frames {[record.frame_id for record in picked]} of {len(records)} "
+            f"for {len(segments)} transcript segments")
+        return picked
@@ -0,0 +1,105 @@
+"""
+Lazy Import
+
+Defers heavy imports until first use so the window comes up before OpenCV,
+OpenAI, speech recognition and friends are loaded. import_report runs
+python -X importtime on a module to see what it pulls in at import.
+"""
+import importlib
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+
+logger = logging.getLogger(__name__)
+
+# seconds each lazy module took to load, in load order
+load_times: dict[str, float] = {}
+
+class LazyModule(types.ModuleType):
+    """
+    Stand in for a module, imported on first attribute access
+    """
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def load(self) -> types.ModuleType:
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    load_times[self.__name__] = time.perf_counter() - start
+                    logger.info(
+                        f"Loaded {self.__name__} in {load_times[self.__name__] * 1000:.0f}ms")
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def __dir__(self):
+        return dir(self.load())
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Module that is imported on first use, the real module if it is
+    already loaded.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+def warm_up(*modules: LazyModule):
+    """
+    Load lazy modules on a background thread, so the first use after the
+    window is up does not wait on the import.
+    """
+    def run():
+        for module in modules:
+            try:
+                if isinstance(module, LazyModule):
+                    module.load()
+            except Exception as err:
+                logger.error(f"Loading {module.__name__} failed: {err}")
+
+    threading.Thread(target=run, daemon=True).start()
+
+def import_report(module: str, python: str=sys.executable) -> dict[str, int]:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Parameters:
+    module (str): Module to import.
+    python (str): Interpreter to run.
+
+    Returns:
+    dict[str, int]: Cumulative import time in microseconds per module
+    imported, the top level module included.
+    """
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise ImportError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    report = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            # the header line
+            continue
+        report[fields[2].strip()] = int(fields[1])
+    return report
@@ -42,11 +42,18 @@ class LLM:
         ) -> str:
         """
         Send image frames and transcription text to LLM
+
+        sbframes are sent as given, the recorders pick and encode
+        the frames for a request. A frame is a base64 JPEG sent at high
+        detail or a dict with "image" and "detail" from a token plan.
         """
         
         func_resp = ""
         response_text = ""
 
+        # a crop offset only holds for the request it came with
+        self.llmfunc.crop_offset = None
+
         try:
             # Read video frames and convert to base64
             # send to LLM
@@ -67,14 +74,34 @@ class LLM:
                 # transcription_text += f"""
                 #     \n The frames were originally recorded with dimensions {frames_wh} but are scaled down to ({scaled_width},{scaled_height}). Make sure to scale up for x, y coordinates when using the mouse action. For example the scaling factor in original is (1080,3840) and scaled down to (768, 2730), scaling up the x factor is approx 1.4066 and the y is approx 1.40625
                 # """
+                images = [
+                    frame if isinstance(frame, dict) else {"image": frame, "detail": "high"}
+                    for frame in sbframes
+                ]
+                self.logger.info(f"Image details: {[image['detail'] for image in images]}")
+
+                # full resolution cursor crop, actions on positions read
+                # from it are moved into the frame by llmfunc
+                for image in images:
+                    if "crop_offset" in image:
+                        self.llmfunc.crop_offset = image["crop_offset"]
+                        transcription_text += (
+                            "\n\nThe last image is a full resolution crop of the screen around "
+                            "the mouse cursor. When using positions read from the crop, give "
+                            "them as they are in the crop and set in_crop to true."
+                        )
+
                 user_msg = {
                     "role": "user",
                     "content": [
-                        self.initial_prompt + transcription_text,
+                        {"type": "text", "text": self.initial_prompt + transcription_text},
                         *map(lambda x: {
-                            "image": x,
-                            "resize": frames_hw[1]
-                        }, sbframes[0::60]),
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{x['image']}",
+                                "detail": x["detail"]
+                            }
+                        }, images),
                     ]
                 }
 
@@ -26,6 +26,8 @@ class LLMFunctions:
         self.loop_active = True  # Variable to control the loop
 
         self.coord_trans = None
+        # top left of the cursor crop in the frame, set per request
+        self.crop_offset = None
 
         pag.FAILSAFE = False
         
@@ -91,6 +93,10 @@ class LLMFunctions:
                                     "command": {
                                         "type": "string",
                                         "description": "The bash command to execute"
+                                    },
+                                    "in_crop": {
+                                        "type": "boolean",
+                                        "description": "True when the coordinates were read from the mouse cursor crop image instead of a full screen frame"
                                     }
                                 },
                                 "required": ["type"]
@@ -122,13 +128,23 @@ class LLMFunctions:
         
         return action_response
 
+    def crop_point(self, action, x: int, y: int) -> tuple[int, int]:
+        """
+        Move a position read from the cursor crop into the full frame, other
+        positions are returned as given.
+        """
+        if action.get("in_crop") and self.crop_offset is not None:
+            return OpenAIImageCoordinateTranslator.translate_crop_coordinates(
+                x, y, self.crop_offset)
+        return x, y
+
     def perform_actions(self, actions) -> list:
         resp = []
         for action in actions:
             if action['type'] == 'move':
                 # x, y = self.coord_trans.translate_coordinates(
                 #     action['x'], action['y'])
-                x, y = (action['x'], action['y'])
+                x, y = self.crop_point(action, action['x'], action['y'])
                 pag.moveTo(x, y)
                 self.logger.info(f"Moved mouse to ({x}, {y})")
                 resp.append(f"Moved mouse to ({x}, {y})")
@@ -137,7 +153,7 @@ class LLMFunctions:
                 if "x" in action and "y" in action:
                     # x, y = self.coord_trans.translate_coordinates(
                     # action['x'], action['y'])
-                    x, y = (action['x'], action['y'])
+                    x, y = self.crop_point(action, action['x'], action['y'])
                     pag.moveTo(x, y)
                     self.logger.info(f"Moved mouse to ({x}, {y})")
                 button = action.get('button', 'left')
@@ -154,12 +170,17 @@ class LLMFunctions:
                 resp.append(f"Moved mouse relative by ({dx}, {dy})")
                 time.sleep(1)
             elif action['type'] == 'drag':
-                x, y = self.coord_trans.translate_coordinates(
-                    action['x'], action['y'])
-                # x, y = (action['x'], action['y'])
-                end_x, end_y = self.coord_trans.translate_coordinates(
-                    action['end_x'], action['end_y'])
-                # end_x, end_y = (action['end_x'], action['end_y'])
+                if action.get("in_crop") and self.crop_offset is not None:
+                    # the crop is full resolution, no scaling
+                    x, y = self.crop_point(action, action['x'], action['y'])
+                    end_x, end_y = self.crop_point(action, action['end_x'], action['end_y'])
+                else:
+                    x, y = self.coord_trans.translate_coordinates(
+                        action['x'], action['y'])
+                    # x, y = (action['x'], action['y'])
+                    end_x, end_y = self.coord_trans.translate_coordinates(
+                        action['end_x'], action['end_y'])
+                    # end_x, end_y = (action['end_x'], action['end_y'])
                 button = action.get('button', 'left')
                 pag.mouseDown(x, y, button=button)
                 pag.moveTo(end_x, end_y)
@@ -4,9 +4,96 @@ OpenAI Image Coordinate Translator
 Takes coordinates from OpenAI drived from an image sent to it and translates it back to the image's native resolution. This is done due to OpenAI Vision shrinking images for processing.
 """
 import logging
+import math
 import pyautogui as pag
 import numpy as np
 
+# OpenAI vision pricing, a low detail image is a flat cost and a high
+# detail image adds a cost per 512px tile of the resized image
+LOW_DETAIL_TOKENS = 85
+TILE_TOKENS = 170
+
+def estimate_image_tokens(width: int, height: int, detail: str='high') -> int:
+    """
+    Estimate the image tokens of a frame sent at a detail level.
+
+    Parameters:
+    width (int): Original width of the frame.
+    height (int): Original height of the frame.
+    detail (str): 'high' or 'low'.
+
+    Returns:
+    int: Estimated image tokens.
+    """
+    if detail == 'low':
+        return LOW_DETAIL_TOKENS
+
+    resized_width, resized_height = OpenAIImageCoordinateTranslator(
+        width, height, quality=detail).calculate_resized_dimensions()
+    tiles = math.ceil(resized_width / 512) * math.ceil(resized_height / 512)
+    return LOW_DETAIL_TOKENS + TILE_TOKENS * tiles
+
+class ImageTokenPlanner:
+    def __init__(self, max_tokens: int=None, max_frames: int=8):
+        """
+        Initialize the ImageTokenPlanner class.
+
+        Parameters:
+        max_tokens (int): Image token budget per request, None for no budget.
+        max_frames (int): Most frames to send per request.
+        """
+        self.max_tokens = max_tokens
+        self.max_frames = max_frames
+        self.logger = logging.getLogger(__name__)
+
+    def plan(
+            self,
+            width: int,
+            height: int,
+            count: int,
+            max_tokens: int=None,
+            max_frames: int=None) -> list[str]:
+        """
+        Choose how many frames to send and the detail of each.
+
+        As many frames as fit are sent at low detail, the spare budget then
+        upgrades frames to high detail starting from the newest, which is
+        the one the LLM acts on.
+
+        Parameters:
+        width (int): Frame width.
+        height (int): Frame height.
+        count (int): Frames available.
+        max_tokens (int): Overrides the planner budget.
+        max_frames (int): Overrides the planner frame limit.
+
+        Returns:
+        list[str]: Detail per frame to send, oldest first.
+        """
+        if max_tokens is None:
+            max_tokens = self.max_tokens
+        if max_frames is None:
+            max_frames = self.max_frames
+
+        frames = min(count, max_frames)
+        if max_tokens is None:
+            return ['high'] * frames
+
+        frames = min(frames, max_tokens // LOW_DETAIL_TOKENS)
+        details = ['low'] * frames
+        spare = max_tokens - frames * LOW_DETAIL_TOKENS
+        upgrade = estimate_image_tokens(width, height, 'high') - LOW_DETAIL_TOKENS
+        for idx in reversed(range(frames)):
+            if spare < upgrade:
+                break
+            details[idx] = 'high'
+            spare -= upgrade
+
+        self.logger.info(
+            f"Planned {details.count('high')} high and {details.count('low')} low detail frames, "
+            f"{max_tokens - spare} of {max_tokens} image tokens")
+        return details
+
 class OpenAIImageCoordinateTranslator:
     def __init__(self, original_width, original_height, quality='high'):
         """
@@ -86,4 +173,22 @@ class OpenAIImageCoordinateTranslator:
 
         self.logger.info(f"Translated coordinates: x: {target_x} y: {target_y}")
         
-        return target_x, target_y
\ No newline at end of file
+        return target_x, target_y
+
+    @staticmethod
+    def translate_crop_coordinates(
+            crop_x: int,
+            crop_y: int,
+            crop_offset: tuple[int, int]) -> tuple[int, int]:
+        """
+        Translate coordinates in a full resolution crop to the original image.
+
+        Parameters:
+        crop_x (int): The x coordinate in the crop.
+        crop_y (int): The y coordinate in the crop.
+        crop_offset (tuple): Top left corner of the crop in the original image.
+
+        Returns:
+        tuple: A tuple containing the x and y coordinates in the original image.
+        """
+        return int(crop_offset[0] + crop_x), int(crop_offset[1] + crop_y)
\ No newline at end of file
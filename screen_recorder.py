@@ -1,157 +1,533 @@
 import cv2
-import ctypes
 import numpy as np
-import mss
-import base64
-# import sqlite3
+import pyautogui as pag
 import shortuuid
 import logging
 import os
 import threading
-# from datetime import datetime
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from datetime import datetime
 # from PIL import Image, ImageDraw, ImageFont
 from PIL import Image
 
-from oai_ict import OpenAIImageCoordinateTranslator
+from oai_ict import OpenAIImageCoordinateTranslator, ImageTokenPlanner, estimate_image_tokens
+from frame_dedup import FrameDeduplicator
+from frame_pacer import FramePacer
+from frame_store import FrameStore, FrameRecord
+from disk_frame_store import DiskFrameStore
+from stage_stats import StageStats
+from capture_session import CaptureSession
+from keyframe_selector import KeyframeSelector
+from tile_delta import TileTracker
+from jpeg_encoders import select_encoder
+
+@lru_cache(maxsize=8)
+def render_grid_overlay(
+        width: int,
+        height: int,
+        grid_size: int,
+        font_scale: float=0.4,
+        font_thickness: int=1,
+        alpha: float=0.1) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Render the coordinate labels of a grid once per resolution.
+
+    The labels are drawn into a single channel mask which is reduced to the
+    flat pixel indices it covers and their blend weights, so compositing
+    only touches the text pixels.
+
+    Parameters:
+    width (int): Frame width.
+    height (int): Frame height.
+    grid_size (int): The size of each grid cell.
+    font_scale (float): Scale of the font.
+    font_thickness (int): Thickness of the font.
+    alpha (float): Transparency factor of the text (0.0 to 1.0).
+
+    Returns:
+    tuple: Flat pixel indices and (n, 1) float32 blend weights.
+    """
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for x in range(0, width, grid_size):
+        for y in range(0, height, grid_size):
+            cv2.putText(
+                mask,
+                f"{x},{y}",
+                (x, y),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                font_scale,
+                255,
+                font_thickness,
+                cv2.LINE_AA
+            )
+
+    indices = np.flatnonzero(mask)
+    weights = mask.ravel()[indices].astype(np.float32)[:, None] * (alpha / 255.0)
+    indices.flags.writeable = False
+    weights.flags.writeable = False
+
+    return indices, weights
 
 class ScreenRecorder:
-    def __init__(self, monitor_number: int=1):
+    def __init__(
+            self,
+            monitor_number: int=1,
+            similarity_threshold: float=0.02,
+            target_fps: float=10.0,
+            max_request_frames: int=8,
+            max_bytes: int=2 << 30,
+            keyframe_threshold: float=0.25,
+            queue_size: int=8,
+            encode_workers: int=None,
+            session: CaptureSession=None,
+            tile_size: int=None,
+            disk_store: bool=False,
+            jpeg_quality: int=90,
+            jpeg_subsampling: str="444",
+            jpeg_encoder: str=None,
+            image_token_budget: int=4000,
+            cursor_crop_size: int=None):
         self.record_id = shortuuid.uuid()
         self.monitor_number = monitor_number
-        self.frames: list[np.ndarray] = []
-        self.max_frames = 3000
-        self.base64_frames: list[str] = []
+        self.root_dir = os.path.dirname(os.path.abspath(__file__))
+        # shared sessions stay open between recordings and agent steps
+        self.session = session if session is not None else CaptureSession()
+        if disk_store:
+            # long recordings spill to disk, only frames waiting for
+            # the writer are held in memory
+            cdate = datetime.now().strftime("%Y%d%m_%H%M%S")
+            self.frames = DiskFrameStore(
+                f"{self.root_dir}/data/sr{cdate}",
+                record_id=self.record_id,
+                on_evict=self.on_frame_spilled
+            )
+        else:
+            # recording length is bounded by memory, not frame count
+            self.frames = FrameStore(
+                max_bytes=max_bytes,
+                on_evict=self.on_frame_evicted
+            )
+        # change score from which a frame is kept as a keyframe
+        self.keyframe_threshold = keyframe_threshold
+        # frames are only encoded when picked for a request,
+        # cached by frame id and detail
+        self.encoded_frames: dict[tuple[int, str], str] = {}
         self.is_recording = False
         self.logger = logging.getLogger(__name__)
-        self.root_dir = os.path.dirname(os.path.abspath(__file__))
         self.sampled_coords = []
+        self.dedup = FrameDeduplicator(similarity_threshold=similarity_threshold)
+        self.pacer = FramePacer(target_fps=target_fps)
+        # frames sent to the LLM are picked by scene change
+        self.keyframe_selector = KeyframeSelector(max_frames=max_request_frames)
+        # frame count and detail per request are planned under a token budget
+        self.token_planner = ImageTokenPlanner(
+            max_tokens=image_token_budget,
+            max_frames=max_request_frames
+        )
+        # full resolution crop around the mouse cursor sent with the
+        # downscaled frames, so small UI text stays readable
+        self.cursor_crop_size = cursor_crop_size
+        self.cursor = None
+        self.crop_offset = None
+
+        # capture -> process runs on two threads joined by a bounded queue,
+        # encode runs on a thread pool when frames are picked for a request
+        self.capture_queue = queue.Queue(maxsize=queue_size)
+        self.queue_drops = 0
+        # last frame dropped by dedup, kept anyway when recording stops
+        self.skipped = None
+        self.encode_workers = encode_workers or min(8, os.cpu_count() or 1)
+        # kept for the life of the recorder so the per worker overlay and
+        # encoder buffers are reused between requests
+        self.encode_pool = ThreadPoolExecutor(
+            max_workers=self.encode_workers, thread_name_prefix="encode")
+        self.stage_stats = {
+            "capture": StageStats("capture"),
+            "process": StageStats("process"),
+            "encode": StageStats("encode")
+        }
+
+        # reused destination buffers, BGRA -> BGR for the process stage
+        # and per encode worker for the grid overlay
+        self.bgr_buffer = None
+        self.overlay_buffers = threading.local()
+
+        # the all monitors desktop is stored as dirty tiles, only changed
+        # tiles are converted and stored
+        if tile_size is None and monitor_number == 0:
+            tile_size = 256
+        self.tile_tracker = TileTracker(tile_size) if tile_size else None
+
+        # fastest JPEG backend on this host, nvJPEG when a GPU is present
+        self.encoder = select_encoder(jpeg_quality, jpeg_subsampling, jpeg_encoder)
+
+    def process_frame(
+            self,
+            frame: np.ndarray,
+            use_cuda=False,
+            timestamp: float=None,
+            final: bool=False):
+        """
+        Store a captured frame if it is not a duplicate.
 
-        # Load NVJPEG shared library
-        # self.nvjpeg = ctypes.CDLL('./clib/libnvjpeg_encoder.so')
-        # self.nvjpeg.initialize_nvjpeg()
-
-        # setup sqlite for desk storage of frames for longer recordings
-        # cdate = datetime.now().strftime("%Y%d%m_%H%M%S")
-        # self.sqldb = f"{self.root_dir}/data/sr{cdate}.sql"
-        # self.sqlconn = sqlite3.connect(
-        #     self.sqldb,
-        #     check_same_thread=False
-        # )
-        # self.sqlcursor = self.sqlconn.cursor()
-        
-        # try:
-        #     self.sqlcursor.execute(
-        #         """ CREATE TABLE frames (
-        #             id INTEGER PRIMARY KEY, record_id TEXT, frame BLOB
-        #         )""")
-        # except sqlite3.OperationalError:
-        #     pass
-
-    def process_frame(self, frame: np.ndarray, use_cuda=False):
-        # process the frame and convert to base64
-        # cuda current not working, working on fix
-
-        self.convert_frames_to_base64(frame)
-
-        # if use_cuda:
-        #     frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-        #     self.cuda_convert_frame_to_pybase64(frame)
-        # else:
-        #     # uses opencv
-        #     self.convert_frames_to_base64(frame)
+        Exact and near duplicate frames are dropped here, before any grid
+        overlay, resize or encode work. Kept frames stay raw until
+        get_base64_frames picks them for a request.
+
+        The frame is converted into a reused BGR buffer, only frames that
+        are kept are copied out of it. With tiling on, only the tiles that
+        changed since the last stored frame are converted and stored.
+
+        timestamp is the monotonic capture time, now when not given. The
+        final frame of a recording is only dropped when it is a copy of the
+        last stored frame, so the screen the user ended on is always sent.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        if self.tile_tracker is not None:
+            self.process_tiled_frame(frame, timestamp, final)
+            return
+
+        original = frame
+        frame = self.to_bgr(frame)
+        if self.dedup.check_and_add(frame, copy=True, final=final):
+            self.logger.info("Frame already present in memory, skipping")
+            self.skipped = (original, timestamp)
+            return
+
+        self.put_frame(self.dedup.last_kept, timestamp)
+
+    def process_tiled_frame(self, frame: np.ndarray, timestamp: float=None, final: bool=False):
+        digests = self.tile_tracker.digests(frame)
+        if self.dedup.check(frame, self.tile_tracker.frame_digest(frame, digests), final):
+            self.logger.info("Frame already present in memory, skipping")
+            self.skipped = (frame, timestamp)
+            return
+
+        tiled = self.tile_tracker.commit(frame, digests)
+        self.dedup.keep(tiled)
+        self.put_frame(tiled, timestamp)
+
+    def to_bgr(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Convert a BGRA frame into the reused BGR buffer.
+
+        Returns:
+        np.ndarray: The BGR buffer, or the frame itself if it has no alpha.
+        """
+        if frame.shape[2] != 4:
+            return frame
+
+        height, width, _ = frame.shape
+        if self.bgr_buffer is None or self.bgr_buffer.shape[:2] != (height, width):
+            self.bgr_buffer = np.empty((height, width, 3), dtype=np.uint8)
+
+        cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=self.bgr_buffer)
+        return self.bgr_buffer
+
+    def on_frame_evicted(self, record: FrameRecord):
+        for detail in ("high", "low"):
+            self.encoded_frames.pop((record.frame_id, detail), None)
+        self.dedup.remove(record.digest, record.frame)
+
+    def on_frame_spilled(self, record: FrameRecord):
+        # written to disk, the frame can still be read so encodes stay cached
+        self.dedup.remove(record.digest, record.frame)
     
     def start_recording(self):
         self.is_recording = True
 
         self.logger.info(f"Starting Monitor {self.monitor_number} Recording...")
 
+        self.pacer.reset()
+        for stage in self.stage_stats.values():
+            stage.reset()
+
+        process_thread = threading.Thread(target=self.process_frames)
+        process_thread.start()
+
+        # last grabbed frame if the queue dropped it
+        dropped = None
         try:
             fcnt = 1
-            with mss.mss() as sct:
-                monitor = sct.monitors[self.monitor_number]
-                while self.is_recording:
-                    if fcnt == self.max_frames:
-                        self.logger.info(f"Stopped at frame {self.max_frames} due to AI model space")
-                        break
-
-                    self.process_frame(
-                        np.array(sct.grab(monitor)))
-                    
-                    self.logger.info(f"Captured frame {fcnt}")
-                    fcnt += 1
-            
-                self.logger.info("Stopped Monitor Recording")
+            while self.is_recording:
+                self.pacer.wait()
+                with self.stage_stats["capture"].measure():
+                    frame = self.session.grab(self.monitor_number)
+                    timestamp = time.monotonic()
+                    if self.cursor_crop_size:
+                        self.cursor = self.cursor_position()
+
+                dropped = None if self.enqueue_frame(frame, timestamp) else (frame, timestamp)
+                
+                self.logger.info(f"Captured frame {fcnt}")
+                fcnt += 1
+        
+            self.logger.info("Stopped Monitor Recording")
         except Exception as err:
             self.logger.error(f"Monitor Recording failed: {err}")
+        finally:
+            if dropped is not None:
+                # the final screen state is always processed
+                self.capture_queue.put(dropped)
+                self.queue_drops -= 1
+            # sentinel, process thread drains the queue then exits
+            self.capture_queue.put(None)
+            process_thread.join()
+            # the next recording thread reuses the handle
+            self.session.release()
+
+        self.logger.info(f"Dedup stats: {self.dedup.stats()}")
+        self.logger.info(f"Pacing stats: {self.pacer.stats()}")
+        self.logger.info(f"Frame store stats: {self.frames.stats()}")
+        if self.tile_tracker is not None:
+            self.logger.info(f"Tile stats: {self.tile_tracker.stats()}")
+        self.logger.info(f"Pipeline stats: {self.pipeline_stats()}")
+
+    def enqueue_frame(self, frame: np.ndarray, timestamp: float=None) -> bool:
+        """
+        Hand a grabbed frame and its capture time to the process stage
+        without blocking capture. When the queue is full the frame is dropped.
+
+        Returns:
+        bool: False if the frame was dropped.
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        try:
+            self.capture_queue.put_nowait((frame, timestamp))
+            return True
+        except queue.Full:
+            self.queue_drops += 1
+            self.logger.info("Process stage behind, dropping frame")
+            return False
+
+    def process_frames(self):
+        """
+        Process stage, dedups and stores frames from the capture queue.
+        When recording stops the last frame is stored even if dedup
+        dropped it as a near duplicate.
+        """
+        self.skipped = None
+        while True:
+            item = self.capture_queue.get()
+            if item is None:
+                self.keep_final_frame()
+                break
+
+            frame, timestamp = item
+            try:
+                with self.stage_stats["process"].measure():
+                    self.process_frame(frame, timestamp=timestamp)
+            except Exception as err:
+                self.logger.error(f"Processing frame failed: {err}")
+
+    def keep_final_frame(self):
+        if self.skipped is None:
+            return
+        frame, timestamp = self.skipped
+        self.skipped = None
+        try:
+            self.process_frame(frame, timestamp=timestamp, final=True)
+        except Exception as err:
+            self.logger.error(f"Processing final frame failed: {err}")
+
+    def pipeline_stats(self) -> dict:
+        stats = {name: stage.stats() for name, stage in self.stage_stats.items()}
+        stats["queue_drops"] = self.queue_drops
+        return stats
 
     def stop_recording(self):
         self.logger.debug("stop_recording called")
         self.is_recording = False
-        # self.frames = self.get_frames()
 
     def get_frame(self):
-        with mss.mss() as sct:
-            if self.monitor_number == -1 and len(sct.monitors) >= 3:
-                screen_caps = [np.array(sct.grab(sct.monitors[i])) for i in range(1, len(sct.monitors))]
-                # hstack
-                combined_monitors = np.hstack(tuple(screen_caps))
-
-                # process
-                self.process_frame(
-                    combined_monitors,
-                    True
-                )
-            else:
-                if self.monitor_number == -1:
-                    self.monitor_number == 1
-
-                monitor = sct.monitors[self.monitor_number]
-                self.process_frame(
-                    np.array(sct.grab(monitor)), True)
-                
+        """
+        Capture a single frame from the capture session
+        """
+        frame = self.session.grab_latest(self.monitor_number)
+        timestamp = time.monotonic()
+        if self.cursor_crop_size:
+            self.cursor = self.cursor_position()
+        self.process_frame(frame, True, timestamp)
+
+    def cursor_position(self) -> tuple[int, int]:
+        """
+        Mouse cursor position in the captured frame, None when the cursor
+        is on another monitor.
+        """
+        try:
+            x, y = pag.position()
+            return self.session.frame_position(self.monitor_number, x, y)
+        except Exception as err:
+            self.logger.error(f"Reading cursor position failed: {err}")
+            return None
 
-    def put_frame(self, bframe):
+    def get_cursor_crop(self, record: FrameRecord) -> dict:
+        """
+        Encode a full resolution crop of a frame around the last cursor
+        position, the crop offset is kept in crop_offset.
+
+        Returns:
+        dict: {"image": base64 JPEG, "detail": "high", "crop_offset": (x, y)},
+        None without a cursor position.
         """
-        Store base64 frame in database
+        if not self.cursor_crop_size or self.cursor is None:
+            return None
+
+        height, width = record.shape[:2]
+        crop_width = min(self.cursor_crop_size, width)
+        crop_height = min(self.cursor_crop_size, height)
+        x, y = self.cursor
+        left = min(max(x - crop_width // 2, 0), width - crop_width)
+        top = min(max(y - crop_height // 2, 0), height - crop_height)
+
+        crop = np.ascontiguousarray(
+            record.array[top:top + crop_height, left:left + crop_width])
+        self.crop_offset = (left, top)
+        self.logger.info(f"Cursor crop {crop_width}x{crop_height} at {self.crop_offset}")
+
+        return {
+            "image": self.encoder.encode_base64(crop),
+            "detail": "high",
+            "crop_offset": self.crop_offset
+        }
+
+    def reset(self):
+        """
+        Clear stored frames for a new capture, the capture session and
+        reused buffers are kept.
+        """
+        self.frames.clear()
+        self.encoded_frames.clear()
+        self.dedup.clear()
+        self.pacer.reset()
+        if self.tile_tracker is not None:
+            self.tile_tracker.reset()
+
+    def put_frame(self, frame: np.ndarray, timestamp: float=None):
+        """
+        Store raw frame, first frames and scene changes are kept as keyframes
         """
         self.logger.info("Adding frame")
-        # self.frames.append(bframe)
-        if not np.isin(bframe, self.frames):
-            self.base64_frames.append(bframe)
-        else:
-            self.logger.info("Skipping frame, already present")
-
-        # sql issue not waiting long enough for writes to complete
-        # and causing a sig fault when trying to access db
-        # working on fix
-        # self.sqlcursor.execute(
-        #     "INSERT INTO frames (record_id, frame) VALUES (?,?)",
-        #     (self.record_id, bframe)
-        # )
-
-        # self.sqlconn.commit()
-
-    # def get_frames(self):
-    #     """
-    #     Get frames from database per record_id
-    #     """
-    #     self.logger.info(f"getting frames for recording {self.record_id}")
-    #     self.sqlcursor.execute(
-    #         "SELECT frame FROM frames WHERE record_id=?",
-    #         (self.record_id,)
-    #     )
-        
-    #     rows = self.sqlcursor.fetchall()
-    #     return [row[0] for row in rows]
+        self.skipped = None
+        score = self.dedup.last_score
+        self.frames.append(
+            frame,
+            keyframe=score >= self.keyframe_threshold,
+            score=score,
+            digest=self.dedup.last_digest,
+            timestamp=timestamp
+        )
+
+    def close(self, remove: bool=False):
+        """
+        Stop the encode pool and release the frame store, a disk store
+        stops its writer.
+
+        Parameters:
+        remove (bool): Delete the frames written to disk.
+        """
+        self.encode_pool.shutdown(wait=True)
+        if isinstance(self.frames, DiskFrameStore):
+            self.frames.close(remove=remove)
+
+    def get_base64_frames(
+            self,
+            max_frames: int=None,
+            max_tokens: int=None,
+            tokens_per_frame: int=None) -> list[str]:
+        """
+        Encode the frames picked for a request.
+
+        The keyframe selector picks the most changed frames under the
+        count or token budget, only those go through the grid overlay,
+        resize and JPEG encode. Encoded frames are cached by frame id so
+        repeated requests do not encode twice.
+
+        Parameters:
+        max_frames (int): Number of frames to send, defaults to max_request_frames.
+        max_tokens (int): Optional image token budget.
+        tokens_per_frame (int): Image tokens one frame costs.
+
+        Returns:
+        list[str]: base64 JPEG frames, oldest first.
+        """
+        records = self.keyframe_selector.select(
+            self.frames.snapshot(),
+            max_frames=max_frames,
+            max_tokens=max_tokens,
+            tokens_per_frame=tokens_per_frame
+        )
+        self.encode_records(records)
+
+        base64_frames = [self.encoded_frames[(record.frame_id, "high")] for record in records]
+
+        self.logger.info(f"Encoded {len(base64_frames)} of {len(self.frames)} frames")
+        return base64_frames
+
+    def get_request_frames(
+            self,
+            max_tokens: int=None,
+            max_frames: int=None,
+            segments: list=None) -> list[dict]:
+        """
+        Encode the frames for a request under the image token budget.
+
+        The token planner decides how many frames fit and which are sent
+        at high or low detail, the keyframe selector picks that many,
+        following the transcript segments when given.
+
+        Parameters:
+        max_tokens (int): Image token budget, defaults to image_token_budget.
+        max_frames (int): Most frames to send, defaults to max_request_frames.
+        segments (list): Transcript segments of the request.
+
+        Returns:
+        list[dict]: {"image": base64 JPEG, "detail": "high" or "low"},
+        oldest first, followed by the cursor crop when enabled.
+        """
+        snapshot, timestamps = self.frames.indexed_snapshot()
+        if not snapshot:
+            return []
+
+        # the cursor crop is sent last and paid for first
+        crop = self.get_cursor_crop(snapshot[-1])
+        if max_tokens is None:
+            max_tokens = self.token_planner.max_tokens
+        if crop is not None and max_tokens is not None:
+            max_tokens = max(0, max_tokens - estimate_image_tokens(
+                min(self.cursor_crop_size, snapshot[-1].shape[1]),
+                min(self.cursor_crop_size, snapshot[-1].shape[0])
+            ))
+
+        height, width = snapshot[-1].shape[:2]
+        details = self.token_planner.plan(
+            width, height, len(snapshot), max_tokens=max_tokens, max_frames=max_frames)
+        records = self.keyframe_selector.select_for_segments(
+            snapshot, segments, max_frames=len(details), timestamps=timestamps)
+        self.encode_records(records, details)
+
+        request_frames = [
+            {"image": self.encoded_frames[(record.frame_id, detail)], "detail": detail}
+            for record, detail in zip(records, details)
+        ]
+        if crop is not None:
+            request_frames.append(crop)
+
+        self.logger.info(f"Encoded {len(request_frames)} of {len(self.frames)} frames")
+        return request_frames
     
     def frame_in_list(self, frame):
         """
         Check if a given frame is present in a list of frames.
+        Uses the fingerprint index so the check does not grow with the recording.
         """
-        for f in self.frames:
-            if np.array_equal(frame, f):
-                return True
-        return False
+        return self.dedup.is_duplicate(frame)
     
     def add_transparent_text(
             self,
@@ -191,35 +567,34 @@ class ScreenRecorder:
         grid_size (int): The size of each grid cell.
 
         Returns:
-        np.ndarray: The image with the grid overlay and coordinates.
+        np.ndarray: The image with the grid overlay and coordinates. This is
+        a per thread buffer, it is overwritten by the next call.
         """
         # Ensure image is in RGB mode
+        # stored frames are never blended into, the overlay is drawn on
+        # this worker's reused buffer
         self.logger.info(f"image_array.shape {image_array.shape}")
-        if image_array.shape[2] == 4:
-            image_array = cv2.cvtColor(image_array, cv2.COLOR_BGRA2BGR)
+        height, width = image_array.shape[:2]
+        buffer = getattr(self.overlay_buffers, "frame", None)
+        if buffer is None or buffer.shape[:2] != (height, width):
+            buffer = np.empty((height, width, 3), dtype=np.uint8)
+            self.overlay_buffers.frame = buffer
 
-        # Get image dimensions
-        height, width, _ = image_array.shape
-
-        # Convert the PIL image back to a numpy array
-        # result_array = np.array(image)
+        if image_array.shape[2] == 4:
+            image_array = cv2.cvtColor(image_array, cv2.COLOR_BGRA2BGR, dst=buffer)
+        else:
+            np.copyto(buffer, image_array)
+            image_array = buffer
 
         # Draw coordinates at intersections
-        # Using opencv for transparent text
-
-        text_positions = [(x, y) for x in range(0, width, grid_size) for y in range(0, height, grid_size)]
-        text_list = [f"{x},{y}" for x, y in text_positions]
-
-        # Draw coordinates at intersections using add_transparent_text method
-        for pos, text in zip(text_positions, text_list):
-            image_array = self.add_transparent_text(
-                image_array, 
-                text, 
-                (pos[0], pos[1]), 
-                0.4, 
-                (255, 255, 255, 255), 
-                1, 
-                0.1)
+        # The white labels are rendered once per resolution and blended
+        # in one pass, same result as add_transparent_text per label
+        indices, weights = render_grid_overlay(width, height, grid_size)
+
+        pixels = image_array.reshape(-1, 3)
+        text_pixels = pixels[indices].astype(np.float32)
+        text_pixels += (255.0 - text_pixels) * weights
+        pixels[indices] = text_pixels + 0.5
         
         # for x in range(0, width, grid_size):
         #     for y in range(0, height, grid_size):
@@ -236,12 +611,13 @@ class ScreenRecorder:
         return image_array
 
     
-    def oai_resize_image(self, frame: np.ndarray) -> np.ndarray:
+    def oai_resize_image(self, frame: np.ndarray, detail: str="high") -> np.ndarray:
         """
         Resizes the image to OpenAI format.
 
         Parameters:
         frame (np.ndarray): The input image array.
+        detail (str): OpenAI detail level the image is sent at.
 
         Returns:
         np.ndarray: The resized image array.
@@ -249,7 +625,8 @@ class ScreenRecorder:
         # resize to openai format
         oai_coord = OpenAIImageCoordinateTranslator(
             original_width=frame.shape[1],
-            original_height=frame.shape[0]
+            original_height=frame.shape[0],
+            quality=detail
         )
 
         resized_width, resized_height = oai_coord.calculate_resized_dimensions()
@@ -269,70 +646,58 @@ class ScreenRecorder:
 
 
         
-    def cuda_convert_frame_to_pybase64(self, frame):
-        self.logger.info("[cjpeg] converting frame to b64")
-        self.logger.info(f"frame shape: {frame.shape}")
-
-        height, width, _ = frame.shape
-        d_image = frame.ctypes.data_as(ctypes.POINTER(ctypes.c_ubyte))
-
-        jpeg_output = ctypes.POINTER(ctypes.c_ubyte)()
-        jpeg_length = ctypes.c_size_t()
-
-        self.nvjpeg.encode_image(
-            d_image,
-            width,
-            height,
-            ctypes.byref(jpeg_output),
-            ctypes.byref(jpeg_length)
-        )
-
-        jpeg_image = ctypes.string_at(jpeg_output, jpeg_length.value)
-
-        self.logger.info(f"jpeg_image: {len(jpeg_image)}")
+    def encode_records(self, records: list[FrameRecord], details: list[str]=None):
+        """
+        Encode the records not yet in the encode cache on the worker pool.
+        OpenCV and PIL release the GIL so the frames encode in parallel.
 
-        base64_image = base64.b64encode(jpeg_image).decode('utf-8')
+        Parameters:
+        records (list[FrameRecord]): Records to encode.
+        details (list[str]): Detail per record, high when not given.
+        """
+        if details is None:
+            details = ["high"] * len(records)
 
-        self.logger.info(f"base64_image: {len(base64_image)}")
+        pending = [
+            (record, detail) for record, detail in zip(records, details)
+            if (record.frame_id, detail) not in self.encoded_frames
+        ]
+        if not pending:
+            return
 
-        put_thread = threading.Thread(
-            target=self.put_frame,
-            args=(base64_image,)
-        )
+        def encode(item: tuple[FrameRecord, str]) -> str:
+            record, detail = item
+            with self.stage_stats["encode"].measure():
+                return self.convert_frames_to_base64(record.array, detail)
 
-        put_thread.start()
+        for (record, detail), bframe in zip(pending, self.encode_pool.map(encode, pending)):
+            self.encoded_frames[(record.frame_id, detail)] = bframe
 
-        libc = ctypes.CDLL('libc.so.6')
-        libc.free(jpeg_output)
+        self.logger.info(f"Encode stats: {self.stage_stats['encode'].stats()}")
 
-        self.logger.info("conversion completed")
-    
-    def convert_frames_to_base64(self, frame: np.ndarray):
+    def convert_frames_to_base64(self, frame: np.ndarray, detail: str="high") -> str:
         """
-        Using python opencv library to encode frame to jpeg image
+        Encode frame to jpeg image with the selected encoder backend
         then converting to base64
-        """
-        if not self.frame_in_list(frame):
-            self.frames.append(frame)
-            self.logger.info(f"[ocv] converting frame to b64")
 
-            # Add grid overlay
-            frame = self.add_grid_overlay(image_array=frame)
+        Parameters:
+        frame (np.ndarray): Raw captured frame.
+        detail (str): OpenAI detail level, low detail frames are resized
+            to fit 512px.
 
-            # resize to oai
-            frame = self.oai_resize_image(frame)
+        Returns:
+        str: base64 JPEG of the frame with grid overlay, resized to OpenAI format.
+        """
+        self.logger.info(f"[{self.encoder.name}] converting frame to b64")
 
-            # Encode frame to JPEG format
-            _, buffer = cv2.imencode('.jpg', frame)
+        # Add grid overlay
+        frame = self.add_grid_overlay(image_array=frame)
 
-            # Convert buffer to base64 and store in db
-            self.put_frame(
-                base64.b64encode(buffer).decode('utf-8')
-            )
+        # resize to oai
+        frame = self.oai_resize_image(frame, detail)
 
-            self.logger.info("conversion completed")
-        else:
-            self.logger.info("Frame already present in memory, skipping")
+        # Encode frame to JPEG format
+        bframe = self.encoder.encode_base64(frame)
 
-    # def __del__(self):
-        # self.sqlconn.close()
+        self.logger.info("conversion completed")
+        return bframe
@@ -0,0 +1,51 @@
+"""
+Stage Stats
+
+Throughput counters for the stages of the recording pipeline. Each stage
+records how many items it handled and how long it was busy so per stage
+rates can be logged when a recording stops.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def measure(self):
+        """
+        Time one item of work in this stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.items += 1
+                self.busy_seconds += elapsed
+
+    def reset(self):
+        with self.lock:
+            self.items = 0
+            self.busy_seconds = 0.0
+            self.started = time.monotonic()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+        dict: items handled, items per wall clock second and busy ms per item.
+        """
+        with self.lock:
+            wall = max(time.monotonic() - self.started, 1e-9)
+            return {
+                "items": self.items,
+                "per_second": round(self.items / wall, 2),
+                "avg_ms": round(self.busy_seconds * 1000 / self.items, 2) if self.items else 0.0
+            }
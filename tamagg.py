@@ -1,21 +1,24 @@
 import tkinter as tk
 import tkinter.ttk as ttk
 import threading
-import mss
 import logging
 import time
-import pyaudio
 import os
 from dotenv import load_dotenv
-import cv2
 import platform
 
-from transcriber import Transcriber
 from console_display import ConsoleDisplay
-from screen_recorder import ScreenRecorder
-from cam_recorder import CamRecorder
-from llm import LLM
-from tts import TTS
+from capture_session import CaptureSession
+from device_discovery import DeviceDiscovery
+from lazy_import import lazy_import, warm_up
+
+# heavy modules (OpenCV, OpenAI, speech recognition, PyAutoGUI) load on
+# first use or in the background once the window is up
+transcriber_module = lazy_import("transcriber")
+screen_recorder_module = lazy_import("screen_recorder")
+cam_recorder_module = lazy_import("cam_recorder")
+llm_module = lazy_import("llm")
+tts_module = lazy_import("tts")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -27,11 +30,14 @@ class Tamagg:
         self.root = root
         self.root.title("TAMAGG [ALPHA]")
         self.root.configure(bg='black')
-        self.transcriber = Transcriber()
         self.console_display = ConsoleDisplay(self.root)
-        self.llm = LLM(console_display=self.console_display)
-        self.tts = TTS(console_display=self.console_display)
+        # clients are built on first use
+        self._transcriber = None
+        self._llm = None
+        self._tts = None
+        self.client_lock = threading.Lock()
 
+        self.capture_session = CaptureSession()
         self.screen_recorder = None
         self.cam_recorder =  None
         self.tts_thread = None
@@ -45,6 +51,7 @@ class Tamagg:
         self.allow_screen_recording = True
         self.enable_assistant_voice = True
         self.use_webcam = False
+        self.disk_frames = False
 
         # agent management
         self.is_agent = False
@@ -185,11 +192,22 @@ class Tamagg:
             command=self.toggle_eav
         )
 
+        # == Disk frame store option, for long recordings
+        self.disk_frames_var = tk.IntVar(value=False)
+        options_menu.add_checkbutton(
+            label='Store Frames On Disk', 
+            variable=self.disk_frames_var,
+            command=self.toggle_disk_frames
+        )
+
         # = Monitors/Webcams menu
         monitors_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Select Monitors/Webcams", menu=monitors_menu)
 
         # == Monitors and Webcam options
+        # monitors are known now, webcams and microphones are added when
+        # device discovery finishes in the background
+        self.monitors_menu = monitors_menu
         self.monitor_list = self.get_monitor_and_webcam_list()
         self.monitor_var = tk.StringVar(value=self.monitor_list[0] if self.monitor_list else "")
         for monitor in self.monitor_list:
@@ -205,16 +223,19 @@ class Tamagg:
         menubar.add_cascade(label="Select Microphones", menu=microphones_menu)
 
         # == Microphone options
-        self.microphone_list = self.get_microphone_list()
-        self.microphone_var = tk.StringVar(value=self.microphone_list[0] if self.monitor_list else "")
-        self.microphone_var.set(self.microphone_list[0])
-        for microphone in self.microphone_list:
-            microphones_menu.add_radiobutton(
-                label=microphone,
-                variable=self.microphone_var,
-                value=microphone,
-                command=self.select_microphone
-            )
+        self.microphones_menu = microphones_menu
+        self.microphone_list = []
+        self.microphone_var = tk.StringVar(value="")
+        microphones_menu.add_command(label="Searching...", state="disabled")
+
+        self.device_discovery = DeviceDiscovery()
+        self.device_discovery.start()
+        self.root.after(100, self.poll_device_discovery)
+        self.root.after(500, warm_up,
+            transcriber_module, screen_recorder_module, llm_module, tts_module)
+        # load the whisper model before the first recording needs it
+        self.root.after(1000, lambda: threading.Thread(
+            target=self.warm_up_transcriber, daemon=True).start())
 
         # Configure the root window to display the menubar
         self.root.config(menu=menubar)
@@ -229,6 +250,38 @@ class Tamagg:
                 "Windows users might have an issue with monitor numbering being backwards. This means monitor 1 will be monitor 2 and other such cases. Fix/workaround in the works."
             )
     
+    @property
+    def transcriber(self):
+        with self.client_lock:
+            if self._transcriber is None:
+                self._transcriber = transcriber_module.Transcriber(
+                    device_index=self.microphone_index)
+        return self._transcriber
+
+    def warm_up_transcriber(self):
+        try:
+            self.transcriber.engine.warmup(background=False)
+        except Exception as err:
+            self.logger.error(f"Transcriber warm up failed: {err}")
+
+    @property
+    def llm(self):
+        with self.client_lock:
+            if self._llm is None:
+                self._llm = llm_module.LLM(console_display=self.console_display)
+        return self._llm
+
+    @property
+    def tts(self):
+        with self.client_lock:
+            if self._tts is None:
+                self._tts = tts_module.TTS(console_display=self.console_display)
+        return self._tts
+
+    def tts_playing(self) -> bool:
+        # does not build the TTS client just to check it
+        return self._tts is not None and self._tts.is_playing
+
     def show_popup(self, title, content):
         """
         Show a popup with a title and the content
@@ -263,25 +316,44 @@ class Tamagg:
         popup.after_idle(popup.attributes, '-topmost', False)
 
     def get_monitor_and_webcam_list(self):
-        monitors = [f"Monitor {i}" for i in range(1, len(mss.mss().monitors))]
-        webcams = []
-
-        # Get list of available webcams
-        index = 0
-        while index < 6:
-            self.logger.info(f"Check cam index {index}")
+        monitors = [f"Monitor {i}" for i in range(1, len(self.capture_session.monitors))]
+        return ["All Monitors 0"] + monitors
 
-            if platform.system().lower() == "windows":
-                cap = cv2.VideoCapture(index, cv2.CAP_DSHOW)
-            else:
-                cap = cv2.VideoCapture(index)
-
-            if cap.read()[0]:
-                webcams.append(f"Webcam {index}")
-                cap.release()
-            index += 1
+    def poll_device_discovery(self):
+        """
+        Fill the webcam and microphone menus once device discovery is done
+        """
+        if not self.device_discovery.done.is_set():
+            self.root.after(100, self.poll_device_discovery)
+            return
+
+        devices = self.device_discovery.result
+        for index in devices["cameras"]:
+            webcam = f"Webcam {index}"
+            self.monitor_list.append(webcam)
+            self.monitors_menu.add_radiobutton(
+                label=webcam,
+                variable=self.monitor_var,
+                value=webcam,
+                command=self.select_monitor_or_webcam,
+            )
 
-        return ["All Monitors 0"] + monitors + webcams
+        self.microphone_list = devices["microphones"]
+        self.microphones_menu.delete(0, "end")
+        for microphone in self.microphone_list:
+            self.microphones_menu.add_radiobutton(
+                label=microphone,
+                variable=self.microphone_var,
+                value=microphone,
+                command=self.select_microphone
+            )
+        if self.microphone_list:
+            # the system default input, the microphone recorded so far
+            default = devices.get("default_microphone")
+            if default not in self.microphone_list:
+                default = self.microphone_list[0]
+            self.microphone_var.set(default)
+            self.select_microphone()
 
     def select_monitor_or_webcam(self):
         selected_item = self.monitor_var.get()
@@ -293,19 +365,13 @@ class Tamagg:
             self.use_webcam = True
         print(f"Selected: {selected_item}")
 
-    def get_microphone_list(self):
-        p = pyaudio.PyAudio()
-        mic_list = []
-        for i in range(p.get_device_count()):
-            device_info = p.get_device_info_by_index(i)
-            if device_info['maxInputChannels'] > 0:
-                mic_list.append(f"{i}: {device_info['name']}")
-        return mic_list
-
     def select_microphone(self):
         selected_mic = self.microphone_var.get()
         self.microphone_index = int(selected_mic.split(":")[0])
         print(f"Selected microphone index: {self.microphone_index}")
+        # used from the next recording on
+        if self._transcriber is not None:
+            self._transcriber.audio_recorder.device_index = self.microphone_index
 
     def handle_menu_selection(self, event):
         selected_option = self.menu_var.get()
@@ -324,6 +390,9 @@ class Tamagg:
 
     def toggle_eav(self):
         self.enable_assistant_voice = bool(self.eav_var.get())
+
+    def toggle_disk_frames(self):
+        self.disk_frames = bool(self.disk_frames_var.get())
     
     def start_recording(self):
         self.update_status("Recording & Transcribing...")
@@ -333,7 +402,7 @@ class Tamagg:
 
         # stop any audio
         self.logger.info("Stopping TTS if any")
-        if self.tts.is_playing:
+        if self.tts_playing():
             self.tts.stop_audio()
 
         # record monitor
@@ -352,7 +421,14 @@ class Tamagg:
 
             self.logger.info("Starting screen recording thread")
 
-            self.screen_recorder = ScreenRecorder(self.monitor_number)
+            if self.screen_recorder:
+                self.screen_recorder.close(remove=True)
+            self.screen_recorder = screen_recorder_module.ScreenRecorder(
+                self.monitor_number,
+                session=self.capture_session,
+                disk_store=self.disk_frames,
+                cursor_crop_size=768
+            )
             self.video_rec_thread = threading.Thread(
                 target=self.screen_recorder.start_recording)
             self.video_rec_thread.start()
@@ -363,7 +439,13 @@ class Tamagg:
             )
             
             self.logger.info("Starting camera recording thread")
-            self.cam_recorder = CamRecorder(self.webcam_index)
+            # the camera stays open while the same one is used
+            if self.cam_recorder and self.cam_recorder.camera_index == self.webcam_index:
+                self.cam_recorder.reset()
+            else:
+                if self.cam_recorder:
+                    self.cam_recorder.close()
+                self.cam_recorder = cam_recorder_module.CamRecorder(self.webcam_index)
             self.video_rec_thread = threading.Thread(
                 target=self.cam_recorder.start_recording)
             self.video_rec_thread.start()
@@ -397,7 +479,7 @@ class Tamagg:
         processing_thread.start()
 
     def _process_stop_recording(self):
-        if self.tts.is_playing:
+        if self.tts_playing():
             self.tts.stop_audio()
 
         self.is_recording = False
@@ -410,7 +492,7 @@ class Tamagg:
             self.video_rec_thread.join(timeout=10)
 
             self.console_display.add_text(
-                f"Screen Recording Stopped\n{len(self.screen_recorder.base64_frames)} frames captured",
+                f"Screen Recording Stopped\n{len(self.screen_recorder.frames)} frames captured",
                 "system"
             )
         elif self.use_webcam:
@@ -421,7 +503,7 @@ class Tamagg:
             self.video_rec_thread.join(timeout=10)
 
             self.console_display.add_text(
-                f"Webcam Stopped\n{len(self.cam_recorder.base64_frames)} frames captured",
+                f"Webcam Stopped\n{len(self.cam_recorder.frames)} frames captured",
                 "system"
             )
 
@@ -456,9 +538,18 @@ class Tamagg:
             self.logger.info("looping assistant")
 
             # get a screen capture
+            # the recorder and its capture session stay warm between steps
             if self.allow_screen_recording and self.agent_loop > 1:
                 monitor_number = int(self.monitor_var.get().split()[-1])
-                self.screen_recorder = ScreenRecorder(monitor_number)
+                if self.screen_recorder is None:
+                    self.screen_recorder = screen_recorder_module.ScreenRecorder(
+                        monitor_number,
+                        session=self.capture_session,
+                        cursor_crop_size=768
+                    )
+                else:
+                    self.screen_recorder.monitor_number = monitor_number
+                    self.screen_recorder.reset()
                 self.screen_recorder.get_frame()
 
             self.process_ai_assistant()
@@ -488,18 +579,20 @@ class Tamagg:
                 if not self.use_webcam:
                     resp = self.llm.run(
                         frames_hw=self.screen_recorder.frames[0].shape,
-                        sbframes=self.screen_recorder.base64_frames,
+                        sbframes=self.screen_recorder.get_request_frames(
+                            segments=self.transcriber.segments),
                         transcription_text=self.transcriber.transcribed_text
                     )
                 elif self.use_webcam:
                     resp = self.llm.run(
                         frames_hw=self.cam_recorder.frames[0].shape,
-                        sbframes=self.cam_recorder.base64_frames,
+                        sbframes=self.cam_recorder.get_base64_frames(
+                            segments=self.transcriber.segments),
                         transcription_text=self.transcriber.transcribed_text
                     )
             
             # clear frames and text
-            self.transcriber.transcribed_text = ""
+            self.transcriber.clear()
 
             if resp and self.enable_assistant_voice:
                 self.tts_thread = threading.Thread(
@@ -526,7 +619,7 @@ class Tamagg:
             self.status_label.config(fg="lime", text=message)
 
     def on_closing(self):
-        if self.tts.is_playing:
+        if self.tts_playing():
             if self.tts_thread.is_alive:
                 self.tts_thread.join(timeout=1)
             
@@ -536,8 +629,12 @@ class Tamagg:
             if self.video_rec_thread.is_alive:
                 self.video_rec_thread.join(timeout=1)
             self.screen_recorder.stop_recording()
-            # self.screen_recorder.nvjpeg.cleanup_nvjpeg()
-            # os.remove(self.screen_recorder.sqldb)
+            self.screen_recorder.close(remove=True)
+
+        if self.cam_recorder:
+            self.cam_recorder.close()
+
+        self.capture_session.close()
         
         self.root.quit()
         self.root.destroy()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from audio_recorder import AudioRecorder
+
+class FakeMicrophone:
+    def __init__(self, device_index=None):
+        self.device_index = device_index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+class TestAudioRecorderCalibration(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "data", "thresholds.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record_once(self, recorder: AudioRecorder, listened_threshold: float):
+        def listen(source):
+            # listen adapts the threshold from silence
+            recorder.recognizer.energy_threshold = listened_threshold
+            recorder.stop()
+            return "audio"
+
+        with mock.patch("speech_recognition.Microphone", FakeMicrophone), \
+                mock.patch.object(recorder.recognizer, "listen", side_effect=listen), \
+                mock.patch.object(recorder.recognizer, "adjust_for_ambient_noise") as adjust:
+            self.assertEqual(list(recorder.record()), ["audio"])
+        return adjust
+
+    def test_calibrates_once_per_device(self):
+        recorder = AudioRecorder(device_index=2, cache_path=self.cache_path)
+        adjust = self.record_once(recorder, 420.0)
+        adjust.assert_called_once()
+
+        recorder = AudioRecorder(device_index=2, cache_path=self.cache_path)
+        adjust = self.record_once(recorder, 450.0)
+        adjust.assert_not_called()
+        self.assertEqual(recorder.cached_threshold(), 450.0)
+
+    def test_devices_cached_separately(self):
+        self.record_once(AudioRecorder(device_index=1, cache_path=self.cache_path), 500.0)
+        other = AudioRecorder(cache_path=self.cache_path)
+        self.assertIsNone(other.cached_threshold())
+        adjust = self.record_once(other, 800.0)
+        adjust.assert_called_once()
+        self.assertEqual(other.load_thresholds(), {"1": 500.0, "default": 800.0})
+
+if __name__ == "__main__":
+    unittest.main()
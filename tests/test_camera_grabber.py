@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+from unittest import mock
+import numpy as np
+from camera_grabber import CameraGrabber
+
+class FakeCapture:
+    def __init__(self, index):
+        self.count = 0
+        self.released = False
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        time.sleep(0.002)
+        self.count += 1
+        return True, np.full((4, 4, 3), self.count % 256, dtype=np.uint8)
+
+    def release(self):
+        self.released = True
+
+class UnpluggedCapture(FakeCapture):
+    """
+    Camera whose reads fail after a few frames
+    """
+    def read(self):
+        if self.count >= 3:
+            return False, None
+        return super().read()
+
+class BlockedCapture(FakeCapture):
+    """
+    Camera whose second read blocks until unblocked
+    """
+    def __init__(self, index):
+        super().__init__(index)
+        self.unblock = threading.Event()
+        self.reading = False
+        self.released_mid_read = False
+        self.release_thread = None
+
+    def read(self):
+        if self.count >= 1:
+            self.reading = True
+            self.unblock.wait()
+            self.reading = False
+        return super().read()
+
+    def release(self):
+        self.released_mid_read = self.reading
+        self.release_thread = threading.current_thread()
+        super().release()
+
+class TestCameraGrabber(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("camera_grabber.cv2.VideoCapture", FakeCapture)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.grabber = CameraGrabber(0)
+        self.addCleanup(self.grabber.close)
+
+    def test_keeps_newest_frame(self):
+        self.assertTrue(self.grabber.start())
+        time.sleep(0.05)
+        with self.grabber.condition:
+            frame, timestamp = self.grabber.latest()
+            self.assertEqual(frame[0, 0, 0], self.grabber.seq % 256)
+        self.assertLessEqual(timestamp, time.monotonic())
+        self.assertGreater(self.grabber.stats()["dropped"], 0)
+
+    def test_next_frame_is_newer(self):
+        self.grabber.start()
+        first = self.grabber.latest()
+        second = self.grabber.next_frame(timeout=1.0)
+        self.assertGreater(second[1], first[1])
+
+    def test_start_is_reused(self):
+        self.assertTrue(self.grabber.start())
+        capture = self.grabber.capture
+        self.assertTrue(self.grabber.start())
+        self.assertIs(self.grabber.capture, capture)
+
+    def test_restart_after_failed_read_releases_capture(self):
+        with mock.patch("camera_grabber.cv2.VideoCapture", UnpluggedCapture):
+            self.assertTrue(self.grabber.start())
+            self.grabber.thread.join(1)
+            self.assertFalse(self.grabber.running)
+            failed = self.grabber.capture
+
+        self.assertTrue(self.grabber.start())
+        self.assertTrue(failed.released)
+        self.assertIsNot(self.grabber.capture, failed)
+        self.assertIsNotNone(self.grabber.next_frame(timeout=1.0))
+
+    def test_blocked_read_not_released_from_close(self):
+        with mock.patch("camera_grabber.cv2.VideoCapture", BlockedCapture):
+            self.assertTrue(self.grabber.start())
+        capture = self.grabber.capture
+        thread = self.grabber.thread
+        self.grabber.join_timeout = 0.05
+
+        with self.assertLogs("camera_grabber", "WARNING"):
+            self.grabber.close()
+        self.assertFalse(capture.released)
+
+        # the grabber thread releases it once the read returns
+        capture.unblock.set()
+        thread.join(1)
+        self.assertTrue(capture.released)
+        self.assertFalse(capture.released_mid_read)
+        self.assertIs(capture.release_thread, thread)
+        self.assertIsNone(self.grabber.latest(timeout=0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import gc
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+from capture_session import CaptureSession, screenshot_to_array
+
+MONITORS = [
+    {"left": 0, "top": 0, "width": 3840, "height": 1080},
+    {"left": 0, "top": 0, "width": 1920, "height": 1080},
+    {"left": 1920, "top": 0, "width": 1920, "height": 1080},
+]
+
+class FakeShot:
+    def __init__(self, monitor: dict, value: int):
+        self.width = monitor["width"] // 10
+        self.height = monitor["height"] // 10
+        self.raw = bytearray([value]) * (self.width * self.height * 4)
+
+class FakeMss:
+    """
+    mss handle that fills each grab with the monitor's left edge
+    """
+    opened = 0
+
+    def __init__(self):
+        FakeMss.opened += 1
+        self.monitors = MONITORS
+        self.closed = False
+
+    def grab(self, monitor: dict) -> FakeShot:
+        return FakeShot(monitor, monitor["left"] // 1920 + 1)
+
+    def close(self):
+        self.closed = True
+
+class PaddedShot:
+    """
+    mss screenshot whose rows are padded past the visible width
+    """
+    def __init__(self, width: int, height: int, row_pixels: int):
+        self.width = width
+        self.height = height
+        pixels = np.arange(height * row_pixels * 4, dtype=np.uint32) % 251
+        self.raw = bytearray(pixels.astype(np.uint8).tobytes())
+
+class TestScreenshotToArray(unittest.TestCase):
+    def test_wraps_without_copy(self):
+        shot = PaddedShot(8, 5, 8)
+        frame = screenshot_to_array(shot)
+
+        self.assertEqual(frame.shape, (5, 8, 4))
+        self.assertEqual(frame.dtype, np.uint8)
+        self.assertTrue(frame.flags.c_contiguous)
+        self.assertTrue(np.shares_memory(frame, np.frombuffer(shot.raw, dtype=np.uint8)))
+        # writes to the screenshot buffer show through
+        shot.raw[4 * 9] = 255
+        self.assertEqual(frame[1, 1, 0], 255)
+
+    def test_padded_rows_skipped(self):
+        shot = PaddedShot(6, 4, 8)
+        frame = screenshot_to_array(shot)
+        expected = np.frombuffer(bytes(shot.raw), dtype=np.uint8).reshape(4, 8, 4)[:, :6]
+
+        self.assertEqual(frame.shape, (4, 6, 4))
+        self.assertEqual(frame.strides, (8 * 4, 4, 1))
+        np.testing.assert_array_equal(frame, expected)
+        self.assertTrue(np.shares_memory(frame, np.frombuffer(shot.raw, dtype=np.uint8)))
+
+class TestCaptureSessionHandles(unittest.TestCase):
+    def setUp(self):
+        FakeMss.opened = 0
+        patcher = mock.patch("capture_session.mss.mss", FakeMss)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = CaptureSession()
+
+    def run_thread(self, target):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+        del thread
+        gc.collect()
+
+    def test_handle_reused_across_threads(self):
+        handles = []
+        for _ in range(10):
+            self.run_thread(lambda: handles.append(self.session.sct))
+
+        self.assertEqual(FakeMss.opened, 1)
+        self.assertTrue(all(sct is handles[0] for sct in handles))
+        self.assertEqual(self.session.idle, [handles[0]])
+
+    def test_concurrent_threads_get_own_handles(self):
+        barrier = threading.Barrier(3)
+        handles = []
+
+        def capture():
+            handles.append(self.session.sct)
+            barrier.wait()
+
+        threads = [threading.Thread(target=capture) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(sct) for sct in handles}), 3)
+
+    def test_release_returns_handle(self):
+        sct = self.session.sct
+        self.session.release()
+        self.assertEqual(self.session.idle, [sct])
+        self.assertIs(self.session.sct, sct)
+        self.assertEqual(self.session.idle, [])
+
+    def test_closed_handles_not_reused(self):
+        sct = self.session.sct
+        self.session.close()
+        self.assertTrue(sct.closed)
+        self.session.release()
+        self.assertEqual(self.session.idle, [])
+
+    def test_grab_latest(self):
+        frame = self.session.grab_latest(2)
+        self.assertEqual(frame.shape, (108, 192, 4))
+        self.assertTrue((frame == 2).all())
+
+        # every monitor side by side
+        frame = self.session.grab_latest(-1)
+        self.assertEqual(frame.shape, (108, 384, 4))
+        self.assertTrue((frame[:, :192] == 1).all())
+        self.assertTrue((frame[:, 192:] == 2).all())
+
+    def test_grab_latest_single_monitor(self):
+        self.session._monitors = MONITORS[:2]
+        frame = self.session.grab_latest(-1)
+        self.assertEqual(frame.shape, (108, 192, 4))
+
+
+class TestCaptureSession(unittest.TestCase):
+    def setUp(self):
+        self.session = CaptureSession()
+        self.session._monitors = [
+            {"left": 0, "top": 0, "width": 3840, "height": 1080},
+            {"left": 0, "top": 0, "width": 1920, "height": 1080},
+            {"left": 1920, "top": 0, "width": 1920, "height": 1080},
+        ]
+
+    def test_single_monitor(self):
+        self.assertEqual(self.session.frame_position(2, 2000, 10), (80, 10))
+        self.assertIsNone(self.session.frame_position(2, 100, 10))
+
+    def test_all_monitors(self):
+        self.assertEqual(self.session.frame_position(0, 2000, 10), (2000, 10))
+        self.assertEqual(self.session.frame_position(-1, 2000, 10), (2000, 10))
+        self.assertIsNone(self.session.frame_position(-1, 5000, 10))
+
+if __name__ == "__main__":
+    unittest.main()
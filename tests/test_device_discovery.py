@@ -0,0 +1,124 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+from device_discovery import DeviceDiscovery
+
+class FakePyAudio:
+    """
+    Two microphones and an output only device, the second mic is default
+    """
+    devices = [
+        {"index": 0, "name": "speakers", "maxInputChannels": 0},
+        {"index": 1, "name": "webcam mic", "maxInputChannels": 1},
+        {"index": 2, "name": "headset", "maxInputChannels": 2},
+    ]
+
+    def get_default_input_device_info(self):
+        return self.devices[2]
+
+    def get_device_count(self):
+        return len(self.devices)
+
+    def get_device_info_by_index(self, index):
+        return self.devices[index]
+
+    def terminate(self):
+        pass
+
+class TestDeviceDiscovery(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.probes = 0
+        self.discovery = self.make_discovery()
+
+    def make_discovery(self, timeout=1.0):
+        discovery = DeviceDiscovery(
+            cache_path=os.path.join(self.tmpdir.name, "devices.json"),
+            max_cameras=4,
+            timeout=timeout
+        )
+        discovery.probe_camera = self.probe_camera
+        discovery.video_nodes = lambda: []
+        discovery.list_microphones = lambda found: found.update(
+            microphones=["1: mic"], default_microphone="1: mic")
+        return discovery
+
+    def probe_camera(self, index, found):
+        self.probes += 1
+        if index == 3:
+            # a missing camera that hangs
+            time.sleep(5)
+        elif index % 2 == 0:
+            time.sleep(0.2)
+            found[index] = True
+
+    def test_probes_in_parallel_with_timeout(self):
+        start = time.monotonic()
+        devices = self.discovery.probe()
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(devices["cameras"], [0, 2])
+        self.assertEqual(devices["microphones"], ["1: mic"])
+        self.assertFalse(devices["complete"])
+
+    def test_default_microphone_listed(self):
+        found = {}
+        pyaudio = mock.Mock(PyAudio=FakePyAudio)
+        with mock.patch.dict(sys.modules, {"pyaudio": pyaudio}):
+            DeviceDiscovery().list_microphones(found)
+        self.assertEqual(found["microphones"], ["1: webcam mic", "2: headset"])
+        self.assertEqual(found["default_microphone"], "2: headset")
+
+    def test_complete_result_is_cached(self):
+        self.discovery.probe_camera = lambda index, found: found.update({0: True})
+        self.assertEqual(self.discovery.discover()["cameras"], [0])
+
+        cached = self.make_discovery()
+        self.assertEqual(cached.discover(), {
+            "cameras": [0], "microphones": ["1: mic"], "default_microphone": "1: mic"})
+        self.assertEqual(self.probes, 0)
+
+    def test_busy_camera_probed_again(self):
+        cameras = {0}
+        probed = []
+
+        def start():
+            discovery = self.make_discovery()
+            discovery.video_nodes = lambda: [0, 1, 2]
+
+            def probe_camera(index, found):
+                probed.append(index)
+                if index in cameras:
+                    found[index] = True
+            discovery.probe_camera = probe_camera
+            return discovery.discover()["cameras"]
+
+        # camera 1 is busy, 2 is a metadata node
+        self.assertEqual(start(), [0])
+
+        # cached, only the nodes without a camera are probed again
+        probed.clear()
+        self.assertEqual(start(), [0])
+        self.assertEqual(sorted(probed), [1, 2])
+
+        # camera 1 is free now, found and cached
+        cameras.add(1)
+        probed.clear()
+        self.assertEqual(start(), [0, 1])
+        self.assertEqual(sorted(probed), [1, 2])
+        probed.clear()
+        self.assertEqual(start(), [0, 1])
+        self.assertEqual(probed, [2])
+
+    def test_changed_hardware_misses_cache(self):
+        self.discovery.probe_camera = lambda index, found: None
+        self.discovery.discover()
+        other = self.make_discovery()
+        other.fingerprint = lambda: "other"
+        self.assertIsNone(other.load_cache(other.fingerprint()))
+
+if __name__ == "__main__":
+    unittest.main()
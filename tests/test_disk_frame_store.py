@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import cv2
+import numpy as np
+from disk_frame_store import DiskFrameStore
+
+def make_frame(value):
+    return np.full((32, 48, 3), value, dtype=np.uint8)
+
+class TestDiskFrameStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.released = []
+        self.store = DiskFrameStore(
+            os.path.join(self.tmpdir.name, "frames"),
+            record_id="test",
+            batch_size=4,
+            on_evict=self.released.append
+        )
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_frames_spill_to_disk(self):
+        for i in range(10):
+            self.store.append(make_frame(i * 20))
+        self.store.flush()
+
+        self.assertEqual(len(self.released), 10)
+        self.assertTrue(all(record.frame is None for record in self.store.snapshot()))
+        for i in range(10):
+            self.assertLessEqual(abs(int(self.store[i][0, 0, 0]) - i * 20), 2)
+
+        conn = sqlite3.connect(self.store.sqldb)
+        rows = conn.execute("SELECT COUNT(*) FROM frames WHERE record_id='test'").fetchone()
+        conn.close()
+        self.assertEqual(rows[0], 10)
+
+    def test_decode_outside_lock(self):
+        for i in range(2):
+            self.store.append(make_frame(i * 50))
+        self.store.flush()
+
+        imdecode = cv2.imdecode
+        held = []
+
+        def decode(blob, flags):
+            held.append(self.store.mm_lock.locked())
+            return imdecode(blob, flags)
+
+        with mock.patch("disk_frame_store.cv2.imdecode", side_effect=decode):
+            frames = [self.store[i] for i in range(2)]
+        self.assertEqual(held, [False, False])
+        self.assertLessEqual(abs(int(frames[1][0, 0, 0]) - 50), 2)
+
+    def test_find_by_timestamp(self):
+        records = [self.store.append(make_frame(i)) for i in range(5)]
+        self.assertIs(self.store.find(records[2].timestamp), records[2])
+        self.assertIs(self.store.find(records[-1].timestamp + 10), records[-1])
+        self.assertIs(self.store.get(3), records[3])
+
+    def test_failed_frame_does_not_block_flush(self):
+        self.store.append(make_frame(10))
+        bad = self.store.append(np.zeros((0, 8, 3), dtype=np.uint8))
+        flush = threading.Thread(target=self.store.flush, daemon=True)
+        flush.start()
+        flush.join(3)
+
+        self.assertFalse(flush.is_alive())
+        self.assertEqual(self.store.stats()["written"], 1)
+        self.assertEqual(self.store.stats()["failed"], 1)
+        self.assertTrue(bad.failed)
+        # the frame is still readable from memory
+        self.assertEqual(bad.array.shape, (0, 8, 3))
+
+    def test_flush_after_clear(self):
+        self.store.append(make_frame(0))
+        self.store.clear()
+        record = self.store.append(make_frame(50))
+        self.store.flush()
+        self.assertIsNone(record.frame)
+        self.assertEqual(len(self.store), 1)
+
+    def test_close_removes_files(self):
+        self.store.append(make_frame(0))
+        self.store.close(remove=True)
+        self.assertFalse(os.path.exists(self.store.sqldb))
+        self.assertFalse(os.path.exists(self.store.segment_path))
+
+if __name__ == "__main__":
+    unittest.main()
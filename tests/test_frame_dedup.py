@@ -0,0 +1,90 @@
+import unittest
+import cv2
+import numpy as np
+from frame_dedup import FrameDeduplicator
+
+class TestFrameDeduplicator(unittest.TestCase):
+    def setUp(self):
+        self.dedup = FrameDeduplicator(similarity_threshold=0)
+        self.frame = np.random.randint(0, 255, (120, 160, 4), dtype=np.uint8)
+
+    def test_duplicate_frame(self):
+        self.assertFalse(self.dedup.check_and_add(self.frame))
+        self.assertTrue(self.dedup.check_and_add(self.frame.copy()))
+        self.assertEqual(self.dedup.hits, 1)
+        self.assertEqual(self.dedup.misses, 1)
+
+    def test_change_between_sampled_rows(self):
+        self.dedup.check_and_add(self.frame)
+
+        # row 1 is skipped by the default row stride of 4
+        changed = self.frame.copy()
+        changed[1, 0, 0] ^= 0xFF
+        self.assertEqual(
+            self.dedup.fingerprint(changed),
+            self.dedup.fingerprint(self.frame)
+        )
+        self.assertFalse(self.dedup.check_and_add(changed))
+
+    def test_index_stays_flat(self):
+        for i in range(50):
+            frame = np.full((32, 32, 3), i, dtype=np.uint8)
+            self.assertFalse(self.dedup.check_and_add(frame))
+        self.assertEqual(len(self.dedup.index), 50)
+        self.assertTrue(self.dedup.check_and_add(np.full((32, 32, 3), 7, dtype=np.uint8)))
+
+class TestNearDuplicateFilter(unittest.TestCase):
+    def setUp(self):
+        self.dedup = FrameDeduplicator(similarity_threshold=0.02)
+        self.frame = np.full((1080, 1920, 4), 40, dtype=np.uint8)
+
+    def test_noise_is_near_duplicate(self):
+        self.assertFalse(self.dedup.check_and_add(self.frame))
+        noise = np.random.default_rng(0).integers(-3, 4, self.frame.shape)
+        noisy = (self.frame + noise).astype(np.uint8)
+        self.assertTrue(self.dedup.check_and_add(noisy))
+        self.assertEqual(self.dedup.near_hits, 1)
+
+    def test_typed_character_is_kept(self):
+        self.assertFalse(self.dedup.check_and_add(self.frame))
+        typed = self.frame.copy()
+        cv2.putText(typed, ".", (900, 520), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (220, 220, 220, 255), 1)
+        self.assertFalse(self.dedup.check_and_add(typed))
+
+    def test_word_on_4k_screen_is_kept(self):
+        frame = np.full((2160, 3840, 4), 40, dtype=np.uint8)
+        self.assertFalse(self.dedup.check_and_add(frame))
+        error = frame.copy()
+        cv2.putText(error, "Error", (1800, 1000), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (220, 220, 220, 255), 1)
+        self.assertFalse(self.dedup.check_and_add(error))
+
+    def test_final_frame_kept(self):
+        self.assertFalse(self.dedup.check_and_add(self.frame))
+        changed = self.frame.copy()
+        changed[:540] = 220
+        self.assertFalse(self.dedup.check_and_add(changed))
+
+        # back to the first screen, an exact duplicate of an older frame
+        self.assertTrue(self.dedup.check_and_add(self.frame.copy()))
+        self.assertFalse(self.dedup.check_and_add(self.frame.copy(), final=True))
+        # a copy of the last kept frame is still dropped
+        self.assertTrue(self.dedup.check_and_add(self.frame.copy(), final=True))
+
+        pixel = self.frame.copy()
+        pixel[0, 0] = 41
+        self.assertTrue(self.dedup.check_and_add(pixel))
+        self.assertFalse(self.dedup.check_and_add(pixel, final=True))
+
+    def test_scene_change_is_kept(self):
+        self.assertFalse(self.dedup.check_and_add(self.frame))
+        window = self.frame.copy()
+        window[200:600, 300:1200] = 220
+        self.assertFalse(self.dedup.check_and_add(window))
+        self.assertGreater(self.dedup.last_score, 0.5)
+
+    def test_resolution_change_is_kept(self):
+        self.assertFalse(self.dedup.check_and_add(self.frame))
+        self.assertFalse(self.dedup.check_and_add(np.full((720, 1280, 4), 40, dtype=np.uint8)))
+
+if __name__ == "__main__":
+    unittest.main()
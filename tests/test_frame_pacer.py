@@ -0,0 +1,35 @@
+import unittest
+import time
+from frame_pacer import FramePacer
+
+class TestFramePacer(unittest.TestCase):
+    def test_paced_rate(self):
+        pacer = FramePacer(target_fps=50, adaptive=False)
+        start = time.monotonic()
+        for _ in range(10):
+            pacer.wait()
+        elapsed = time.monotonic() - start
+
+        # first frame is immediate, the other nine wait one interval each
+        self.assertGreaterEqual(elapsed, 9 / 50 * 0.9)
+        self.assertEqual(pacer.stats()["late"], 0)
+
+    def test_late_and_dropped_frames(self):
+        pacer = FramePacer(target_fps=100, adaptive=False)
+        pacer.wait()
+        time.sleep(0.055)
+        self.assertTrue(pacer.wait())
+        self.assertEqual(pacer.late_frames, 1)
+        self.assertGreaterEqual(pacer.dropped_frames, 4)
+
+    def test_backs_off_under_load(self):
+        pacer = FramePacer(target_fps=100, min_fps=10, window=4)
+        pacer.wait()
+        for _ in range(4):
+            time.sleep(0.03)
+            pacer.wait()
+        self.assertLess(pacer.fps, 100)
+        self.assertGreaterEqual(pacer.fps, 10)
+
+if __name__ == "__main__":
+    unittest.main()
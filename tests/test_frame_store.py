@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+from frame_store import FrameStore
+
+def make_frame(value):
+    # 1000 bytes per frame
+    return np.full((10, 100), value, dtype=np.uint8)
+
+class TestFrameStore(unittest.TestCase):
+    def setUp(self):
+        self.evicted = []
+        self.store = FrameStore(max_bytes=5000, on_evict=self.evicted.append)
+
+    def test_stays_under_budget(self):
+        for i in range(20):
+            self.store.append(make_frame(i))
+        self.assertLessEqual(self.store.nbytes, 5000)
+        self.assertEqual(len(self.store), 5)
+        self.assertEqual(len(self.evicted), 15)
+        self.assertEqual(self.store[0][0, 0], 15)
+
+    def test_keeps_keyframes(self):
+        self.store.append(make_frame(0), keyframe=True)
+        for i in range(1, 20):
+            self.store.append(make_frame(i))
+        ids = [record.frame_id for record in self.store.snapshot()]
+        self.assertEqual(ids[0], 0)
+        self.assertEqual(ids[1:], [16, 17, 18, 19])
+
+    def test_keyframes_over_share_are_evicted(self):
+        for i in range(20):
+            self.store.append(make_frame(i), keyframe=True)
+        self.assertLessEqual(self.store.nbytes, 5000)
+        self.assertEqual(self.store.snapshot()[-1].frame_id, 19)
+
+    def test_timestamp_index_follows_eviction(self):
+        self.store.append(make_frame(0), keyframe=True, timestamp=0.0)
+        for i in range(1, 20):
+            self.store.append(make_frame(i), timestamp=float(i))
+
+        records, timestamps = self.store.indexed_snapshot()
+        self.assertEqual(timestamps, [record.timestamp for record in records])
+        self.assertEqual(timestamps, [0.0, 16.0, 17.0, 18.0, 19.0])
+        self.assertEqual(self.store.find(5.0).frame_id, 0)
+        self.assertEqual(self.store.find(16.4).frame_id, 16)
+        self.assertEqual(self.store.find(100.0).frame_id, 19)
+
+        self.store.clear()
+        self.assertEqual(self.store.indexed_snapshot(), ([], []))
+        self.assertIsNone(self.store.find(1.0))
+
+    def test_oversized_frame_is_kept(self):
+        self.store.append(make_frame(0))
+        self.store.append(np.zeros((100, 100), dtype=np.uint8))
+        self.assertEqual(len(self.store), 1)
+        self.assertEqual(self.store[0].shape, (100, 100))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from oai_ict import ImageTokenPlanner, estimate_image_tokens
+
+class TestImageTokenPlanner(unittest.TestCase):
+    def test_estimate(self):
+        self.assertEqual(estimate_image_tokens(1920, 1080, 'low'), 85)
+        # 1365x768 is 3x2 tiles
+        self.assertEqual(estimate_image_tokens(1920, 1080, 'high'), 85 + 170 * 6)
+
+    def test_no_budget_is_all_high(self):
+        planner = ImageTokenPlanner(max_frames=8)
+        self.assertEqual(planner.plan(1920, 1080, 20), ['high'] * 8)
+        self.assertEqual(planner.plan(1920, 1080, 3), ['high'] * 3)
+
+    def test_newest_frames_get_high_detail(self):
+        planner = ImageTokenPlanner(max_tokens=4000, max_frames=8)
+        details = planner.plan(1920, 1080, 20)
+        self.assertEqual(details, ['low'] * 5 + ['high'] * 3)
+        tokens = sum(estimate_image_tokens(1920, 1080, detail) for detail in details)
+        self.assertLessEqual(tokens, 4000)
+
+    def test_small_budget_drops_frames(self):
+        planner = ImageTokenPlanner(max_tokens=300, max_frames=8)
+        self.assertEqual(planner.plan(1920, 1080, 20), ['low'] * 3)
+        self.assertEqual(planner.plan(1920, 1080, 20, max_tokens=50), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import base64
+import gc
+import threading
+import unittest
+from unittest import mock
+import cv2
+import numpy as np
+from jpeg_encoders import (
+    ENCODERS, FallbackEncoder, JpegEncoder, NativeJpegEncoder, OpenCVEncoder, PILEncoder,
+    TurboJPEGEncoder, available_encoders, benchmark_frame, select_encoder, with_fallback
+)
+
+class FailingEncoder(JpegEncoder):
+    name = "failing"
+
+    def encode(self, frame: np.ndarray) -> bytes:
+        raise ValueError("encode failed")
+
+class FakeTurboJPEG:
+    """
+    Hands out numbered compress handles and records destroyed ones
+    """
+    def __init__(self):
+        self.created = 0
+        self.destroyed = []
+
+    def tjInitCompress(self):
+        self.created += 1
+        return self.created
+
+    def tjDestroy(self, handle):
+        self.destroyed.append(handle)
+        return 0
+
+class TestJpegEncoders(unittest.TestCase):
+    def setUp(self):
+        self.frame = benchmark_frame(320, 240)
+
+    def test_available_backends_decode(self):
+        for name in available_encoders():
+            encoder = ENCODERS[name](quality=90, subsampling="420")
+            decoded = cv2.imdecode(
+                np.frombuffer(encoder.encode(self.frame), dtype=np.uint8), cv2.IMREAD_COLOR)
+            self.assertEqual(decoded.shape, self.frame.shape, name)
+            error = np.abs(decoded.astype(int) - self.frame.astype(int)).mean()
+            self.assertLess(error, 10, name)
+
+    def test_quality_changes_size(self):
+        low = OpenCVEncoder(quality=30).encode(self.frame)
+        high = OpenCVEncoder(quality=95).encode(self.frame)
+        self.assertLess(len(low), len(high))
+
+    def test_pil_keeps_bgr_order(self):
+        frame = np.zeros((64, 64, 3), dtype=np.uint8)
+        frame[..., 0] = 255
+        decoded = cv2.imdecode(
+            np.frombuffer(PILEncoder().encode(frame), dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.assertGreater(decoded[32, 32, 0], 200)
+        self.assertLess(decoded[32, 32, 2], 50)
+
+    @unittest.skipUnless(NativeJpegEncoder.available(), "clib not built, run make cpu")
+    def test_native_base64_matches_jpeg(self):
+        encoder = NativeJpegEncoder(quality=85)
+        for size in (1, 2, 3, 100):
+            frame = np.random.randint(0, 255, (size, size + 1, 3), dtype=np.uint8)
+            self.assertEqual(
+                base64.b64decode(encoder.encode_base64(frame)), encoder.encode(frame))
+        # strided view of a BGRA capture buffer
+        view = np.zeros((40, 60, 4), dtype=np.uint8)[:, :, :3]
+        self.assertEqual(
+            base64.b64decode(encoder.encode_base64(view)), encoder.encode(view))
+
+    @unittest.skipUnless(NativeJpegEncoder.available(), "clib not built, run make cpu")
+    def test_native_noise_fits(self):
+        frame = np.random.randint(0, 256, (256, 256, 3), dtype=np.uint8)
+        for subsampling in ("444", "422", "420"):
+            encoder = NativeJpegEncoder(100, subsampling)
+            decoded = cv2.imdecode(
+                np.frombuffer(base64.b64decode(encoder.encode_base64(frame)), dtype=np.uint8),
+                cv2.IMREAD_COLOR)
+            self.assertEqual(decoded.shape, frame.shape)
+
+    @unittest.skipUnless(NativeJpegEncoder.available(), "clib not built, run make cpu")
+    def test_native_buffer_grows(self):
+        encoder = NativeJpegEncoder(100)
+        frame = np.random.randint(0, 256, (64, 64, 3), dtype=np.uint8)
+        expected = encoder.encode_base64(frame)
+        # a fresh thread buffer sized far too small is grown and retried
+        encoder.local = threading.local()
+        with mock.patch.object(encoder.lib, "jpeg_base64_bound", return_value=16):
+            self.assertEqual(encoder.encode_base64(frame), expected)
+        self.assertGreater(len(encoder.local.buffer), len(expected))
+
+    def test_turbojpeg_handles_destroyed(self):
+        lib = FakeTurboJPEG()
+        with mock.patch.object(TurboJPEGEncoder, "lib", lib):
+            encoder = TurboJPEGEncoder()
+            handle = encoder.thread_handle()
+            self.assertEqual(encoder.thread_handle(), handle)
+
+            # a finished thread's handle is destroyed with it
+            thread = threading.Thread(target=encoder.thread_handle)
+            thread.start()
+            thread.join()
+            del thread
+            gc.collect()
+            self.assertEqual(lib.created, 2)
+            self.assertEqual(lib.destroyed, [2])
+
+            encoder.close()
+            self.assertEqual(lib.destroyed, [2, 1])
+            encoder.close()
+            self.assertEqual(lib.destroyed, [2, 1])
+
+    def test_select_encoder(self):
+        self.assertEqual(select_encoder(80, "444", "pil").name, "pil")
+        encoder = select_encoder(80, "444")
+        self.assertIn(encoder.name, available_encoders())
+        self.assertIs(select_encoder(80, "444"), encoder)
+
+    def test_failed_encode_falls_back_to_opencv(self):
+        encoder = with_fallback(FailingEncoder(80))
+        self.assertIsInstance(encoder, FallbackEncoder)
+        self.assertEqual(encoder.name, "failing")
+
+        with self.assertLogs("jpeg_encoders", "ERROR"):
+            jpeg = base64.b64decode(encoder.encode_base64(self.frame))
+        self.assertEqual(jpeg, OpenCVEncoder(80).encode(self.frame))
+        self.assertEqual(encoder.encode(self.frame), jpeg)
+
+        opencv = OpenCVEncoder()
+        self.assertIs(with_fallback(opencv), opencv)
+
+    def test_unknown_subsampling(self):
+        with self.assertRaises(ValueError):
+            OpenCVEncoder(subsampling="411")
+
+if __name__ == "__main__":
+    unittest.main()
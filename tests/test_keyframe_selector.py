@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+from frame_store import FrameRecord
+from keyframe_selector import KeyframeSelector
+from transcriber import TranscriptSegment
+
+def make_records(scores):
+    records = []
+    for idx, score in enumerate(scores):
+        record = FrameRecord(idx, np.zeros((4, 4, 3), dtype=np.uint8), score=score)
+        record.timestamp = float(idx)
+        records.append(record)
+    return records
+
+class TestKeyframeSelector(unittest.TestCase):
+    def setUp(self):
+        self.selector = KeyframeSelector(max_frames=4, min_gap=0.5)
+
+    def test_short_recording_sends_every_frame(self):
+        records = make_records([1.0, 0.1, 0.2])
+        self.assertEqual(self.selector.select(records), records)
+
+    def test_picks_scene_changes(self):
+        scores = [1.0] + [0.05] * 20 + [0.9] + [0.05] * 20 + [0.7] + [0.05] * 10
+        records = make_records(scores)
+        picked = [record.frame_id for record in self.selector.select(records)]
+        self.assertEqual(picked, [0, 21, 42, 52])
+
+    def test_min_gap(self):
+        records = make_records([1.0, 0.9, 0.8, 0.1, 0.1, 0.1, 0.1])
+        for record in records:
+            record.timestamp = record.frame_id * 0.1
+        records[-2].timestamp = 10.0
+        records[-1].timestamp = 11.0
+        picked = [record.frame_id for record in self.selector.select(records)]
+
+        # frames 1 and 2 are within min_gap of frame 0, 5 is far from the rest
+        self.assertEqual(picked, [0, 1, 5, 6])
+
+    def test_token_budget(self):
+        records = make_records([1.0] * 20)
+        picked = self.selector.select(records, max_frames=10, max_tokens=1000, tokens_per_frame=300)
+        self.assertEqual(len(picked), 3)
+
+    def test_segments_pick_frames_spoken_over(self):
+        scores = [1.0] + [0.05] * 52
+        scores[12] = 0.3
+        records = make_records(scores)
+        segments = [TranscriptSegment("open that", 10.2, 12.8), TranscriptSegment("this", 30.5, 30.7)]
+        picked = self.selector.select_for_segments(records, segments, max_frames=3)
+
+        # most changed frame inside the first segment, nearest to the second
+        self.assertEqual([record.frame_id for record in picked], [12, 31, 52])
+
+    def test_no_segments_falls_back_to_scores(self):
+        records = make_records([1.0] + [0.05] * 20 + [0.9] + [0.05] * 10)
+        self.assertEqual(
+            self.selector.select_for_segments(records, []),
+            self.selector.select(records))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import sys
+import unittest
+from lazy_import import LazyModule, import_report, lazy_import, load_times
+
+HEAVY_MODULES = ("cv2", "openai", "PIL", "pyautogui", "speech_recognition", "pyaudio", "whisper")
+
+class TestLazyImport(unittest.TestCase):
+    def test_loads_on_first_use(self):
+        sys.modules.pop("colorsys", None)
+        module = lazy_import("colorsys")
+        self.assertIsInstance(module, LazyModule)
+        self.assertNotIn("colorsys", sys.modules)
+
+        self.assertEqual(module.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertIn("colorsys", sys.modules)
+        self.assertIn("colorsys", load_times)
+
+    def test_loaded_module_is_returned(self):
+        self.assertIs(lazy_import("unittest"), unittest)
+
+    def test_tamagg_import_defers_heavy_modules(self):
+        report = import_report("tamagg")
+        self.assertIn("tamagg", report)
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, report, f"{module} imported at startup")
+
+if __name__ == "__main__":
+    unittest.main()
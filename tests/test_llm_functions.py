@@ -0,0 +1,44 @@
+import unittest
+from unittest import mock
+from llm_functions import LLMFunctions
+
+class TestLLMFunctionsCrop(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("llm_functions.pag")
+        self.pag = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("llm_functions.time.sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.llmfunc = LLMFunctions(console_display=None, imgw=1920, imgh=1080)
+
+    def test_click_in_crop_translated(self):
+        self.llmfunc.crop_offset = (600, 300)
+        self.llmfunc.handle_call("perform_actions", {"actions": [
+            {"type": "click", "x": 40, "y": 25, "in_crop": True}
+        ]})
+        self.pag.moveTo.assert_called_once_with(640, 325)
+
+    def test_frame_positions_unchanged(self):
+        self.llmfunc.crop_offset = (600, 300)
+        self.llmfunc.handle_call("perform_actions", {"actions": [
+            {"type": "move", "x": 40, "y": 25}
+        ]})
+        self.pag.moveTo.assert_called_once_with(40, 25)
+
+    def test_in_crop_without_crop_ignored(self):
+        self.llmfunc.handle_call("perform_actions", {"actions": [
+            {"type": "move", "x": 40, "y": 25, "in_crop": True}
+        ]})
+        self.pag.moveTo.assert_called_once_with(40, 25)
+
+    def test_drag_in_crop_not_scaled(self):
+        self.llmfunc.crop_offset = (100, 200)
+        self.llmfunc.handle_call("perform_actions", {"actions": [
+            {"type": "drag", "x": 10, "y": 20, "end_x": 30, "end_y": 40, "in_crop": True}
+        ]})
+        self.pag.mouseDown.assert_called_once_with(110, 220, button="left")
+        self.pag.mouseUp.assert_called_once_with(130, 240, button="left")
+
+if __name__ == "__main__":
+    unittest.main()
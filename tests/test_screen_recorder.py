@@ -65,8 +65,8 @@ class TestScreenRecorder(unittest.TestCase):
 
         # Convert the frame to base64
         try:
-            self.screen_recorder_instance.convert_frames_to_base64(frame)
-            base64_image = self.screen_recorder_instance.base64_frames[0]
+            self.screen_recorder_instance.process_frame(frame)
+            base64_image = self.screen_recorder_instance.get_base64_frames()[0]
 
             # Decode the base64 image back to bytes
             jpeg_image = base64.b64decode(base64_image)
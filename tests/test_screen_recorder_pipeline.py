@@ -0,0 +1,244 @@
+import threading
+import time
+import unittest
+import numpy as np
+from jpeg_encoders import JpegEncoder, with_fallback
+from screen_recorder import ScreenRecorder
+from stage_stats import StageStats
+
+def make_frame(seed: int, height: int=120, width: int=160) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, (height, width, 4), dtype=np.uint8)
+
+class FakeSession:
+    """
+    Capture session that hands out distinct frames and stops the
+    recorder after a number of grabs
+    """
+    def __init__(self, frames: int):
+        self.frames = frames
+        self.grabs = 0
+        self.released = False
+        self.recorder = None
+
+    def grab(self, monitor_number: int) -> np.ndarray:
+        self.grabs += 1
+        if self.grabs >= self.frames:
+            self.recorder.stop_recording()
+        return make_frame(self.grabs)
+
+    def release(self):
+        self.released = True
+
+class TestStageStats(unittest.TestCase):
+    def test_counts_items_and_busy_time(self):
+        stage = StageStats("test")
+        for _ in range(3):
+            with stage.measure():
+                time.sleep(0.01)
+        stats = stage.stats()
+
+        self.assertEqual(stats["items"], 3)
+        self.assertGreaterEqual(stats["avg_ms"], 9)
+        self.assertGreater(stats["per_second"], 0)
+
+    def test_failed_item_counted(self):
+        stage = StageStats("test")
+        with self.assertRaises(ValueError):
+            with stage.measure():
+                raise ValueError("boom")
+        self.assertEqual(stage.stats()["items"], 1)
+
+    def test_reset(self):
+        stage = StageStats("test")
+        with stage.measure():
+            pass
+        stage.reset()
+        self.assertEqual(stage.stats(), {"items": 0, "per_second": 0.0, "avg_ms": 0.0})
+
+class TestCapturePipeline(unittest.TestCase):
+    def make_recorder(self, frames: int, queue_size: int) -> ScreenRecorder:
+        session = FakeSession(frames)
+        recorder = ScreenRecorder(
+            monitor_number=1,
+            target_fps=1000,
+            queue_size=queue_size,
+            session=session,
+            jpeg_encoder="opencv"
+        )
+        session.recorder = recorder
+        self.addCleanup(recorder.close)
+        return recorder
+
+    def test_full_queue_drops_frames(self):
+        recorder = self.make_recorder(frames=1, queue_size=2)
+        for i in range(5):
+            recorder.enqueue_frame(make_frame(i), timestamp=i)
+
+        self.assertEqual(recorder.queue_drops, 3)
+        self.assertEqual(recorder.capture_queue.qsize(), 2)
+        self.assertEqual(recorder.pipeline_stats()["queue_drops"], 3)
+
+    def test_slow_process_stage_does_not_block_capture(self):
+        recorder = self.make_recorder(frames=20, queue_size=2)
+        process_frame = recorder.process_frame
+
+        def slow_process(frame, use_cuda=False, timestamp=None):
+            time.sleep(0.02)
+            process_frame(frame, use_cuda, timestamp)
+        recorder.process_frame = slow_process
+
+        start = time.monotonic()
+        recorder.start_recording()
+        stats = recorder.pipeline_stats()
+
+        self.assertEqual(stats["capture"]["items"], 20)
+        self.assertGreater(stats["queue_drops"], 0)
+        # every grabbed frame was either processed or dropped
+        self.assertEqual(stats["process"]["items"] + stats["queue_drops"], 20)
+        self.assertEqual(len(recorder.frames), stats["process"]["items"])
+        self.assertLess(time.monotonic() - start, 20 * 0.02)
+        self.assertTrue(recorder.session.released)
+
+    def test_frames_kept_in_capture_order(self):
+        recorder = self.make_recorder(frames=6, queue_size=8)
+        recorder.start_recording()
+
+        timestamps = [record.timestamp for record in recorder.frames.snapshot()]
+        self.assertEqual(len(timestamps), 6)
+        self.assertEqual(timestamps, sorted(timestamps))
+
+    def test_final_near_duplicate_kept(self):
+        recorder = self.make_recorder(frames=3, queue_size=8)
+        base = make_frame(1)
+        final = base.copy()
+        final[0, 0, 0] ^= 1
+        frames = iter((base, base.copy(), final))
+
+        def grab(monitor_number):
+            frame = next(frames)
+            if frame is final:
+                recorder.stop_recording()
+            return frame
+        recorder.session.grab = grab
+        recorder.start_recording()
+
+        records = recorder.frames.snapshot()
+        self.assertEqual(len(records), 2)
+        np.testing.assert_array_equal(records[-1].frame, final[:, :, :3])
+
+    def test_final_frame_dropped_by_queue_kept(self):
+        recorder = self.make_recorder(frames=3, queue_size=1)
+        # processing waits for the stop, the last grab finds the queue full
+        stopped = threading.Event()
+        process_frame = recorder.process_frame
+
+        def gated_process(frame, use_cuda=False, timestamp=None, final=False):
+            stopped.wait()
+            process_frame(frame, use_cuda, timestamp, final)
+        recorder.process_frame = gated_process
+        stop_recording = recorder.stop_recording
+
+        def stop():
+            stop_recording()
+            stopped.set()
+        recorder.stop_recording = stop
+        recorder.start_recording()
+
+        stats = recorder.pipeline_stats()
+        records = recorder.frames.snapshot()
+        np.testing.assert_array_equal(records[-1].frame, make_frame(3)[:, :, :3])
+        self.assertEqual(stats["process"]["items"] + stats["queue_drops"], 3)
+
+class TestScreenRecorderEncode(unittest.TestCase):
+    def setUp(self):
+        self.recorder = ScreenRecorder(monitor_number=1, encode_workers=1, jpeg_encoder="opencv")
+
+    def tearDown(self):
+        self.recorder.close()
+
+    def test_encode_pool_reused_between_requests(self):
+        threads = []
+        convert = self.recorder.convert_frames_to_base64
+
+        def record_thread(frame, detail="high"):
+            threads.append(threading.get_ident())
+            return convert(frame, detail)
+        self.recorder.convert_frames_to_base64 = record_thread
+
+        for request in range(3):
+            self.recorder.reset()
+            for i in range(2):
+                self.recorder.process_frame(make_frame(request * 10 + i), timestamp=i)
+            self.recorder.encode_records(self.recorder.frames.snapshot())
+
+        self.assertEqual(len(threads), 6)
+        self.assertEqual(len(set(threads)), 1)
+
+    def test_failing_encoder_does_not_fail_request(self):
+        class FailingEncoder(JpegEncoder):
+            name = "failing"
+
+            def encode(self, frame: np.ndarray) -> bytes:
+                raise ValueError("encode failed")
+
+        self.recorder.encoder = with_fallback(FailingEncoder())
+        for i in range(3):
+            self.recorder.process_frame(make_frame(i), timestamp=i)
+
+        with self.assertLogs("jpeg_encoders", "ERROR"):
+            frames = self.recorder.get_base64_frames(max_frames=3)
+        self.assertEqual(len(frames), 3)
+        self.assertTrue(all(frames))
+
+    def test_close_stops_pool(self):
+        self.recorder.close()
+        self.assertFalse(any(
+            thread.name.startswith("encode") and thread.is_alive()
+            for thread in threading.enumerate()
+        ))
+
+class TestGridOverlay(unittest.TestCase):
+    def setUp(self):
+        self.recorder = ScreenRecorder(monitor_number=1, jpeg_encoder="opencv")
+
+    def tearDown(self):
+        self.recorder.close()
+
+    def reference_overlay(self, frame: np.ndarray, grid_size: int=60) -> np.ndarray:
+        # one blended label at a time, how the overlay used to be drawn
+        image = np.ascontiguousarray(frame[:, :, :3])
+        height, width = image.shape[:2]
+        for x in range(0, width, grid_size):
+            for y in range(0, height, grid_size):
+                image = self.recorder.add_transparent_text(
+                    image, f"{x},{y}", (x, y), 0.4, (255, 255, 255, 255), 1, 0.1)
+        return image
+
+    def test_matches_per_label_overlay(self):
+        for height, width in ((240, 320), (1080, 1920)):
+            frame = make_frame(height, height, width)
+            expected = self.reference_overlay(frame.copy())
+            result = self.recorder.add_grid_overlay(frame)
+
+            diff = np.abs(result.astype(int) - expected.astype(int))
+            self.assertLessEqual(diff.max(), 1, (height, width))
+
+    def test_bgr_frame_supported(self):
+        frame = np.ascontiguousarray(make_frame(3)[:, :, :3])
+        expected = self.reference_overlay(frame.copy())
+        result = self.recorder.add_grid_overlay(frame)
+        self.assertLessEqual(np.abs(result.astype(int) - expected.astype(int)).max(), 1)
+
+    def test_input_not_mutated(self):
+        frame = make_frame(7)
+        original = frame.copy()
+        result = self.recorder.add_grid_overlay(frame)
+
+        np.testing.assert_array_equal(frame, original)
+        self.assertFalse(np.shares_memory(result, frame))
+        # the labels were drawn
+        self.assertFalse(np.array_equal(result, original[:, :, :3]))
+
+if __name__ == "__main__":
+    unittest.main()
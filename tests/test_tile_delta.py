@@ -0,0 +1,87 @@
+import unittest
+import zlib
+import numpy as np
+from frame_store import FrameStore
+from tile_delta import TileTracker
+
+def crc_collision(data: bytes) -> bytes:
+    """
+    Same length data with the same CRC32, some of the first 40 bits flipped.
+    CRC32 is affine, a flip set whose CRC changes cancel out is a nullspace
+    vector found by elimination over GF(2).
+    """
+    base = zlib.crc32(data)
+    rows = []
+    for bit in range(40):
+        flipped = bytearray(data)
+        flipped[bit // 8] ^= 1 << (bit % 8)
+        rows.append((zlib.crc32(bytes(flipped)) ^ base, 1 << bit))
+
+    pivots = {}
+    for change, flips in rows:
+        for pivot in sorted(pivots, reverse=True):
+            if change & pivot:
+                change ^= pivots[pivot][0]
+                flips ^= pivots[pivot][1]
+        if change == 0:
+            collided = bytearray(data)
+            for bit in range(40):
+                if flips >> bit & 1:
+                    collided[bit // 8] ^= 1 << (bit % 8)
+            return bytes(collided)
+        pivots[1 << (change.bit_length() - 1)] = (change, flips)
+    raise ValueError("no collision")
+
+class TestTileTracker(unittest.TestCase):
+    def setUp(self):
+        self.tracker = TileTracker(tile_size=64)
+        self.frame = np.random.randint(0, 255, (200, 300, 4), dtype=np.uint8)
+
+    def commit(self, frame):
+        return self.tracker.commit(frame, self.tracker.digests(frame))
+
+    def test_rebuilds_full_frame(self):
+        tiled = self.commit(self.frame)
+        np.testing.assert_array_equal(np.asarray(tiled), self.frame[:, :, :3])
+
+    def test_only_changed_tiles_stored(self):
+        first = self.commit(self.frame)
+        changed = self.frame.copy()
+        changed[70:80, 70:80] = 0
+        second = self.commit(changed)
+
+        self.assertEqual(second.owned, {6})
+        self.assertEqual(second.nbytes, 64 * 64 * 3)
+        self.assertIs(second.tiles[0], first.tiles[0])
+        np.testing.assert_array_equal(np.asarray(second), changed[:, :, :3])
+
+    def test_crc_collision_detected(self):
+        frame = np.random.randint(0, 255, (64, 64, 4), dtype=np.uint8)
+        collided = np.frombuffer(crc_collision(frame.tobytes()), dtype=np.uint8).reshape(frame.shape)
+        self.assertEqual(zlib.crc32(collided.tobytes()), zlib.crc32(frame.tobytes()))
+        self.assertFalse(np.array_equal(collided, frame))
+
+        self.commit(frame)
+        self.assertEqual(self.tracker.changed_tiles(collided, self.tracker.digests(collided)), [0])
+
+    def test_eviction_hands_over_shared_tiles(self):
+        store = FrameStore(max_bytes=1 << 30)
+        first = self.commit(self.frame)
+        store.append(first)
+        changed = self.frame.copy()
+        changed[0:10, 0:10] = 0
+        second = self.commit(changed)
+        store.append(second)
+        full_bytes = first.nbytes
+
+        store.max_bytes = 2 * full_bytes
+        store.append(self.commit(changed[::-1].copy()))
+
+        # the first frame's tiles are still used by the second frame,
+        # only its changed corner tile is released
+        self.assertEqual(len(store), 2)
+        self.assertEqual(second.nbytes, full_bytes)
+        self.assertEqual(store.nbytes, 2 * full_bytes)
+
+if __name__ == "__main__":
+    unittest.main()
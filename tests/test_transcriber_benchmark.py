@@ -0,0 +1,97 @@
+import logging
+import os
+import tempfile
+import time
+import unittest
+import wave
+import numpy as np
+from transcriber import (
+    TranscriptionEngine, available_engines, benchmark_engine, compare_engines, create_engine,
+    read_wav
+)
+
+def write_fixture(path: str, rate: int=8000):
+    """
+    Synthetic recording, a voiced tone burst between stretches of quiet
+    noise, written as 16 bit mono WAV.
+    """
+    rng = np.random.default_rng(0)
+    t = np.arange(rate) / rate
+    voiced = np.sin(2 * np.pi * 180 * t) * np.sin(np.pi * t) * 8000
+    quiet = rng.standard_normal(rate // 2) * 50
+    samples = np.concatenate((quiet, voiced, quiet)).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+class SleepEngine(TranscriptionEngine):
+    """
+    Takes a fixed fraction of the audio length to transcribe
+    """
+    def __init__(self, name: str, factor: float):
+        super().__init__("sleep")
+        self.name = name
+        self.factor = factor
+
+    def create_model(self):
+        return object()
+
+    def transcribe_arrays(self, arrays):
+        self.load()
+        time.sleep(self.factor * sum(len(a) for a in arrays) / self.SAMPLE_RATE)
+        return [""] * len(arrays)
+
+class TestTranscriberBenchmark(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.fixture = os.path.join(cls.tmp.name, "speech.wav")
+        write_fixture(cls.fixture)
+        cls.arrays = [read_wav(cls.fixture)]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_read_wav_resamples(self):
+        samples = self.arrays[0]
+        self.assertEqual(samples.dtype, np.float32)
+        # 2s at 8kHz read as 16kHz
+        self.assertAlmostEqual(len(samples), 2 * TranscriptionEngine.SAMPLE_RATE, delta=4)
+        self.assertLessEqual(np.abs(samples).max(), 1.0)
+
+    def test_real_time_factor(self):
+        rtf = benchmark_engine(SleepEngine("sleep", 0.1), self.arrays)
+        self.assertGreater(rtf, 0.08)
+        self.assertLess(rtf, 0.3)
+
+    def test_compare_orders_by_speed(self):
+        rtfs = compare_engines(
+            [SleepEngine("slow", 0.15), SleepEngine("fast", 0.05)], self.arrays)
+        self.assertEqual(list(rtfs), ["fast", "slow"])
+        self.assertLess(rtfs["fast"], rtfs["slow"])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_engine("missing")
+
+    @unittest.skipUnless(available_engines(), "no transcription backend installed")
+    def test_compare_installed_backends(self):
+        engines = [
+            create_engine(name, model=os.getenv("WHISPER_MODEL", "tiny"))
+            for name in available_engines()
+        ]
+        with self.assertLogs("transcriber", logging.INFO):
+            rtfs = compare_engines(engines, self.arrays)
+        self.assertEqual(set(rtfs), set(available_engines()))
+        for name, rtf in rtfs.items():
+            self.assertGreater(rtf, 0, name)
+        for engine in engines:
+            texts = engine.transcribe_arrays(self.arrays)
+            self.assertEqual(len(texts), 1)
+            self.assertIsInstance(texts[0], str)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+import threading
+import time
+import unittest
+from unittest import mock
+import numpy as np
+import speech_recognition as sr
+from transcriber import TranscriptionEngine, Transcriber, WhisperEngine
+
+class FakeRecorder:
+    """
+    Yields a fixed list of utterances, recording how long each hand off took
+    """
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.gaps = []
+
+    def record(self):
+        for chunk in self.chunks:
+            start = time.monotonic()
+            yield chunk
+            self.gaps.append(time.monotonic() - start)
+
+    def stop(self):
+        pass
+
+class FakeEngine(TranscriptionEngine):
+    """
+    Returns the text each utterance carries after a delay
+    """
+    name = "fake"
+
+    def __init__(self, delay):
+        super().__init__("fake")
+        self.delay = delay
+        self.batches = []
+
+    def transcribe(self, audio_data):
+        return self.transcribe_batch([audio_data])[0]
+
+    def transcribe_batch(self, audio_list):
+        self.batches.append(len(audio_list))
+        time.sleep(max(self.delay(a.text) for a in audio_list))
+        return [a.text for a in audio_list]
+
+def audio(text: str) -> sr.AudioData:
+    # 0.1s of silence, the text rides along for the fake engine
+    data = sr.AudioData(b"\x00\x00" * 1600, 16000, 2)
+    data.text = text
+    return data
+
+class TestTranscriberQueue(unittest.TestCase):
+    def make_transcriber(self, chunks, delay, **kwargs):
+        transcriber = Transcriber(engine=FakeEngine(delay), **kwargs)
+        transcriber.audio_recorder = FakeRecorder(chunks)
+        return transcriber
+
+    def test_capture_does_not_wait_on_transcription(self):
+        chunks = [audio(str(i)) for i in range(4)]
+        transcriber = self.make_transcriber(chunks, lambda text: 0.1, batch_size=1)
+        transcriber.record_transcribe()
+
+        self.assertLess(max(transcriber.audio_recorder.gaps), 0.05)
+        self.assertEqual(transcriber.transcribed_text, "0 1 2 3")
+
+    def test_order_kept_with_workers(self):
+        chunks = [audio(str(i)) for i in range(6)]
+        # earlier utterances take longer, finishing out of order
+        transcriber = self.make_transcriber(
+            chunks, lambda text: 0.02 * (6 - int(text)), workers=3, batch_size=1)
+        transcriber.record_transcribe()
+
+        self.assertEqual(transcriber.transcribed_text, "0 1 2 3 4 5")
+        self.assertEqual([s.text for s in transcriber.segments], [str(i) for i in range(6)])
+        starts = [s.start for s in transcriber.segments]
+        self.assertEqual(starts, sorted(starts))
+
+    def test_waiting_utterances_batched(self):
+        chunks = [audio(str(i)) for i in range(5)]
+        transcriber = self.make_transcriber(chunks, lambda text: 0.1, batch_size=4)
+        transcriber.record_transcribe()
+
+        self.assertEqual(transcriber.transcribed_text, "0 1 2 3 4")
+        self.assertEqual(sum(transcriber.engine.batches), 5)
+        self.assertGreater(max(transcriber.engine.batches), 1)
+
+    def test_full_queue_drops_oldest(self):
+        chunks = [audio(str(i)) for i in range(5)]
+        release = threading.Event()
+        transcriber = self.make_transcriber(
+            chunks, lambda text: 0 if release.wait(2) else 0, queue_size=2)
+        thread = threading.Thread(target=transcriber.record_transcribe)
+        thread.start()
+        time.sleep(0.1)
+        release.set()
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertGreater(transcriber.dropped, 0)
+        self.assertTrue(transcriber.transcribed_text.endswith("4"))
+
+class TestWhisperEngine(unittest.TestCase):
+    def test_audio_array_resampled(self):
+        samples = (np.sin(np.arange(8000) / 10) * 16000).astype(np.int16)
+        data = sr.AudioData(samples.tobytes(), 8000, 2)
+        array = WhisperEngine.audio_array(data)
+
+        self.assertEqual(array.dtype, np.float32)
+        self.assertAlmostEqual(len(array), WhisperEngine.SAMPLE_RATE, delta=2)
+        self.assertLessEqual(np.abs(array).max(), 1.0)
+
+
+class FakeTensor(np.ndarray):
+    def to(self, device):
+        return self
+
+class FakeResult:
+    def __init__(self, text, no_speech_prob=0.1, avg_logprob=-0.3, compression_ratio=1.5):
+        self.text = text
+        self.no_speech_prob = no_speech_prob
+        self.avg_logprob = avg_logprob
+        self.compression_ratio = compression_ratio
+
+class FakeWhisper:
+    """
+    whisper module whose windows carry a code for the result to return
+    """
+    def __init__(self):
+        self.temperatures = []
+
+    @staticmethod
+    def pad_or_trim(samples):
+        return samples
+
+    @staticmethod
+    def log_mel_spectrogram(samples, n_mels):
+        return np.full(4, samples[0], dtype=np.float32)
+
+    @staticmethod
+    def DecodingOptions(**options):
+        return options
+
+    def decode(self, model, mel, options):
+        temperature = options["temperature"]
+        self.temperatures.append((temperature, len(mel)))
+        results = []
+        for window in mel:
+            code = int(window[0])
+            if code == 1:
+                results.append(FakeResult(" Thank you.", no_speech_prob=0.9, avg_logprob=-1.5))
+            elif code == 2 and temperature == 0:
+                results.append(FakeResult(" go go go go go", compression_ratio=3.0))
+            elif code == 3:
+                results.append(FakeResult(" unsure", avg_logprob=-2.0))
+            elif code == 4 and temperature == 0:
+                # repetition loop that also looks like silence
+                results.append(FakeResult(" la la la la la", no_speech_prob=0.8, compression_ratio=3.0))
+            else:
+                results.append(FakeResult(f" text {code}"))
+        return results
+
+class FakeTorch:
+    @staticmethod
+    def stack(windows):
+        return np.stack(windows).view(FakeTensor)
+
+class TestWhisperDecoding(unittest.TestCase):
+    def setUp(self):
+        self.whisper = FakeWhisper()
+        for name, fake in (("whisper", self.whisper), ("torch", FakeTorch)):
+            patcher = mock.patch(f"transcriber.{name}", fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.engine = WhisperEngine()
+        self.engine.model = mock.Mock()
+        self.engine.model.device.type = "cpu"
+
+    def transcribe(self, codes):
+        return self.engine.transcribe_arrays(
+            [np.full(16000, code, dtype=np.float32) for code in codes])
+
+    def test_silence_dropped(self):
+        self.assertEqual(self.transcribe([0, 1]), ["text 0", ""])
+        self.assertEqual(self.whisper.temperatures, [(0.0, 2)])
+
+    def test_repetition_retried_at_higher_temperature(self):
+        self.assertEqual(self.transcribe([0, 2]), ["text 0", "text 2"])
+        # only the failed window is decoded again
+        self.assertEqual(self.whisper.temperatures, [(0.0, 2), (0.2, 1)])
+
+    def test_repetition_retried_despite_no_speech_prob(self):
+        self.assertEqual(self.transcribe([4]), ["text 4"])
+        self.assertEqual(self.whisper.temperatures, [(0.0, 1), (0.2, 1)])
+
+    def test_last_temperature_result_kept(self):
+        self.assertEqual(self.transcribe([3]), ["unsure"])
+        self.assertEqual(
+            [t for t, _ in self.whisper.temperatures], list(WhisperEngine.TEMPERATURES))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from audio_recorder import AudioRecorder
+from vad_segmenter import RingBuffer, VadSegmenter
+
+RATE = 16000
+
+def noise(seconds: float, level: float=30) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(int(RATE * seconds)) * level).astype(np.int16)
+
+def tone(seconds: float, level: float=6000) -> np.ndarray:
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (np.sin(2 * np.pi * 220 * t) * level).astype(np.int16)
+
+def feed_chunks(segmenter: VadSegmenter, samples: np.ndarray, chunk: int=2048) -> list:
+    segments = []
+    for offset in range(0, len(samples), chunk):
+        segments += segmenter.feed(samples[offset:offset + chunk].tobytes())
+    return segments
+
+class TestRingBuffer(unittest.TestCase):
+    def test_wraps_and_reads_by_index(self):
+        ring = RingBuffer(10)
+        data = np.arange(25, dtype=np.int16)
+        for offset in range(0, 25, 4):
+            ring.write(data[offset:offset + 4])
+
+        self.assertEqual(ring.written, 25)
+        self.assertEqual(ring.oldest(), 15)
+        np.testing.assert_array_equal(ring.read(17, 23), data[17:23])
+        # older samples were overwritten
+        np.testing.assert_array_equal(ring.read(0, 18), data[15:18])
+
+    def test_write_larger_than_capacity(self):
+        ring = RingBuffer(4)
+        ring.write(np.arange(7, dtype=np.int16))
+        np.testing.assert_array_equal(ring.read(0, 7), [3, 4, 5, 6])
+
+class TestVadSegmenter(unittest.TestCase):
+    def test_utterances_with_pre_roll_and_hangover(self):
+        segmenter = VadSegmenter(RATE, pre_roll_ms=300, hangover_ms=600)
+        audio = np.concatenate((noise(1.0), tone(0.8), noise(1.0), tone(0.5), noise(1.0)))
+        segments = feed_chunks(segmenter, audio)
+
+        self.assertEqual(len(segments), 2)
+        # speech plus up to a frame of pre-roll and the hangover
+        self.assertAlmostEqual(len(segments[0]) / RATE, 0.3 + 0.8 + 0.6, delta=0.07)
+        # the pre-roll is quiet, the onset is kept
+        self.assertLess(np.abs(segments[0][:RATE // 10]).max(), 1000)
+        self.assertEqual(np.abs(segments[0]).max(), np.abs(tone(0.8)).max())
+
+    def test_silence_emits_nothing(self):
+        segmenter = VadSegmenter(RATE)
+        self.assertEqual(feed_chunks(segmenter, noise(3.0)), [])
+        self.assertIsNone(segmenter.flush())
+
+    def test_short_pause_keeps_one_utterance(self):
+        segmenter = VadSegmenter(RATE, hangover_ms=600)
+        audio = np.concatenate((noise(0.5), tone(0.5), noise(0.3), tone(0.5), noise(1.0)))
+        self.assertEqual(len(feed_chunks(segmenter, audio)), 1)
+
+    def test_click_dropped(self):
+        segmenter = VadSegmenter(RATE, min_speech_ms=200)
+        audio = np.concatenate((noise(0.5), tone(0.06), noise(1.0)))
+        self.assertEqual(feed_chunks(segmenter, audio), [])
+
+    def test_flush_returns_speech_in_progress(self):
+        segmenter = VadSegmenter(RATE)
+        self.assertEqual(feed_chunks(segmenter, np.concatenate((noise(0.5), tone(1.0)))), [])
+        segment = segmenter.flush()
+        self.assertIsNotNone(segment)
+        self.assertGreater(len(segment) / RATE, 1.0)
+
+    def test_long_speech_cut_at_max(self):
+        segmenter = VadSegmenter(RATE, max_segment_s=2.0)
+        segments = feed_chunks(segmenter, np.concatenate((noise(0.5), tone(5.0), noise(1.0))))
+
+        self.assertGreaterEqual(len(segments), 3)
+        self.assertTrue(all(len(s) <= 2.0 * RATE for s in segments))
+        # cut pieces do not repeat audio through the pre-roll
+        self.assertAlmostEqual(sum(len(s) for s in segments) / RATE, 0.3 + 5.0 + 0.6, delta=0.1)
+
+    def test_threshold_follows_noise_floor(self):
+        segmenter = VadSegmenter(RATE, min_threshold=50)
+        feed_chunks(segmenter, noise(1.0, level=400))
+        self.assertGreater(segmenter.threshold, 1000)
+        # loud background alone is not speech
+        self.assertEqual(feed_chunks(segmenter, noise(2.0, level=400)), [])
+
+class FakeStream:
+    def __init__(self, samples: np.ndarray, recorder: AudioRecorder):
+        self.samples = samples
+        self.recorder = recorder
+        self.offset = 0
+
+    def read(self, size: int) -> bytes:
+        chunk = self.samples[self.offset:self.offset + size]
+        self.offset += size
+        if self.offset >= len(self.samples):
+            self.recorder.stop()
+        return chunk.tobytes()
+
+class TestAudioRecorderVad(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.recorder = AudioRecorder(
+            cache_path=os.path.join(self.tmp.name, "thresholds.json"), vad=True)
+
+    def record(self, samples: np.ndarray) -> list:
+        microphone = mock.MagicMock()
+        microphone.__enter__.return_value = microphone
+        microphone.SAMPLE_RATE = RATE
+        microphone.SAMPLE_WIDTH = 2
+        microphone.CHUNK = 1024
+        microphone.stream = FakeStream(samples, self.recorder)
+        with mock.patch("speech_recognition.Microphone", return_value=microphone), \
+                mock.patch.object(self.recorder.recognizer, "listen") as listen:
+            audio = list(self.recorder.record())
+        listen.assert_not_called()
+        return audio
+
+    def test_yields_utterances_only(self):
+        audio = self.record(np.concatenate((noise(1.0), tone(0.8), noise(1.0), tone(0.4))))
+
+        self.assertEqual(len(audio), 2)
+        self.assertEqual(audio[0].sample_rate, RATE)
+        self.assertAlmostEqual(len(audio[0].frame_data) / 2 / RATE, 1.7, delta=0.1)
+
+    def test_silence_yields_nothing(self):
+        self.assertEqual(self.record(noise(2.0)), [])
+
+    def test_noise_floor_cached(self):
+        self.record(noise(1.0, level=400))
+        floor = self.recorder.cached_threshold(self.recorder.vad_key())
+        self.assertGreater(floor, 300)
+
+        recorder = AudioRecorder(cache_path=self.recorder.cache_path, vad=True)
+        self.assertEqual(recorder.segmenter_for(RATE).noise_floor, floor)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+"""
+Tile Delta
+
+Dirty tile tracking for large captures. Frames are split into tiles with a
+digest each, only tiles whose digest changed since the last stored frame
+are converted and stored. Unchanged tiles are shared with the frame before
+so a small window update on a large desktop stores a few tiles, not a full
+frame. Full frames are rebuilt on demand.
+"""
+import hashlib
+import logging
+import cv2
+import numpy as np
+
+class TiledFrame:
+    """
+    A BGR frame stored as a grid of tiles, shared with neighbouring frames
+    """
+    def __init__(
+            self,
+            shape: tuple,
+            tile_slices: list[tuple[slice, slice]],
+            tiles: list[np.ndarray],
+            owned: set[int]):
+        self.shape = shape
+        self.tile_slices = tile_slices
+        self.tiles = tiles
+        # tiles this frame introduced, the memory they hold is counted here
+        self.owned = owned
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self.tiles[idx].nbytes for idx in self.owned)
+
+    def hand_over(self, successor: "TiledFrame") -> int:
+        """
+        Pass ownership of still shared tiles to the next stored frame
+        when this frame is evicted.
+
+        A tile is only ever shared by consecutive frames, so if the next
+        stored frame does not share it no later frame does.
+
+        Returns:
+        int: Bytes now owned by the successor.
+        """
+        moved = 0
+        if not isinstance(successor, TiledFrame) or successor.shape != self.shape:
+            return moved
+
+        for idx in self.owned:
+            if successor.tiles[idx] is self.tiles[idx]:
+                successor.owned.add(idx)
+                moved += self.tiles[idx].nbytes
+        self.owned = set()
+        return moved
+
+    def to_array(self) -> np.ndarray:
+        """
+        Rebuild the full frame.
+        """
+        frame = np.empty(self.shape, dtype=np.uint8)
+        for (rows, cols), tile in zip(self.tile_slices, self.tiles):
+            frame[rows, cols] = tile
+        return frame
+
+    def __array__(self, dtype=None, copy=None):
+        frame = self.to_array()
+        if dtype is not None:
+            frame = frame.astype(dtype, copy=False)
+        return frame
+
+class TileTracker:
+    def __init__(self, tile_size: int=256):
+        """
+        Initialize the TileTracker class.
+
+        Parameters:
+        tile_size (int): Width and height of a tile in pixels.
+        """
+        self.tile_size = tile_size
+        self.previous: TiledFrame = None
+        self.previous_digests: list[bytes] = None
+        self.slice_cache = {}
+        self.tile_buffers = {}
+        self.tiles_seen = 0
+        self.tiles_changed = 0
+        self.logger = logging.getLogger(__name__)
+
+    def tile_slices(self, height: int, width: int) -> list[tuple[slice, slice]]:
+        key = (height, width)
+        if key not in self.slice_cache:
+            self.slice_cache[key] = [
+                (slice(y, min(y + self.tile_size, height)), slice(x, min(x + self.tile_size, width)))
+                for y in range(0, height, self.tile_size)
+                for x in range(0, width, self.tile_size)
+            ]
+        return self.slice_cache[key]
+
+    def digests(self, frame: np.ndarray) -> list[bytes]:
+        """
+        Digest of every tile of a frame.
+
+        Each tile is copied into a reused contiguous buffer to be hashed,
+        the frame itself can be a view of the capture buffer. The 16 byte
+        BLAKE2b digests are trusted without comparing pixels, by the tile
+        diff and by the deduplicator through frame_digest, so they have to
+        be collision resistant, a CRC is not.
+        """
+        height, width = frame.shape[:2]
+        digests = []
+        for rows, cols in self.tile_slices(height, width):
+            tile = frame[rows, cols]
+            buffer = self.tile_buffers.get(tile.shape)
+            if buffer is None:
+                buffer = np.empty(tile.shape, dtype=np.uint8)
+                self.tile_buffers[tile.shape] = buffer
+            np.copyto(buffer, tile)
+            digests.append(hashlib.blake2b(buffer.data, digest_size=16).digest())
+        return digests
+
+    def frame_digest(self, frame: np.ndarray, digests: list[bytes]) -> bytes:
+        """
+        Digest of the whole frame built from its tile digests.
+        """
+        digest = hashlib.blake2b(repr(frame.shape[:2]).encode(), digest_size=16)
+        for tile_digest in digests:
+            digest.update(tile_digest)
+        return digest.digest()
+
+    def changed_tiles(self, frame: np.ndarray, digests: list[bytes]) -> list[int]:
+        """
+        Indexes of the tiles that differ from the last stored frame.
+        """
+        if (self.previous is None
+                or self.previous.shape[:2] != frame.shape[:2]):
+            return list(range(len(digests)))
+
+        return [
+            idx for idx, (new, old) in enumerate(zip(digests, self.previous_digests))
+            if new != old
+        ]
+
+    def commit(self, frame: np.ndarray, digests: list[bytes]) -> TiledFrame:
+        """
+        Store a frame, converting only its changed tiles to BGR.
+
+        Parameters:
+        frame (np.ndarray): BGR or BGRA frame.
+        digests (list[bytes]): Tile digests from digests().
+
+        Returns:
+        TiledFrame: The stored frame, sharing unchanged tiles with the
+        previous one.
+        """
+        height, width = frame.shape[:2]
+        tile_slices = self.tile_slices(height, width)
+        changed = self.changed_tiles(frame, digests)
+
+        tiles = list(self.previous.tiles) if len(changed) < len(tile_slices) else [None] * len(tile_slices)
+        for idx in changed:
+            rows, cols = tile_slices[idx]
+            if frame.shape[2] == 4:
+                tiles[idx] = cv2.cvtColor(frame[rows, cols], cv2.COLOR_BGRA2BGR)
+            else:
+                tiles[idx] = frame[rows, cols].copy()
+
+        self.tiles_seen += len(tile_slices)
+        self.tiles_changed += len(changed)
+
+        tiled = TiledFrame((height, width, 3), tile_slices, tiles, set(changed))
+        self.previous = tiled
+        self.previous_digests = digests
+        return tiled
+
+    def stats(self) -> dict:
+        return {
+            "tiles_seen": self.tiles_seen,
+            "tiles_changed": self.tiles_changed,
+            "changed_ratio": round(self.tiles_changed / self.tiles_seen, 3) if self.tiles_seen else 0.0
+        }
+
+    def reset(self):
+        self.previous = None
+        self.previous_digests = None
+        self.tiles_seen = 0
+        self.tiles_changed = 0
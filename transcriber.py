@@ -1,41 +1,507 @@
+import importlib.util
 import logging
+import queue
+import threading
+import time
+import numpy as np
 import speech_recognition as sr
 from audio_recorder import AudioRecorder
+from lazy_import import lazy_import
+
+# torch and the model code only load with the first model
+whisper = lazy_import("whisper")
+torch = lazy_import("torch")
+faster_whisper = lazy_import("faster_whisper")
+
+# resident models keyed by engine settings, shared by every engine
+_models = {}
+_models_lock = threading.Lock()
+
+class TranscriptSegment:
+    """
+    A transcribed utterance and the monotonic time span it was spoken in
+    """
+    def __init__(self, text: str, start: float, end: float):
+        self.text = text
+        self.start = start
+        self.end = end
+
+class TranscriptionEngine:
+    """
+    Base engine, backends implement available, create_model and
+    transcribe_arrays. The model is loaded once and kept resident, so an
+    utterance only pays for inference.
+    """
+    name = "base"
+    SAMPLE_RATE = 16000
+
+    def __init__(self, model: str="base", language: str=None):
+        self.model_name = model
+        self.language = language
+        self.model = None
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def available(cls) -> bool:
+        return True
+
+    def key(self) -> tuple:
+        """
+        Settings that identify a loaded model, engines with the same key
+        share it.
+        """
+        return (self.name, self.model_name)
+
+    def create_model(self):
+        raise NotImplementedError
+
+    def load(self):
+        """
+        Resident model, loaded on first use.
+        """
+        if self.model is None:
+            key = self.key()
+            with _models_lock:
+                if key not in _models:
+                    start = time.perf_counter()
+                    _models[key] = self.create_model()
+                    self.logger.info(
+                        f"Loaded {self.name} {self.model_name} in {time.perf_counter() - start:.1f}s")
+                self.model = _models[key]
+        return self.model
+
+    def warmup(self, background: bool=True) -> threading.Thread:
+        """
+        Load the model and run one silent window through it, so the first
+        utterance does not pay for loading.
+
+        Returns:
+        threading.Thread: The warm up thread when run in the background.
+        """
+        def run():
+            try:
+                self.transcribe_arrays([np.zeros(self.SAMPLE_RATE, dtype=np.float32)])
+            except Exception as err:
+                self.logger.error(f"{self.name} warm up failed: {err}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    @classmethod
+    def audio_array(cls, audio_data: sr.AudioData) -> np.ndarray:
+        """
+        16kHz mono float32 samples in [-1, 1], what whisper takes.
+        """
+        raw = audio_data.get_raw_data(convert_rate=cls.SAMPLE_RATE, convert_width=2)
+        return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def transcribe(self, audio_data: sr.AudioData) -> str:
+        return self.transcribe_batch([audio_data])[0]
+
+    def transcribe_batch(self, audio_list: list[sr.AudioData]) -> list[str]:
+        """
+        Transcribe several utterances.
+
+        Returns:
+        list[str]: Text per utterance, in order.
+        """
+        return self.transcribe_arrays([self.audio_array(a) for a in audio_list])
+
+    def transcribe_arrays(self, arrays: list[np.ndarray]) -> list[str]:
+        raise NotImplementedError
+
+class WhisperEngine(TranscriptionEngine):
+    """
+    openai-whisper in full precision, on the GPU when there is one
+    """
+    name = "whisper"
+    # whisper decodes 30 second windows, shorter audio can be batched
+    MAX_BATCH_SECONDS = 30
+    # the defaults whisper's transcribe checks results against
+    TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+    COMPRESSION_RATIO_THRESHOLD = 2.4
+    LOGPROB_THRESHOLD = -1.0
+    NO_SPEECH_THRESHOLD = 0.6
+
+    def __init__(self, model: str="base", language: str=None, device: str=None):
+        """
+        Initialize the WhisperEngine class.
+
+        Parameters:
+        model (str): Whisper model name, e.g. tiny, base, small.
+        language (str): Spoken language, detected per utterance when None.
+        device (str): torch device, whisper picks cuda when available.
+        """
+        super().__init__(model, language)
+        self.device = device
+
+    @classmethod
+    def available(cls) -> bool:
+        return importlib.util.find_spec("whisper") is not None
+
+    def key(self) -> tuple:
+        return (self.name, self.model_name, self.device)
+
+    def create_model(self):
+        return whisper.load_model(self.model_name, device=self.device)
+
+    def transcribe_arrays(self, arrays: list[np.ndarray]) -> list[str]:
+        model = self.load()
+        fp16 = model.device.type != "cpu"
+        texts = [None] * len(arrays)
+
+        # utterances that fit a window are decoded together in one pass
+        short = [
+            i for i, samples in enumerate(arrays)
+            if len(samples) <= self.MAX_BATCH_SECONDS * self.SAMPLE_RATE
+        ]
+        if short:
+            mel = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(arrays[i]), model.dims.n_mels)
+                for i in short
+            ]).to(model.device)
+            for i, text in zip(short, self.decode_with_fallback(model, mel, fp16)):
+                texts[i] = text
+
+        for i, samples in enumerate(arrays):
+            if texts[i] is None:
+                texts[i] = model.transcribe(samples, language=self.language, fp16=fp16)["text"]
+
+        return [text.strip() for text in texts]
+
+    def decode_with_fallback(self, model, mel, fp16: bool) -> list[str]:
+        """
+        Decode a batch of windows the way whisper's transcribe does. A
+        result that looks like a repetition loop or has a low log
+        probability is decoded again at the next temperature, one that is
+        most likely silence is dropped.
+
+        Returns:
+        list[str]: Text per window, empty for silence.
+        """
+        texts = [None] * len(mel)
+        pending = list(range(len(mel)))
+        for n, temperature in enumerate(self.TEMPERATURES):
+            last = n == len(self.TEMPERATURES) - 1
+            options = whisper.DecodingOptions(
+                language=self.language,
+                fp16=fp16,
+                temperature=temperature,
+                best_of=5 if temperature > 0 else None
+            )
+            results = whisper.decode(model, mel[pending], options)
+
+            retry = []
+            for i, result in zip(pending, results):
+                # likely silence only when whisper is also unsure of the
+                # text, as in whisper's transcribe
+                silent = (
+                    result.no_speech_prob > self.NO_SPEECH_THRESHOLD
+                    and result.avg_logprob < self.LOGPROB_THRESHOLD
+                )
+                needs_fallback = (
+                    result.compression_ratio > self.COMPRESSION_RATIO_THRESHOLD
+                    or result.avg_logprob < self.LOGPROB_THRESHOLD
+                )
+                if needs_fallback and not silent and not last:
+                    retry.append(i)
+                elif silent:
+                    texts[i] = ""
+                else:
+                    texts[i] = result.text
+
+            if not retry:
+                break
+            self.logger.debug(f"Retrying {len(retry)} windows above temperature {temperature}")
+            pending = retry
+        return texts
+
+class FasterWhisperEngine(TranscriptionEngine):
+    """
+    faster-whisper (CTranslate2) with int8 weights, several times faster
+    than full precision whisper on a CPU
+    """
+    name = "faster-whisper"
+
+    def __init__(
+            self,
+            model: str="base",
+            language: str=None,
+            device: str="cpu",
+            compute_type: str="int8",
+            beam_size: int=1,
+            cpu_threads: int=0):
+        """
+        Initialize the FasterWhisperEngine class.
+
+        Parameters:
+        model (str): Model size, e.g. tiny, base, small, or a converted
+            model directory.
+        language (str): Spoken language, detected per utterance when None.
+        device (str): cpu, cuda or auto.
+        compute_type (str): CTranslate2 weight type, int8 quantized by
+            default.
+        beam_size (int): Beam search width, 1 is greedy decoding.
+        cpu_threads (int): Inference threads, 0 lets CTranslate2 choose.
+        """
+        super().__init__(model, language)
+        self.device = device
+        self.compute_type = compute_type
+        self.beam_size = beam_size
+        self.cpu_threads = cpu_threads
+
+    @classmethod
+    def available(cls) -> bool:
+        return importlib.util.find_spec("faster_whisper") is not None
+
+    def key(self) -> tuple:
+        return (self.name, self.model_name, self.device, self.compute_type, self.cpu_threads)
+
+    def create_model(self):
+        return faster_whisper.WhisperModel(
+            self.model_name,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads
+        )
+
+    def transcribe_arrays(self, arrays: list[np.ndarray]) -> list[str]:
+        model = self.load()
+        texts = []
+        for samples in arrays:
+            segments, _ = model.transcribe(
+                samples, language=self.language, beam_size=self.beam_size)
+            texts.append("".join(segment.text for segment in segments).strip())
+        return texts
+
+ENGINES = {
+    engine.name: engine
+    for engine in (WhisperEngine, FasterWhisperEngine)
+}
+
+def available_engines() -> list[str]:
+    """
+    Names of the backends installed on this host.
+    """
+    return [name for name, engine in ENGINES.items() if engine.available()]
+
+def default_backend() -> str:
+    """
+    The quantized CPU engine when installed, it is the faster one on hosts
+    without a GPU.
+    """
+    if FasterWhisperEngine.available():
+        return FasterWhisperEngine.name
+    return WhisperEngine.name
+
+def create_engine(backend: str="whisper", **options) -> TranscriptionEngine:
+    """
+    Engine for a backend name, options go to its constructor.
+    """
+    engine = ENGINES.get(backend)
+    if engine is None:
+        raise ValueError(f"Unknown transcription backend {backend}")
+    return engine(**options)
+
+def read_wav(path: str) -> np.ndarray:
+    """
+    WAV file as 16kHz mono float32 samples.
+    """
+    with sr.AudioFile(path) as source:
+        audio_data = sr.Recognizer().record(source)
+    return TranscriptionEngine.audio_array(audio_data)
+
+def benchmark_engine(engine: TranscriptionEngine, arrays: list[np.ndarray]) -> float:
+    """
+    Real time factor, seconds of processing per second of audio, after
+    loading and warming the model. Below 1 is faster than real time.
+    """
+    engine.warmup(background=False)
+    duration = sum(len(samples) for samples in arrays) / engine.SAMPLE_RATE
+    start = time.perf_counter()
+    for samples in arrays:
+        engine.transcribe_arrays([samples])
+    return (time.perf_counter() - start) / duration
+
+def compare_engines(engines: list[TranscriptionEngine], arrays: list[np.ndarray]) -> dict[str, float]:
+    """
+    Real time factor of each engine on the same audio, fastest first.
+    """
+    rtfs = {}
+    for engine in engines:
+        rtfs[engine.name] = benchmark_engine(engine, arrays)
+        logging.getLogger(__name__).info(f"{engine.name} {engine.model_name}: RTF {rtfs[engine.name]:.3f}")
+    return dict(sorted(rtfs.items(), key=lambda item: item[1]))
 
 class Transcriber:
-    def __init__(self):
+    def __init__(
+            self,
+            workers: int=1,
+            queue_size: int=16,
+            engine: TranscriptionEngine=None,
+            batch_size: int=4,
+            backend: str=None,
+            engine_options: dict=None,
+            device_index: int=None,
+            vad: bool=True):
+        """
+        Initialize the Transcriber class.
+
+        Parameters:
+        workers (int): Transcription threads, the microphone is read on
+            its own thread and never waits on them.
+        queue_size (int): Utterances waiting to be transcribed before the
+            oldest is dropped.
+        engine (TranscriptionEngine): Transcription engine, built from
+            backend when None.
+        batch_size (int): Queued utterances a worker transcribes together.
+        backend (str): Engine backend name, faster-whisper when it is
+            installed, whisper otherwise.
+        engine_options (dict): Options for the backend, e.g. model,
+            beam_size or cpu_threads.
+        device_index (int): Microphone to record, the default input when
+            None.
+        vad (bool): Cut utterances with the VAD segmenter, so no audio
+            without speech is transcribed.
+        """
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.debug("Initializing Transcriber")
-        self.recognizer = sr.Recognizer()
-        self.logger.debug("Recognizer initialized successfully")
-        self.audio_recorder = AudioRecorder()
+        if engine is None:
+            engine = create_engine(backend or default_backend(), **(engine_options or {}))
+        self.engine = engine
+        self.logger.info(f"Transcribing with {engine.name} {engine.model_name}")
+        self.batch_size = max(1, batch_size)
+        self.audio_recorder = AudioRecorder(device_index=device_index, vad=vad)
         self.transcribed_text = ""
+        # utterances in the order spoken, matched to frames by time
+        self.segments: list[TranscriptSegment] = []
+        self.workers = max(1, workers)
+        self.audio_queue = queue.Queue(maxsize=queue_size)
+        # results finished out of order wait here for earlier utterances
+        self.pending = {}
+        self.next_seq = 0
+        self.results_lock = threading.Lock()
+        self.dropped = 0
+
+    def clear(self):
+        with self.results_lock:
+            self.transcribed_text = ""
+            self.segments = []
 
     def transcribe(self, audio_data):
-        try:
-            text = self.recognizer.recognize_whisper(audio_data)
-            self.logger.debug("Transcription successful")
-            self.logger.debug(f"Transcription result: {text}")
-            return text
-        except sr.UnknownValueError:
-            self.logger.error("Whisper could not understand audio")
-            return ""
-        except sr.RequestError as e:
-            self.logger.error(f"Could not request results from Whisper; {e}")
-            raise e
-        
+        text = self.engine.transcribe(audio_data)
+        self.logger.debug(f"Transcription result: {text}")
+        return text
+
+    def transcribe_batch(self, audio_list: list) -> list[str]:
+        texts = self.engine.transcribe_batch(audio_list)
+        self.logger.debug(f"Transcribed {len(texts)} utterances")
+        return texts
+
+    def enqueue(self, item: tuple):
+        """
+        Queue an utterance without blocking capture, the oldest waiting
+        one is dropped when transcription falls too far behind.
+        """
+        while True:
+            try:
+                self.audio_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    seq = self.audio_queue.get_nowait()[0]
+                except queue.Empty:
+                    continue
+                self.dropped += 1
+                self.logger.warning("Transcription queue full, dropping utterance")
+                # an empty result keeps later utterances from waiting on it
+                self.add_result(seq, None)
+
+    def add_result(self, seq: int, segment: TranscriptSegment):
+        """
+        Record a finished utterance, appending every result that is now
+        in order to the transcript.
+        """
+        with self.results_lock:
+            self.pending[seq] = segment
+            while self.next_seq in self.pending:
+                segment = self.pending.pop(self.next_seq)
+                self.next_seq += 1
+                if segment is not None:
+                    if self.transcribed_text:
+                        self.transcribed_text += " "
+                    self.transcribed_text += segment.text
+                    self.segments.append(segment)
+
+    def transcribe_worker(self):
+        stopping = False
+        while not stopping:
+            item = self.audio_queue.get()
+            if item is None:
+                break
+
+            # whatever else is already waiting goes in the same batch
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.audio_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                if len(batch) == 1:
+                    texts = [self.transcribe(batch[0][1])]
+                else:
+                    texts = self.transcribe_batch([audio_data for _, audio_data, _, _ in batch])
+            except Exception as e:
+                self.logger.error(f"Error during transcription: {e}")
+                texts = [""] * len(batch)
+
+            for (seq, _, start, end), text in zip(batch, texts):
+                segment = TranscriptSegment(text, start, end) if text.strip() else None
+                self.add_result(seq, segment)
+
     def record_transcribe(self):
+        """
+        Record until the audio recorder is stopped, transcribing utterances
+        as they come in. Returns once the last utterance is transcribed.
+        """
         self.logger.info("record_transcribe started")
+        with self.results_lock:
+            self.pending = {}
+            self.next_seq = 0
+        workers = [
+            threading.Thread(target=self.transcribe_worker, daemon=True)
+            for _ in range(self.workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        seq = 0
         try:
             for audio_data in self.audio_recorder.record():
-                try:
-                    resp = self.transcribe(audio_data)
-                    if resp.strip():
-                        self.transcribed_text += resp
-                except Exception as e:
-                    self.logger.error(f"Error during transcription: {e}")
-                    break
+                # listen returns when the phrase ended, the audio length
+                # gives when it started
+                end = time.monotonic()
+                start = end - len(audio_data.frame_data) / (
+                    audio_data.sample_rate * audio_data.sample_width)
+                self.enqueue((seq, audio_data, start, end))
+                seq += 1
         except Exception as e:
             self.logger.error(f"Error during audio recording: {e}")
-        
+        finally:
+            # workers finish what is queued, then stop
+            for _ in workers:
+                self.audio_queue.put(None)
+            for worker in workers:
+                worker.join()
+
         self.logger.info(f"record_transcribe -> \"{self.transcribed_text}\"")
@@ -0,0 +1,205 @@
+"""
+VAD Segmenter
+
+Cuts a stream of 16 bit PCM into utterances. Samples go into a NumPy ring
+buffer and every frame is classified as speech by its energy against an
+adaptive noise floor. An utterance starts a pre-roll before the first speech
+frame, so word onsets are not clipped, and ends after a hangover of silence,
+so short pauses do not split it. Silence is never emitted.
+"""
+import logging
+import numpy as np
+
+class RingBuffer:
+    """
+    Fixed size int16 sample buffer addressed by absolute sample index
+    """
+    def __init__(self, capacity: int):
+        self.buffer = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        # samples written since creation, the index of the next sample
+        self.written = 0
+
+    def write(self, samples: np.ndarray):
+        dropped = len(samples) - self.capacity
+        if dropped > 0:
+            # only the newest samples fit
+            self.written += dropped
+            samples = samples[dropped:]
+        pos = self.written % self.capacity
+        first = min(len(samples), self.capacity - pos)
+        self.buffer[pos:pos + first] = samples[:first]
+        self.buffer[:len(samples) - first] = samples[first:]
+        self.written += len(samples)
+
+    def oldest(self) -> int:
+        return max(0, self.written - self.capacity)
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """
+        Copy of samples [start, end), start is clamped to the oldest kept.
+        """
+        start = max(start, self.oldest())
+        end = min(end, self.written)
+        if end <= start:
+            return np.zeros(0, dtype=np.int16)
+        begin = start % self.capacity
+        length = end - start
+        if begin + length <= self.capacity:
+            return self.buffer[begin:begin + length].copy()
+        return np.concatenate((self.buffer[begin:], self.buffer[:begin + length - self.capacity]))
+
+class VadSegmenter:
+    def __init__(
+            self,
+            sample_rate: int=16000,
+            frame_ms: int=30,
+            pre_roll_ms: int=300,
+            hangover_ms: int=600,
+            min_speech_ms: int=200,
+            max_segment_s: float=25.0,
+            threshold_ratio: float=3.0,
+            min_threshold: float=200.0,
+            noise_adapt: float=0.05):
+        """
+        Initialize the VadSegmenter class.
+
+        Parameters:
+        sample_rate (int): Samples per second of the mono int16 input.
+        frame_ms (int): Length of a VAD frame.
+        pre_roll_ms (int): Audio kept before the first speech frame.
+        hangover_ms (int): Silence that ends an utterance.
+        min_speech_ms (int): Utterances with less speech are dropped as
+            clicks and bumps.
+        max_segment_s (float): Longest utterance, longer speech is cut,
+            whisper decodes 30 second windows.
+        threshold_ratio (float): Speech is this much louder than the
+            noise floor.
+        min_threshold (float): Lowest RMS counted as speech.
+        noise_adapt (float): How fast the noise floor follows silent
+            frames, 0 to 1.
+        """
+        self.sample_rate = sample_rate
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.pre_roll = sample_rate * pre_roll_ms // 1000
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_segment = int(sample_rate * max_segment_s)
+        self.threshold_ratio = threshold_ratio
+        self.min_threshold = min_threshold
+        self.noise_adapt = noise_adapt
+        self.ring = RingBuffer(self.pre_roll + self.max_segment + self.frame_size)
+        self.logger = logging.getLogger(__name__)
+        self.noise_floor = None
+        self.reset()
+
+    def reset(self):
+        """
+        Drop buffered audio and any utterance in progress, the noise
+        floor is kept.
+        """
+        self.pending = np.zeros(0, dtype=np.int16)
+        self.segment_start = None
+        self.last_end = 0
+        self.speech_frames = 0
+        self.silent_frames = 0
+
+    @property
+    def threshold(self) -> float:
+        if self.noise_floor is None:
+            return self.min_threshold
+        return max(self.min_threshold, self.noise_floor * self.threshold_ratio)
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.mean(frame.astype(np.float32) ** 2)))
+        if self.noise_floor is None:
+            self.noise_floor = rms
+        speech = rms > self.threshold
+
+        if rms < self.noise_floor:
+            self.noise_floor = rms
+        elif speech:
+            # creeps up under speech, a background that got louder stops
+            # counting as speech after a while
+            self.noise_floor += self.noise_adapt * 0.01 * (rms - self.noise_floor)
+        else:
+            self.noise_floor += self.noise_adapt * (rms - self.noise_floor)
+        return speech
+
+    def feed(self, samples) -> list[np.ndarray]:
+        """
+        Add audio and collect the utterances it completes.
+
+        Parameters:
+        samples (bytes | np.ndarray): Mono int16 PCM.
+
+        Returns:
+        list[np.ndarray]: Finished utterances as int16 arrays, in order.
+        """
+        if isinstance(samples, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(samples, dtype=np.int16)
+        if len(self.pending):
+            samples = np.concatenate((self.pending, samples))
+
+        segments = []
+        whole = len(samples) - len(samples) % self.frame_size
+        for offset in range(0, whole, self.frame_size):
+            frame = samples[offset:offset + self.frame_size]
+            self.ring.write(frame)
+            segment = self.process_frame(frame)
+            if segment is not None:
+                segments.append(segment)
+
+        self.pending = samples[whole:].copy()
+        return segments
+
+    def process_frame(self, frame: np.ndarray) -> np.ndarray:
+        end = self.ring.written
+        speech = self.is_speech(frame)
+
+        if self.segment_start is None:
+            if speech:
+                # pre-roll never reaches back into the previous utterance
+                self.segment_start = max(
+                    self.ring.oldest(), self.last_end, end - len(frame) - self.pre_roll)
+                self.speech_frames = 1
+                self.silent_frames = 0
+            return None
+
+        if speech:
+            self.speech_frames += 1
+            self.silent_frames = 0
+        else:
+            self.silent_frames += 1
+
+        # cut before the next frame would go over the longest utterance
+        full = end - self.segment_start + self.frame_size > self.max_segment
+        if self.silent_frames >= self.hangover_frames or full:
+            return self.end_segment()
+        return None
+
+    def end_segment(self) -> np.ndarray:
+        """
+        Close the utterance in progress.
+
+        Returns:
+        np.ndarray: Its samples, None when there was too little speech.
+        """
+        segment = None
+        if self.segment_start is not None and self.speech_frames >= self.min_speech_frames:
+            segment = self.ring.read(self.segment_start, self.ring.written)
+            self.last_end = self.ring.written
+            self.logger.debug(
+                f"Utterance of {len(segment) / self.sample_rate:.2f}s, threshold {self.threshold:.0f}")
+        self.segment_start = None
+        self.speech_frames = 0
+        self.silent_frames = 0
+        return segment
+
+    def flush(self) -> np.ndarray:
+        """
+        End of stream, the utterance in progress if it had enough speech.
+        """
+        segment = self.end_segment()
+        self.pending = np.zeros(0, dtype=np.int16)
+        return segment